@@ -1,7 +1,24 @@
 from lib.lexer import Lexer
+from lib.fastlexer import FastLexer
 from lib.parser_ import Parser
+from lib.stackparser import StackParser
 from lib.interpreter import Interpreter, Context, Number
+from lib.iterative import IterativeInterpreter
 from lib.symbols import SymbolTable
+from lib.compiler import Compiler
+from lib.vm import VM
+from lib.codegen import CodeGenerator
+from lib.cache import ParseCache, CacheEntry
+from lib.optimizer import Optimizer
+from lib.vectorize import BatchEvaluator
+from lib.resolver import Resolver, Frame
+from lib.stream import StreamLexer, StreamParser
+from lib.numeric import getBackend, activate, LiteralConverter, truthValues
+from lib.memo import MemoInterpreter
+from lib.limits import Meter, Planner
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+import os, mmap
 
 ##################################
 # RUN
@@ -9,25 +26,359 @@ from lib.symbols import SymbolTable
 
 globalSymbolTable = SymbolTable()
 globalSymbolTable.set('null', Number(0))
+parseCache = ParseCache()
+# a lib.diskcache.DiskCache, looked in on parse cache misses and given
+# every new parse
+diskCache = None
 
 
-def run(filename, text):
+ENGINES = ('interpreter', 'vm', 'iterative', 'codegen')
+LEXERS = {'default': Lexer, 'fast': FastLexer}
+# both build the same trees, 'stack' does not recurse
+PARSERS = {'default': Parser, 'stack': StackParser}
 
-    lexer = Lexer(text, filename)
+
+def parse(filename, text, lexer='default', cache=True, profile=None, parser='default'):
+    entry = parseCache.get(filename, text) if cache else None
+    if entry is not None:
+        if profile is not None: profile.cacheHits += 1
+        return entry
+
+    if diskCache is not None:
+        if profile is not None: start = perf_counter()
+        node = diskCache.get(filename, text)
+        if profile is not None: profile.addStage('load', perf_counter() - start)
+        if node is not None:
+            if not cache: return CacheEntry(node, None)
+            return parseCache.put(filename, text, node, None)
+
+    if profile is not None: start = perf_counter()
+    lexer = LEXERS[lexer](text, filename)
     tokens, error = lexer.make_token()
     # make token segregate the input symbols
     # according to tokens defined and return
     # list of tokens and error (if any/None)
+    if profile is not None:
+        profile.addStage('lex', perf_counter() - start)
+        profile.tokens += len(tokens)
+    if error:
+        node = None
+    else:
+        # Abstract syntax tree
+        if profile is not None: start = perf_counter()
+        ast = PARSERS[parser](tokens).parse()
+        node, error = (None, ast.error) if ast.error else (ast.node, None)
+        if profile is not None:
+            profile.addStage('parse', perf_counter() - start)
+            if node is not None: profile.countNodes(node)
+        if diskCache is not None and node is not None:
+            diskCache.put(text, node)
+
+    if not cache: return CacheEntry(node, error)
+    return parseCache.put(filename, text, node, error)
+
+
+def write_bundle(name, texts, lexer='default', parser='default'):
+    # Parses texts and saves their trees in diskCache as one bundle, which
+    # diskCache.loadBundle(name) makes available all at once. Texts that
+    # do not lex or parse are left out. Returns the bundle's path.
+    if diskCache is None:
+        raise ValueError('write_bundle needs basic.diskCache to be set')
+
+    def parsed():
+        for text in texts:
+            tokens, error = LEXERS[lexer](text, '<bundle>').make_token()
+            if error: continue
+            ast = PARSERS[parser](tokens).parse()
+            if not ast.error: yield text, ast.node
+
+    return diskCache.writeBundle(name, parsed())
+
+
+def converted(entry, backend):
+    # the tree with its literals in the backend's numbers
+    if backend is None: return entry.node
+    key = f'numeric:{backend.name}'
+    node = entry.compiled.get(key)
+    if node is None:
+        node = entry.compiled[key] = LiteralConverter(backend).convert(entry.node)
+    return node
+
+
+def optimized(entry, backend=None):
+    key = 'optimized' if backend is None else f'optimized:{backend.name}'
+    node = entry.compiled.get(key)
+    if node is None:
+        node = entry.compiled[key] = Optimizer(backend).optimize(converted(entry, backend))
+    return node
+
+
+def metered(entry, node, suffix, limits, backend):
+    # node with MeterNodes put in, see lib/limits.py, cached under the
+    # suffix of its compiled forms
+    key = 'metered' + suffix
+    tree = entry.compiled.get(key)
+    if tree is None:
+        tree = entry.compiled[key] = Planner(limits, backend).plan(node)
+    return tree
+
+
+def run(filename, text, engine='interpreter', lexer='default', cache=True, optimize=False,
+        symbolTable=None, resolve=False, profile=None, parser='default', numeric='default', memo=None,
+        limits=None):
+    # profile: a lib.profiler.Profile to record stage timings, node visits
+    # and Number allocations into
+    # numeric: a name from lib.numeric.BACKENDS or a backend, what numbers
+    # are while the program runs
+    # memo: a lib.memo.MemoCache to reuse the values of sub-expressions
+    # whose variables have not changed since an earlier run
+    # limits: a lib.limits.Limits, what the run may cost before it fails
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+    backend = getBackend(numeric)
+    if memo is not None and (engine != 'interpreter' or resolve or profile is not None):
+        raise ValueError("memo only works with engine='interpreter', without resolve or profile")
+
+    # the run's time starts here, parsing and compiling count
+    meter = Meter(limits) if limits is not None else None
+
+    if profile is not None:
+        profile.runs += 1
+        with profile.countAllocations():
+            return profiledRun(filename, text, engine, lexer, cache, optimize, symbolTable, resolve, profile,
+                               parser, backend, meter)
+
+    entry = parse(filename, text, lexer, cache, parser=parser)
+    if entry.error: return None, entry.error
+
+    interpreter = interpreterFor(engine) if memo is None else MemoInterpreter(memo)
+    return evaluate(entry, engine, optimize, symbolTable, resolve, interpreter, backend, meter)
+
+
+def interpreterFor(engine):
+    # the tree walker behind an engine, the vm and codegen do not use one
+    return IterativeInterpreter() if engine == 'iterative' else Interpreter()
+
+
+def evaluate(entry, engine, optimize, symbolTable, resolve, interpreter, backend=None, meter=None):
+    with activate(backend):
+        return evaluateNode(entry, engine, optimize, symbolTable, resolve, interpreter, backend, meter)
+
+
+def evaluateNode(entry, engine, optimize, symbolTable, resolve, interpreter, backend, meter):
+    node = optimized(entry, backend) if optimize else converted(entry, backend)
+    # compiled forms are cached per backend and optimization, and apart
+    # for metered runs
+    suffix = ('' if backend is None else f':{backend.name}') + (':optimized' if optimize else '')
+    if meter is not None:
+        suffix += ':metered' if meter.maxBits is None else f':metered:{meter.maxBits}'
+        if meter.deadline is not None: suffix += ':clocked'
+        node = metered(entry, node, suffix, meter.limits, backend)
+
+    # Run Program
+    context = Context('<progrom>')
+    context.symbolTable = symbolTable or globalSymbolTable
+    context.backend = backend
+    context.truth = truthValues(backend)
+    context.meter = meter
+    if engine == 'codegen':
+        key = 'codegen' + suffix
+        program = entry.compiled.get(key)
+        if program is None:
+            program = entry.compiled[key] = CodeGenerator().compile(node, backend)
+        runTree = program.run
+    else:
+        runTree = lambda context: interpreter.run(node, context)
+
+    if engine == 'vm':
+        key = 'vm' + suffix
+        code = entry.compiled.get(key)
+        if code is None:
+            code = entry.compiled[key] = Compiler().compile(node)
+        result = VM().run(code, context)
+    elif resolve:
+        # variables live in an array-backed frame for the run, loaded from
+        # and written back to the symbol table
+        key = 'scope' + suffix
+        scope = entry.compiled.get(key)
+        if scope is None:
+            scope = entry.compiled[key] = Resolver().resolve(node)
+        loaded = scope.load(context.symbolTable)
+        context.frame = Frame(list(loaded.slots))
+        try:
+            result = runTree(context)
+        finally:
+            scope.store(context.frame, loaded, context.symbolTable)
+    else:
+        result = runTree(context)
+    return result.value , result.error
+
+
+def profiledRun(filename, text, engine, lexer, cache, optimize, symbolTable, resolve, profile, parser, backend,
+                meter):
+    entry = parse(filename, text, lexer, cache, profile, parser)
+    if entry.error: return None, entry.error
+
+    # node visits are only timed for the recursive interpreter
+    untimed = engine in ('iterative', 'codegen')
+    interpreter = interpreterFor(engine) if untimed else profile.interpreter()
+    start = perf_counter()
+    try:
+        return evaluate(entry, engine, optimize, symbolTable, resolve, interpreter, backend, meter)
+    finally:
+        elapsed = perf_counter() - start
+        profile.addStage('evaluate', elapsed, elapsed if untimed else elapsed - interpreter.childTime[-1])
+
+
+def run_file(path, engine='interpreter', optimize=False, symbolTable=None, resolve=False, timings=None,
+             parser='default', numeric='default'):
+    # Runs a script file, statements being separated by newlines or ';',
+    # in one shared context. The file is memory-mapped and lexed straight
+    # from the mapping, its text is only decoded to render an error.
+    # timings: a list, gets a (line number, seconds) pair appended for
+    # every statement run. Returns the value of the last statement and the
+    # error, if any.
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+    backend = getBackend(numeric)
+
+    with open(path, 'rb') as file:
+        # the mapping outlives the file, it is unmapped once nothing
+        # (no node, value or error) points into it anymore
+        size = os.fstat(file.fileno()).st_size
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+    tokens, error = FastLexer(buffer, path).make_token()
     if error: return None, error
-    parser = Parser(tokens) 
-    # Abstract syntax tree
-    ast = parser.parse()
+    ast = PARSERS[parser](tokens).program()
     if ast.error: return None, ast.error
 
+    interpreter = interpreterFor(engine)
+    if timings is None:
+        return evaluate(CacheEntry(ast.node, None), engine, optimize, symbolTable, resolve, interpreter, backend)
+
+    # statements are timed by their offset, turned into line numbers once
+    # the run is over: a Position's would index the whole file
+    value = error = None
+    offsets, seconds = [], []
+    for statement in ast.node.statements:
+        start = perf_counter()
+        value, error = evaluate(CacheEntry(statement, None), engine, optimize, symbolTable, resolve, interpreter,
+                                backend)
+        seconds.append(perf_counter() - start)
+        offsets.append(statement.start)
+        if error: break
+    lines = ast.node.source.lineNumbers(offsets)
+    timings.extend((ln + 1, elapsed) for ln, elapsed in zip(lines, seconds))
+    return (None, error) if error else (value, None)
+
+
+def run_stream(stream, filename='<stream>', engine='interpreter', optimize=False,
+               symbolTable=None, resolve=False, chunkSize=1 << 16, numeric='default'):
+    # Runs a program read from a file object (text or binary) or an
+    # iterable of str chunks, statements being separated by newlines or
+    # ';'. Each statement is lexed, parsed and run before the next one is
+    # read, so memory does not grow with the length of the program, and
+    # the statements before an error have run. Returns the value of the
+    # last statement and the error, if any.
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {ENGINES}')
+
+    backend = getBackend(numeric)
+    lexer = StreamLexer(stream, filename, chunkSize)
+    interpreter = interpreterFor(engine)
+    value = None
+    for res in StreamParser(lexer.tokens()).statements():
+        if res.error: return None, res.error
+        value, error = evaluate(CacheEntry(res.node, None), engine, optimize, symbolTable, resolve, interpreter,
+                                backend)
+        if error: return None, error
+    if lexer.error: return None, lexer.error
+    return value, None
+
+
+def run_batch(filename, text, columns, optimize=False):
+    # Evaluates one expression for every row of `columns` (variable name ->
+    # numpy array or sequence). Returns (values, error), on division by zero
+    # error.rows holds the failed row indices and their values are undefined.
+    entry = parse(filename, text)
+    if entry.error: return None, entry.error
+
+    node = optimized(entry) if optimize else entry.node
 
-    # Run Program
-    interpreter = Interpreter()
     context = Context('<progrom>')
     context.symbolTable = globalSymbolTable
-    result = interpreter.visit(ast.node, context)
-    return result.value , result.error
+    return BatchEvaluator(columns, context).evaluate(node)
+
+
+##################################
+# RUN MANY
+##################################
+
+# Globals every job of a run_many call can read, set once per worker
+sharedSymbolTable = None
+
+
+def initWorker(symbols):
+    global sharedSymbolTable
+    sharedSymbolTable = SymbolTable()
+    sharedSymbolTable.symbols = symbols
+
+
+def detach(value, error):
+    # Results travel back to the parent process: drop the contexts (and
+    # with them the job's symbol table) and the AST the value points at
+    if value is not None:
+        value = Number(value.value)
+    if error is not None and getattr(error, 'context', None):
+        error.context = detachContext(error.context)
+    return value, error
+
+
+def detachContext(context):
+    if context is None: return None
+    detached = Context(context.displayName, detachContext(context.parent), context.parentEntry)
+    return detached
+
+
+def runJobs(jobs, options):
+    results = []
+    for filename, text in jobs:
+        # each job writes to its own table, reads fall through to the globals
+        symbolTable = SymbolTable(sharedSymbolTable)
+        try:
+            value, error = run(filename, text, symbolTable=symbolTable, **options)
+        except Exception as exception:
+            value, error = None, exception
+        results.append(detach(value, error))
+    return results
+
+
+def run_many(sources, workers=None, chunkSize=None, **options):
+    # Runs independent programs on a pool of processes and returns their
+    # (value, error) pairs in order. `sources` holds texts or (filename,
+    # text) pairs. Every job gets a fresh symbol table on top of a copy of
+    # globalSymbolTable, so jobs can neither see each other's variables nor
+    # change the globals. Python exceptions raised by a job are returned as
+    # its error instead of aborting the others.
+    global sharedSymbolTable
+
+    jobs = [
+        source if isinstance(source, tuple) else (f'<job {index}>', source)
+        for index, source in enumerate(sources)
+    ]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(jobs) <= 1:
+        sharedSymbolTable = globalSymbolTable
+        return runJobs(jobs, options)
+
+    if chunkSize is None:
+        chunkSize = max(1, -(-len(jobs) // (workers * 4)))
+    chunks = [jobs[i:i + chunkSize] for i in range(0, len(jobs), chunkSize)]
+
+    results = []
+    with ProcessPoolExecutor(workers, initializer=initWorker,
+                             initargs=(dict(globalSymbolTable.symbols),)) as pool:
+        for chunk in pool.map(runJobs, chunks, [options] * len(chunks)):
+            results.extend(chunk)
+    return results
@@ -0,0 +1,57 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.interpreter import Interpreter, Context, Number
+from lib.profiler import Profile
+from lib.symbols import SymbolTable
+
+##################################
+# NUMBER ALLOCATIONS PER OPERATION
+##################################
+
+EXPRESSIONS = {
+    'ints': ' + '.join(f'{i} * {i + 1} - {i}' for i in range(50)),
+    'floats': ' + '.join(f'{i}.5 * x / {i + 1}.25' for i in range(50)),
+    'negation': ' + '.join(f'-{i} * -x' for i in range(50)),
+    'variables': ' + '.join(f'x * y - x' for i in range(50)),
+}
+
+
+def operations(text):
+    return sum(text.count(op) for op in '+-*/^')
+
+
+def measure(walk, node, context, repeat):
+    profile = Profile()
+    with profile.countAllocations():
+        walk(node, context)
+    allocations = profile.numberAllocations
+
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            walk(node, context)
+        best = min(best, time.perf_counter() - start)
+    return allocations, best / repeat
+
+
+def main(repeat=200):
+    context = Context('<bench>')
+    context.symbolTable = SymbolTable()
+    context.symbolTable.set('x', Number(3))
+    context.symbolTable.set('y', Number(2.5))
+    interpreter = Interpreter()
+
+    for name, text in EXPRESSIONS.items():
+        node = basic.parse('<bench>', text).node
+        ops = operations(text)
+        boxed, boxedTime = measure(interpreter.visit, node, context, repeat)
+        unboxed, unboxedTime = measure(interpreter.run, node, context, repeat)
+        print(f'{name:10} {ops:4} ops  boxed {boxed / ops:5.2f} allocs/op {boxedTime / ops * 1e9:6.0f} ns/op'
+              f'  unboxed {unboxed / ops:5.2f} allocs/op {unboxedTime / ops * 1e9:6.0f} ns/op')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
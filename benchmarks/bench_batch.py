@@ -0,0 +1,36 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import basic
+from lib.interpreter import Number
+
+##################################
+# SCALAR LOOP vs BATCH
+##################################
+
+
+def main(rows=100000, scalarRows=5000):
+    generator = np.random.default_rng(0)
+    columns = {
+        'a': generator.integers(-1000, 1000, rows),
+        'b': generator.random(rows),
+        'c': generator.integers(-100, 100, rows),
+    }
+
+    for text in ('a * b + c ^ 2', 'a * b + c ^ 2.0', '(a - c) / (b + 1) * -a'):
+        start = time.perf_counter()
+        for row in range(scalarRows):
+            for name, values in columns.items():
+                basic.globalSymbolTable.set(name, Number(values[row].item()))
+            basic.run('<bench>', text)
+        scalar = scalarRows / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        values, error = basic.run_batch('<bench>', text, columns)
+        batch = rows / (time.perf_counter() - start)
+        print(f'{text:25} basic.run loop {scalar:10.0f} rows/s  run_batch {batch:12.0f} rows/s  x{batch / scalar:.0f}')
+
+
+if __name__ == '__main__':
+    main()
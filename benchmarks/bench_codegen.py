@@ -0,0 +1,56 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.lexer import Lexer
+from lib.parser_ import Parser
+from lib.interpreter import Interpreter, Context, Number
+from lib.codegen import CodeGenerator
+from timing import best
+
+##################################
+# TREE WALKING vs GENERATED CODE
+##################################
+
+EXPRESSIONS = [
+    'a * b + c * d - a / b + c ^ 2',
+    ' + '.join(f'v{i % 8} * v{(i + 3) % 8}' for i in range(60)),
+    'var total = ' + ' + '.join(f'(a - b) * c / (d + {i})' for i in range(20)),
+    'var x = a; var y = x * b - c; var z = (x + y) / d; x * y - z',
+]
+
+
+def parse(text):
+    tokens, error = Lexer(text, '<bench>').make_token()
+    return Parser(tokens).program().node
+
+
+def main(repeat=2000):
+    for name, value in zip('abcd', (3, 1.5, 7, 2)):
+        basic.globalSymbolTable.set(name, Number(value))
+    for i in range(8):
+        basic.globalSymbolTable.set(f'v{i}', Number(i + 0.5))
+    context = Context('<bench>')
+    context.symbolTable = basic.globalSymbolTable
+    interpreter = Interpreter()
+
+    for text in EXPRESSIONS:
+        node = parse(text)
+        program = CodeGenerator().compile(node)
+        assert repr(program.run(context).value) == repr(interpreter.visit(node, context).value)
+        visit = best(lambda: interpreter.visit(node, context), repeat)
+        unboxed = best(lambda: interpreter.run(node, context), repeat)
+        generated = best(lambda: program.run(context), repeat)
+        print(f'{text[:40]:40} visit {visit:8.0f}/s  run {unboxed:8.0f}/s  codegen {generated:8.0f}/s  '
+              f'x{generated / visit:.2f}')
+
+    # through basic.run, with the parse cache holding the generated code
+    for text in EXPRESSIONS:
+        interpreted = best(lambda: basic.run('<bench>', text), repeat)
+        generated = best(lambda: basic.run('<bench>', text, engine='codegen'), repeat)
+        print(f'basic.run {text[:30]:30} interpreter {interpreted:8.0f}/s  codegen {generated:8.0f}/s  '
+              f'x{generated / interpreted:.2f}')
+
+
+if __name__ == '__main__':
+    main()
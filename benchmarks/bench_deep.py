@@ -0,0 +1,39 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+
+##################################
+# RECURSIVE vs EXPLICIT STACK
+##################################
+
+SHAPES = {
+    'chain': lambda n: ' + '.join(f'{i} * 2' for i in range(n)),
+    'parens': lambda n: '(' * n + '1' + ')' * n,
+    'unary': lambda n: '-' * n + '3',
+}
+
+
+def timed(text, **options):
+    start = time.perf_counter()
+    try:
+        value, error = basic.run('<bench>', text, lexer='fast', cache=False, **options)
+    except RecursionError:
+        return 'RecursionError', time.perf_counter() - start
+    return error.as_string() if error else value, time.perf_counter() - start
+
+
+def main(*sizes):
+    for size in map(int, sizes or (1000, 10000, 100000)):
+        for name, shape in SHAPES.items():
+            text = shape(size)
+            recursive, recursiveTime = timed(text)
+            iterative, iterativeTime = timed(text, parser='stack', engine='iterative')
+            if recursive != 'RecursionError':
+                assert repr(recursive) == repr(iterative)
+            print(f'{name:7} {size:8}  recursive {str(recursive)[:16]:>16} {recursiveTime:7.3f}s'
+                  f'  stack {str(iterative)[:16]:>16} {iterativeTime:7.3f}s')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,82 @@
+import os, sys, gc, time, random, shutil, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.diskcache import DiskCache
+
+##################################
+# RE-PARSING vs THE DISK CACHE
+##################################
+
+# python benchmarks/bench_diskcache.py [FORMULAS]
+# The start of a service loading a library of formulas: every formula
+# re-parsed, against one bundle loaded from the disk cache. Both build the
+# same trees, millions of objects for 50k formulas, and the garbage
+# collector's passes over them cost the same either way: the comparison
+# is made with the collector running and paused.
+
+
+def formulas(count, seed=0):
+    rng = random.Random(seed)
+    templates = [
+        'var {v} = price * (1 + rate / {n}) ^ years',
+        '({a} - {b}) * {c} / ({a} + {n}) + {b} ^ 2 - {c} / {m}',
+        'var {v} = ' + ' + '.join('({a} * %d - {b}) / ({c} + {n})' % i for i in range(6)),
+        '-{a} * {n}.5 + {b} * {m} - ({c} - {n}) ^ 3',
+    ]
+    names = [f'x{i}' for i in range(200)]
+    return [
+        rng.choice(templates).format(
+            v=f'f{i}', a=rng.choice(names), b=rng.choice(names), c=rng.choice(names),
+            n=rng.randint(1, 1000), m=rng.randint(1, 1000)
+        )
+        for i in range(count)
+    ]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def parseAll(texts):
+    return [basic.parse('<formula>', text, cache=False).node for text in texts]
+
+
+def compare(directory, texts):
+    basic.diskCache = None
+    reparsed, nodes = timed(lambda: parseAll(texts))
+    print(f'    re-parse every formula       {reparsed * 1000:9.1f} ms')
+    del nodes
+
+    # a fresh cache, like a new process would open
+    basic.diskCache = DiskCache(directory)
+    indexed, _ = timed(lambda: basic.diskCache.loadBundle('formulas'))
+    loaded, nodes = timed(lambda: parseAll(texts))
+    assert basic.diskCache.misses == 0 and len(nodes) == len(texts)
+    print(f'    load the bundle index        {indexed * 1000:9.1f} ms  x{reparsed / indexed:.0f}')
+    print(f'      and every formula\'s tree  {(indexed + loaded) * 1000:9.1f} ms  '
+          f'x{reparsed / (indexed + loaded):.1f}')
+
+
+def main(count=50000):
+    texts = formulas(count)
+    directory = tempfile.mkdtemp()
+    try:
+        basic.diskCache = DiskCache(directory)
+        written, path = timed(lambda: basic.write_bundle('formulas', texts))
+        print(f'{count} formulas, bundle of {os.path.getsize(path) / 1024 / 1024:.1f} MiB written in {written:.2f} s')
+
+        for collect in (True, False):
+            if not collect: gc.disable()
+            print('collector', 'running' if collect else 'paused')
+            compare(directory, texts)
+            gc.enable()
+    finally:
+        basic.diskCache = None
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,35 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from timing import best
+
+##################################
+# ERROR CREATION AND RENDERING
+##################################
+
+# Validating a batch of inputs that mostly fail: the errors are created
+# for every input, rendered as text or as plain data for the few reported.
+INPUTS = ['1 + * 2', 'var = 3', '(1 + 2', 'x * 3 $', '1 / 0', 'undefined + 1', '3 ^ ^ 2', 'var a 3']
+
+
+def main(repeat=2000):
+    errors = [basic.run('<input>', text, cache=False)[1] for text in INPUTS]
+    assert all(errors)
+    validated = best(lambda: [basic.run('<input>', text, cache=False) for text in INPUTS], repeat // 10)
+    print(f'validate {len(INPUTS)} inputs           {validated * len(INPUTS):10.0f} inputs/s')
+    for name, render in (('as_string', lambda error: error.as_string()), ('as_dict', lambda error: error.as_dict())):
+        rate = best(lambda: [render(error) for error in errors], repeat)
+        print(f'render with {name:12}        {rate * len(INPUTS):10.0f} errors/s')
+
+    # an error near the end of a long script, lines are found through the
+    # source's line index
+    lines = [f'var v{i} = {i} * 2' for i in range(20000)] + ['v1 / (v2 - 4)']
+    value, error = basic.run('<script>', '\n'.join(lines), cache=False)
+    assert error is not None
+    rate = best(lambda: error.as_string(), repeat)
+    print(f'render at line {error.startPos.ln + 1} of {len(lines)}  {rate:10.0f} errors/s')
+
+
+if __name__ == '__main__':
+    main()
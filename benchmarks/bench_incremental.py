@@ -0,0 +1,52 @@
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.fastlexer import FastLexer
+from lib.parser_ import Parser
+from lib.incremental import IncrementalDocument
+
+##################################
+# INCREMENTAL vs FULL REPARSE
+##################################
+
+
+def generate(lines):
+    return ''.join(f'var v{i} = (v{i - 1} * {i}.5 - {i} ^ 2) / {i + 1}\n' for i in range(lines))
+
+
+def fullParse(text):
+    tokens, error = FastLexer(text, '<bench>').make_token()
+    return Parser(tokens).parse()
+
+
+def main(lines=10000, edits=1000):
+    random.seed(0)
+    text = generate(lines)
+    document = IncrementalDocument(text, '<bench>')
+
+    start = time.perf_counter()
+    fullParse(text)
+    full = time.perf_counter() - start
+
+    times = []
+    for _ in range(edits):
+        # retype one number somewhere in the program
+        offset = text.index('* ', random.randrange(len(text) - 100)) + 2
+        end = text.index('.', offset)
+        digits = str(random.randrange(1000))
+        start = time.perf_counter()
+        document.edit(offset, end - offset, digits)
+        res = document.parse()
+        times.append(time.perf_counter() - start)
+        text = text[:offset] + digits + text[end:]
+        assert res.error is None
+
+    assert document.text == text
+    times.sort()
+    print(f'{lines} lines, full reparse {full * 1000:.2f} ms')
+    print(f'incremental edit+parse  median {times[len(times) // 2] * 1000:.3f} ms  '
+          f'p99 {times[len(times) * 99 // 100] * 1000:.3f} ms  max {times[-1] * 1000:.3f} ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
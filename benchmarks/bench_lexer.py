@@ -0,0 +1,38 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.lexer import Lexer
+from lib.fastlexer import FastLexer
+
+##################################
+# LEXER vs FAST LEXER
+##################################
+
+
+def generate(terms):
+    parts = []
+    for i in range(terms):
+        parts.append(f'(var_{i} * {i}.5 - {i} ^ 2) / {i + 1}')
+    return ' + '.join(parts)
+
+
+def best(fn, repeat=5):
+    result = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        result = min(result, time.perf_counter() - start)
+    return result
+
+
+def main():
+    for terms in (100, 1000, 10000):
+        text = generate(terms)
+        tokens, error = Lexer(text, '<bench>').make_token()
+        slow = best(lambda: Lexer(text, '<bench>').make_token())
+        fast = best(lambda: FastLexer(text, '<bench>').make_token())
+        print(f'{len(text):8} chars {len(tokens):7} tokens  lexer {slow * 1000:8.2f}ms  fast {fast * 1000:8.2f}ms  x{slow / fast:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.limits import Limits
+from lib.symbols import SymbolTable
+from lib.interpreter import Number
+from suite import WORKLOADS
+
+##################################
+# METERING OVERHEAD
+##################################
+
+# Steps are charged a chunk at a time, the clock read every few thousand
+# steps: a run within its limits should cost a few percent more than one
+# without. Under a timeout, every '*' and '^' whose operands are only
+# known at run time is measured for the clock, which formula, multiplying
+# a variable in every term, pays for. Measuring sizes (maxBits) adds
+# little to that: the sizes of literals are worked out before the run.
+# The workloads are mostly literals, which Python's compiler folds in
+# codegen's functions as far as no MeterNode splits them.
+
+ENGINES = ['interpreter', 'iterative', 'vm', 'codegen']
+
+CONFIGS = [None, Limits(maxSteps=10 ** 9, timeout=60), Limits(maxSteps=10 ** 9, timeout=60, maxBits=1 << 16)]
+
+FORMULA = ' + '.join(f'(x{i % 10} * {i} - y) / (z + {i}) * w' for i in range(500))
+
+# what untrusted formulas can throw at a worker, and how soon each fails
+ABUSE = {
+    'power tower': ('2 ^ 9999999 ^ 99', Limits(maxBits=1 << 16)),
+    'squaring': ('var a = 3 ^ 4000; ' + '; '.join(['var a = a * a'] * 30), Limits(maxBits=1 << 16)),
+    'huge sum': (' + '.join(f'{i} * {i} ^ 3' for i in range(200000)), Limits(timeout=0.05)),
+    'many steps': (' + '.join(['1'] * 200000), Limits(maxSteps=10000)),
+}
+
+
+def interleaved(fns, repeat, rounds=7):
+    # best time per call of each fn, taken in turns so that they share
+    # whatever else the machine does
+    results = [float('inf')] * len(fns)
+    for _ in range(rounds):
+        for index, fn in enumerate(fns):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                fn()
+            results[index] = min(results[index], (time.perf_counter() - start) / repeat)
+    return results
+
+
+def main(repeat=20):
+    symbolTable = SymbolTable(basic.globalSymbolTable)
+    for name in 'xyzw':
+        symbolTable.set(name, Number(3))
+    for i in range(10):
+        symbolTable.set(f'x{i}', Number(i + 0.5))
+    workloads = {name: workload() for name, workload in WORKLOADS.items()}
+    workloads['formula'] = FORMULA
+
+    for name, text in workloads.items():
+        for engine in ENGINES:
+            times = interleaved([
+                lambda limits=limits: basic.run('<bench>', text, engine=engine, parser='stack',
+                                               symbolTable=symbolTable, limits=limits)
+                for limits in CONFIGS
+            ], repeat)
+            print(f'{name:15} {engine:12} {times[0] * 1000:8.3f}ms  metered {times[1] / times[0] - 1:+6.1%}'
+                  f'  measured {times[2] / times[0] - 1:+6.1%}')
+
+    # timed once parsed, as a worker's cache would have them: parsing is
+    # bounded by the length of the source, not by the limits
+    for name, (text, limits) in ABUSE.items():
+        basic.run('<bench>', text, engine='iterative', parser='stack', limits=limits)
+        start = time.perf_counter()
+        value, error = basic.run('<bench>', text, engine='iterative', parser='stack', limits=limits)
+        print(f'{name:15} {time.perf_counter() - start:7.3f}s  {error.details if error else value}')
+
+
+if __name__ == '__main__':
+    main()
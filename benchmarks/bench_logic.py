@@ -0,0 +1,49 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.symbols import SymbolTable
+from lib.interpreter import Number
+from timing import best
+
+##################################
+# SHORT-CIRCUIT EVALUATION
+##################################
+
+# Guard chains as rules are written: cheap tests first, the expensive part
+# last. With the guard failing, 'and' never evaluates the rest, so a rule
+# costs about what its first test does.
+
+EXPENSIVE = ' + '.join(f'(income - {i}) * rate ^ 2 / (debt + {i + 1})' for i in range(40))
+
+RULES = {
+    'guard chain': 'age >= 18 and 0 < score <= 850 and income > 1000 and (' + EXPENSIVE + ') > 0',
+    'or fallback': 'vip or (' + EXPENSIVE + ') > 100',
+    'chained range': ' and '.join(f'{i} <= age < {i + 100}' for i in range(30)),
+}
+
+ENGINES = ['interpreter', 'iterative', 'vm', 'codegen']
+
+
+def bindings(passing):
+    symbolTable = SymbolTable(basic.globalSymbolTable)
+    values = {'age': 30 if passing else 12, 'score': 700, 'income': 5000, 'rate': 1.5, 'debt': 200,
+              'vip': 0 if passing else 1}
+    for name, value in values.items():
+        symbolTable.set(name, Number(value))
+    return symbolTable
+
+
+def main(repeat=2000):
+    for name, text in RULES.items():
+        for engine in ENGINES:
+            rates = []
+            for passing in (True, False):
+                symbolTable = bindings(passing)
+                rates.append(best(lambda: basic.run('<bench>', text, engine=engine, symbolTable=symbolTable), repeat))
+            print(f'{name:14} {engine:12} guard passes {rates[0]:9.0f}/s  guard fails {rates[1]:9.0f}/s  '
+                  f'x{rates[1] / rates[0]:.1f}')
+
+
+if __name__ == '__main__':
+    main()
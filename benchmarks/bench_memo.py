@@ -0,0 +1,50 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.interpreter import Number
+from lib.memo import MemoCache
+
+##################################
+# MEMOIZED SUB-EXPRESSIONS
+##################################
+
+# formulas sharing a costly part, re-run while one input changes now and then
+SHARED = ' + '.join(f'(a * {i} - b) / (c + {i}) ^ 2' for i in range(30))
+FORMULAS = [f'{SHARED} + {tail}' for tail in ('d', 'd * 2', 'd ^ 2', '-d', 'a * d')]
+
+
+def session(memo, rounds):
+    for round in range(rounds):
+        basic.globalSymbolTable.set('d', Number(round))
+        if round % 10 == 0:
+            basic.globalSymbolTable.set('a', Number(round + 0.5))
+        for text in FORMULAS:
+            if memo is None:
+                basic.run('<bench>', text)
+            else:
+                basic.run('<bench>', text, memo=memo)
+
+
+def main(rounds=400):
+    for name, value in zip('abcd', (1.5, 2, 7, 0)):
+        basic.globalSymbolTable.set(name, Number(value))
+    for text in FORMULAS:
+        value, error = basic.run('<bench>', text)
+        assert error is None and repr(value) == repr(basic.run('<bench>', text, memo=MemoCache())[0])
+
+    start = time.perf_counter()
+    session(None, rounds)
+    plain = rounds * len(FORMULAS) / (time.perf_counter() - start)
+
+    memo = MemoCache()
+    start = time.perf_counter()
+    session(memo, rounds)
+    memoized = rounds * len(FORMULAS) / (time.perf_counter() - start)
+
+    print(f'plain {plain:9.0f} runs/s  memoized {memoized:9.0f} runs/s  x{memoized / plain:.1f}')
+    print(memo.stats())
+
+
+if __name__ == '__main__':
+    main()
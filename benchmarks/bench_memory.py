@@ -0,0 +1,62 @@
+import os, sys, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.setrecursionlimit(100000)
+
+from lib.lexer import Lexer
+from lib.parser_ import Parser
+from lib.nodes import *
+from lib.interpreter import Interpreter, Context, Number
+from lib.symbols import SymbolTable
+
+##################################
+# MEMORY PER TOKEN / NODE
+##################################
+
+
+def generate(terms):
+    return ' + '.join(f'(v * {i}.5 - {i} ^ 2) / {i + 1}' for i in range(terms))
+
+
+def countNodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, BinaryOperationNode):
+            stack.append(node.leftNode)
+            stack.append(node.rightNode)
+        elif isinstance(node, UnaryOperationNode):
+            stack.append(node.node)
+        elif isinstance(node, VarAssignNode):
+            stack.append(node.nodeValue)
+    return count
+
+
+def main(terms=5000):
+    text = generate(terms)
+    tracemalloc.start()
+
+    base = tracemalloc.get_traced_memory()[0]
+    tokens, error = Lexer(text, '<bench>').make_token()
+    lexed = tracemalloc.get_traced_memory()[0]
+
+    ast = Parser(tokens).parse()
+    parsed = tracemalloc.get_traced_memory()[0]
+    nodes = countNodes(ast.node)
+
+    context = Context('<bench>')
+    context.symbolTable = SymbolTable()
+    context.symbolTable.set('v', Number(3))
+    tracemalloc.reset_peak()
+    result = Interpreter().visit(ast.node, context)
+    peak = tracemalloc.get_traced_memory()[1] - parsed
+
+    print(f'{len(tokens)} tokens, {nodes} nodes')
+    print(f'lex      {(lexed - base) / len(tokens):8.1f} bytes/token')
+    print(f'parse    {(parsed - lexed) / nodes:8.1f} bytes/node')
+    print(f'run peak {peak / nodes:8.1f} bytes/node')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,46 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.interpreter import Number
+from lib.numeric import DecimalBackend
+from timing import best
+
+##################################
+# NUMERIC BACKENDS
+##################################
+
+FORMULAS = [
+    'price * (1 + rate / 100) ^ years',
+    '(a - b) * c / (d + 1) + a ^ 2 - b / 3',
+    ' + '.join(f'a * {i}.25 / (b + {i})' for i in range(20)),
+]
+
+NUMERIC = ['default', 'float', 'fraction', 'decimal', DecimalBackend(50)]
+
+# each would take seconds and hundreds of kilobytes without the guard
+GUARDED = ['2 ^ 10000000', '3 ^ 2 ^ 20', '(7 / 3) ^ 5000000']
+
+
+def main(repeat=2000):
+    for name, value in zip(('price', 'rate', 'years', 'a', 'b', 'c', 'd'), (250, 3.5, 10, 3, 1.5, 7, 2)):
+        basic.globalSymbolTable.set(name, Number(value))
+
+    for text in FORMULAS:
+        print(text[:60])
+        for numeric in NUMERIC:
+            name = numeric if isinstance(numeric, str) else numeric.name
+            value, error = basic.run('<bench>', text, numeric=numeric)
+            rate = best(lambda: basic.run('<bench>', text, numeric=numeric), repeat)
+            print(f'    {name:24} {rate:9.0f}/s  {str(error or value)[:40]}')
+
+    for text in GUARDED:
+        for numeric in ('default', 'fraction'):
+            start = time.perf_counter()
+            value, error = basic.run('<bench>', text, numeric=numeric)
+            elapsed = time.perf_counter() - start
+            print(f'{text:20} {numeric:10} {elapsed * 1000:8.3f} ms  {error.details if error else value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.interpreter import Interpreter, Context, Number
+from lib.optimizer import Optimizer
+from lib.symbols import SymbolTable
+from timing import best
+
+##################################
+# CONSTANT FOLDING
+##################################
+
+EXPRESSIONS = [
+    '2 ^ 10 * (3 + 4)',
+    'x * (60 * 60 * 24) + --y * 1 - 0',
+    '(1.5 + 2.5) * x ^ 1 / (2 ^ 3 - 6) + 4 * (3 - 1) ^ 2',
+]
+
+
+def main(repeat=5000):
+    context = Context('<bench>')
+    context.symbolTable = SymbolTable()
+    context.symbolTable.set('x', Number(3))
+    context.symbolTable.set('y', Number(0.25))
+
+    interpreter = Interpreter()
+    for text in EXPRESSIONS:
+        node = basic.parse('<bench>', text).node
+        optimized = Optimizer().optimize(node)
+        assert repr(interpreter.visit(node, context).value) == repr(interpreter.visit(optimized, context).value)
+        plain = best(lambda: interpreter.visit(node, context), repeat)
+        folded = best(lambda: interpreter.visit(optimized, context), repeat)
+        print(f'{text[:40]:40} plain {plain:9.0f}/s  optimized {folded:9.0f}/s  x{folded / plain:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import os, sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.interpreter import Number
+from timing import best
+
+##################################
+# SYMBOL TABLE vs RESOLVED SLOTS
+##################################
+
+EXPRESSIONS = [
+    'a * b + c * d - a / b + c ^ 2',
+    ' + '.join(f'v{i % 8} * v{(i + 3) % 8}' for i in range(60)),
+    'var total = ' + ' + '.join(f'(a - b) * c / (d + {i})' for i in range(20)),
+]
+
+
+def main(repeat=2000):
+    for name, value in zip('abcd', (3, 1.5, 7, 2)):
+        basic.globalSymbolTable.set(name, Number(value))
+    for i in range(8):
+        basic.globalSymbolTable.set(f'v{i}', Number(i + 0.5))
+
+    for text in EXPRESSIONS:
+        assert repr(basic.run('<bench>', text)) == repr(basic.run('<bench>', text, resolve=True))
+        plain = best(lambda: basic.run('<bench>', text), repeat)
+        resolved = best(lambda: basic.run('<bench>', text, resolve=True), repeat)
+        print(f'{text[:40]:40} symbol table {plain:8.0f}/s  slots {resolved:8.0f}/s  x{resolved / plain:.2f}')
+
+
+if __name__ == '__main__':
+    main()
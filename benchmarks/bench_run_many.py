@@ -0,0 +1,33 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+
+##################################
+# RUN MANY SCALING
+##################################
+
+
+def generate(jobs):
+    return [
+        f'var x{i} = ' + ' + '.join(f'({i} * {j} - {j} ^ 2) / {j + 1}' for j in range(1, 30))
+        for i in range(jobs)
+    ]
+
+
+def main(jobs=4000):
+    sources = generate(jobs)
+    cpus = os.cpu_count() or 1
+    single = None
+    for workers in sorted({1, 2, 4, cpus}):
+        basic.parseCache.invalidate()
+        start = time.perf_counter()
+        results = basic.run_many(sources, workers=workers)
+        elapsed = time.perf_counter() - start
+        assert all(error is None for value, error in results)
+        single = single or elapsed
+        print(f'{workers:3} workers {jobs / elapsed:9.0f} jobs/s  speedup x{single / elapsed:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os, sys, time, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.symbols import SymbolTable
+
+##################################
+# STREAMED SCRIPTS
+##################################
+
+
+def script(statements):
+    # a generated program, produced in chunks of 1000 statements
+    for first in range(0, statements, 1000):
+        yield ''.join(
+            f'var v{i % 100} = (v{(i + 99) % 100} * {i}.5 - {i} ^ 2) / {i + 1}\n'
+            for i in range(first, min(first + 1000, statements))
+        )
+
+
+def seed():
+    symbolTable = SymbolTable(basic.globalSymbolTable)
+    for i in range(100):
+        basic.run('<seed>', f'var v{i} = {i}', cache=False, symbolTable=symbolTable)
+    return symbolTable
+
+
+def main(*paths):
+    # streams the given files, or generated scripts of growing length
+    if paths:
+        for path in paths:
+            with open(path, 'rb') as stream:
+                start = time.perf_counter()
+                value, error = basic.run_stream(stream, path)
+                print(f'{path}: {error.as_string() if error else value} in {time.perf_counter() - start:.2f}s')
+        return
+
+    for statements in (10000, 30000, 100000):
+        symbolTable = seed()
+        tracemalloc.start()
+        start = time.perf_counter()
+        value, error = basic.run_stream(script(statements), symbolTable=symbolTable)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        assert error is None, error.as_string()
+        print(f'{statements:8} statements  {statements / elapsed:8.0f}/s  peak {peak / 1024:8.1f} KiB')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
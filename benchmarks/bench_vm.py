@@ -0,0 +1,59 @@
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.lexer import Lexer
+from lib.parser_ import Parser
+from lib.interpreter import Interpreter, Context, Number
+from lib.symbols import SymbolTable
+from lib.compiler import Compiler
+from lib.vm import VM
+
+##################################
+# INTERPRETER vs VM
+##################################
+
+EXPRESSIONS = [
+    '1 + 2 * 3 - 4 / 5 + 6 ^ 2',
+    '(a + b) * (a - b) / (c + 1) - a ^ 2 + b * c',
+    ' + '.join(f'{i} * a - b / {i + 1}' for i in range(1, 40)),
+]
+
+
+def parse(text):
+    tokens, error = Lexer(text, '<bench>').make_token()
+    if error: raise Exception(error.as_string())
+    ast = Parser(tokens).parse()
+    if ast.error: raise Exception(ast.error.as_string())
+    return ast.node
+
+
+def timeit(fn, repeat):
+    best = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return repeat / best
+
+
+def main():
+    context = Context('<bench>')
+    context.symbolTable = SymbolTable()
+    for name, value in (('a', 3), ('b', 1.5), ('c', 7)):
+        context.symbolTable.set(name, Number(value))
+
+    interpreter = Interpreter()
+    vm = VM()
+    for text in EXPRESSIONS:
+        node = parse(text)
+        code = Compiler().compile(node)
+        assert repr(interpreter.visit(node, context).value) == repr(vm.run(code, context).value)
+        repeat = max(200, 20000 // len(text))
+        tree = timeit(lambda: interpreter.visit(node, context), repeat)
+        stack = timeit(lambda: vm.run(code, context), repeat)
+        print(f'{text[:40]:40} interpreter {tree:10.0f}/s  vm {stack:10.0f}/s  x{stack / tree:.1f}')
+
+
+if __name__ == '__main__':
+    main()
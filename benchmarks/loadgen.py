@@ -0,0 +1,120 @@
+import os, sys, time, asyncio, json, random, threading
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server
+
+##################################
+# LOAD GENERATOR
+##################################
+
+# python benchmarks/loadgen.py [--connect HOST:PORT] [--requests N]
+#                              [--connections N] [--depth N] [--workers N]
+# Without --connect a server is started in this process on a free port.
+
+FORMULAS = [
+    'price * (1 + rate / 100) ^ years',
+    '(a - b) * c / (d + 1) + a ^ 2 - b / 3',
+    ' + '.join(f'(a * {i} - b) / (c + {i})' for i in range(20)),
+    '1 / 0',
+]
+SETUP = 'var price = 250; var rate = 3.5; var years = 10; var a = 3; var b = 1.5; var c = 7; var d = 2'
+
+
+def requestFor(index, rng):
+    if rng.random() < 0.5:
+        # one of 50 sessions, their variables are defined by setup()
+        return {'id': index, 'source': rng.choice(FORMULAS), 'session': f's{index % 50}'}
+    # sessionless requests read no variables
+    return {'id': index, 'source': f'{rng.randint(1, 20)} * (3 + 4) ^ 2 / 7'}
+
+
+async def client(host, port, requests, depth, latencies):
+    # keeps up to `depth` requests outstanding on one connection
+    reader, writer = await asyncio.open_connection(host, port, limit=1 << 20)
+    sent = {}
+    window = asyncio.Semaphore(depth)
+
+    async def receive():
+        for _ in range(len(requests)):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent.pop(response['id']))
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for request in requests:
+        await window.acquire()
+        sent[request['id']] = time.perf_counter()
+        writer.write(json.dumps(request).encode() + b'\n')
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def setup(host, port, sessions):
+    reader, writer = await asyncio.open_connection(host, port)
+    for session in sessions:
+        writer.write(json.dumps({'source': SETUP, 'session': session}).encode() + b'\n')
+    for _ in sessions:
+        response = json.loads(await reader.readline())
+        assert 'error' not in response, response
+    writer.close()
+
+
+async def stats(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"op": "stats"}\n')
+    response = json.loads(await reader.readline())
+    writer.close()
+    return response['stats']
+
+
+async def load(host, port, total, connections, depth):
+    rng = random.Random(0)
+    requests = [requestFor(index, rng) for index in range(total)]
+    await setup(host, port, sorted({request['session'] for request in requests if 'session' in request}))
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, requests[index::connections], depth, latencies)
+        for index in range(connections)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f'{total} requests over {connections} connections, {depth} outstanding each')
+    print(f'{total / elapsed:9.0f} requests/s')
+    for p in (0.5, 0.9, 0.99):
+        print(f'    p{round(p * 100)} {latencies[int(p * (len(latencies) - 1))] * 1000:8.3f} ms')
+    print(json.dumps(await stats(host, port), indent=2))
+
+
+def startServer(workers):
+    # runs a server on a thread of its own, returns its port
+    started = threading.Event()
+    address = []
+
+    def listening(listener):
+        address.append(listener.sockets[0].getsockname()[1])
+        started.set()
+
+    instance = server.Server(workers=workers)
+    thread = threading.Thread(target=asyncio.run, args=(instance.serve('127.0.0.1', 0, started=listening),),
+                              daemon=True)
+    thread.start()
+    started.wait()
+    return address[0]
+
+
+def main():
+    args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+    if '--connect' in args:
+        host, port = args['--connect'].rsplit(':', 1)
+    else:
+        host, port = '127.0.0.1', startServer(int(args.get('--workers', 0)) or None)
+    asyncio.run(load(host, int(port), int(args.get('--requests', 20000)),
+                     int(args.get('--connections', 8)), int(args.get('--depth', 32))))
+
+
+if __name__ == '__main__':
+    main()
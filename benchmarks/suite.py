@@ -0,0 +1,182 @@
+import os, sys, time, json, platform, tracemalloc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.setrecursionlimit(100000)
+
+import basic
+from lib.lexer import Lexer
+from lib.parser_ import Parser
+from lib.interpreter import Interpreter, Context
+from lib.symbols import SymbolTable
+
+##################################
+# BENCHMARK SUITE
+##################################
+
+# python benchmarks/suite.py [--output results.json] [--baseline baseline.json]
+#                            [--threshold 0.2] [--only NAME] [--quick]
+#
+# Runs every stage on every workload and prints ops/s, latency percentiles
+# and peak memory. --output saves the results as JSON, --baseline compares
+# them against earlier saved results: the run fails (exit status 1) when a
+# case got slower, or its peak memory grew, by more than the threshold.
+
+# peak memory growth below this many bytes is never a regression, a few
+# hundred bytes more of a tiny peak is noise
+MEMORY_SLACK = 64 * 1024
+
+
+def flatSum(terms=5000):
+    return ' + '.join(f'{i}' for i in range(terms))
+
+
+def deepNesting(depth=400):
+    return '(' * depth + '1' + ''.join(f' + {i})' for i in range(depth))
+
+
+def manyVariables(count=2000):
+    lines = [f'var v{i} = {i} * 2 - 1' for i in range(count)]
+    lines.append(' + '.join(f'v{i}' for i in range(0, count, 7)))
+    return '\n'.join(lines)
+
+
+def heavyPower(terms=500):
+    return ' + '.join(f'{i % 50 + 2} ^ {i % 40 + 10} - {i}.5 ^ 2' for i in range(terms))
+
+
+def mixedNumbers(terms=1500):
+    return ' + '.join(f'({i} * {i}.25 - {i + 1} / 3) * -{i % 7}' for i in range(terms))
+
+
+WORKLOADS = {
+    'flat_sum': flatSum,
+    'deep_nesting': deepNesting,
+    'many_variables': manyVariables,
+    'heavy_power': heavyPower,
+    'mixed_numbers': mixedNumbers,
+}
+
+
+def freshContext():
+    context = Context('<suite>')
+    context.symbolTable = SymbolTable(basic.globalSymbolTable)
+    return context
+
+
+def stages(text):
+    # stage name -> a call running just that stage, on input prepared by
+    # the ones before it
+    tokens, error = Lexer(text, '<suite>').make_token()
+    assert error is None, error.as_string()
+    ast = Parser(tokens).program()
+    assert ast.error is None, ast.error.as_string()
+    node = ast.node
+
+    return {
+        'lex': lambda: Lexer(text, '<suite>').make_token(),
+        'parse': lambda: Parser(tokens).program(),
+        'interpret': lambda: Interpreter().run(node, freshContext()),
+        # every stage, through basic.run without its parse cache
+        'run': lambda: basic.run('<suite>', text, cache=False, symbolTable=SymbolTable(basic.globalSymbolTable)),
+    }
+
+
+def measure(fn, minTime, minRuns):
+    # latencies of at least minRuns calls, and calls for at least minTime
+    # seconds, after a warm-up call
+    fn()
+    latencies = []
+    total = 0
+    while len(latencies) < minRuns or total < minTime:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        total += elapsed
+    return latencies
+
+
+def peakMemory(fn):
+    # bytes allocated at the peak of one call, beyond what was live before
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def runSuite(only=None, minTime=0.5, minRuns=10):
+    results = {}
+    for workload, generate in WORKLOADS.items():
+        text = generate()
+        for stage, fn in stages(text).items():
+            name = f'{workload}/{stage}'
+            if only and only not in name: continue
+            latencies = sorted(measure(fn, minTime, minRuns))
+            results[name] = {
+                # from the median, which noise moves less than the mean
+                'opsPerSec': 1 / percentile(latencies, 0.5),
+                'p50Ms': percentile(latencies, 0.5) * 1000,
+                'p90Ms': percentile(latencies, 0.9) * 1000,
+                'p99Ms': percentile(latencies, 0.99) * 1000,
+                'runs': len(latencies),
+                'peakBytes': peakMemory(fn),
+            }
+            report(name, results[name])
+    return results
+
+
+def report(name, result):
+    print(f'{name:28} {result["opsPerSec"]:10.1f} ops/s  p50 {result["p50Ms"]:9.3f} ms  '
+          f'p90 {result["p90Ms"]:9.3f} ms  p99 {result["p99Ms"]:9.3f} ms  peak {result["peakBytes"] / 1024:9.1f} KiB')
+
+
+def compare(results, baseline, threshold):
+    # regressions as (case, what, old, new) tuples
+    regressions = []
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None: continue
+        if result['opsPerSec'] < old['opsPerSec'] * (1 - threshold):
+            regressions.append((name, 'ops/s', old['opsPerSec'], result['opsPerSec']))
+        if result['peakBytes'] > max(old['peakBytes'] * (1 + threshold), old['peakBytes'] + MEMORY_SLACK):
+            regressions.append((name, 'peak bytes', old['peakBytes'], result['peakBytes']))
+    return regressions
+
+
+def main():
+    quick = '--quick' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--quick']
+    options = dict(zip(args[::2], args[1::2]))
+    threshold = float(options.get('--threshold', 0.2))
+
+    results = runSuite(options.get('--only'), *((0.05, 3) if quick else (0.5, 10)))
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    if '--output' in options:
+        with open(options['--output'], 'w') as file:
+            json.dump(document, file, indent=2)
+
+    if '--baseline' in options:
+        with open(options['--baseline']) as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, threshold)
+        for name, what, old, new in regressions:
+            print(f'REGRESSION {name}: {what} {old:.1f} -> {new:.1f} ({(new - old) / old:+.0%})')
+        if regressions:
+            sys.exit(1)
+        print(f'no regressions past {threshold:.0%} against {options["--baseline"]}')
+
+
+if __name__ == '__main__':
+    main()
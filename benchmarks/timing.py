@@ -0,0 +1,19 @@
+import time
+
+##################################
+# TIMING
+##################################
+
+# Shared by the benchmarks. Importing it has no side effects, unlike
+# importing suite.
+
+
+def best(fn, repeat, rounds=5):
+    # calls per second, from the fastest of rounds runs of repeat calls
+    result = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        result = min(result, time.perf_counter() - start)
+    return repeat / result
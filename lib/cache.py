@@ -0,0 +1,81 @@
+from collections import OrderedDict
+
+##################################
+# PARSE CACHE
+##################################
+
+
+class CacheEntry:
+    __slots__ = ('node', 'error', 'compiled')
+
+    def __init__(self, node, error):
+        self.node = node
+        self.error = error
+        # engine name -> compiled form of node, filled in by the engines
+        self.compiled = {}
+
+
+class ParseCache:
+    # LRU of parse results keyed by (file name, source text). Lex and parse
+    # errors are cached too, so a hit reports exactly what a miss would.
+    def __init__(self, maxSize=1024):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, fileName, text):
+        entry = self.entries.get((fileName, text))
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end((fileName, text))
+        return entry
+
+    def put(self, fileName, text, node, error):
+        entry = CacheEntry(node, error)
+        if self.maxSize <= 0:
+            return entry
+        self.entries[(fileName, text)] = entry
+        self.evict()
+        return entry
+
+    def evict(self):
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxSize):
+        self.maxSize = maxSize
+        if maxSize <= 0:
+            self.evictions += len(self.entries)
+            self.entries.clear()
+        self.evict()
+
+    def invalidate(self, fileName=None, text=None):
+        # Drops matching entries (everything when called without
+        # arguments) and returns how many were removed
+        if fileName is not None and text is not None:
+            return 1 if self.entries.pop((fileName, text), None) else 0
+        keys = [
+            key for key in self.entries
+            if (fileName is None or key[0] == fileName)
+            and (text is None or key[1] == text)
+        ]
+        for key in keys:
+            del self.entries[key]
+        return len(keys)
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxSize': self.maxSize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,479 @@
+import ast
+from .tokens import *
+from .nodes import *
+from .errors import RTError
+from .numeric import power, truthValues
+from .interpreter import Interpreter, RTResult, Number, EvaluationAbort, powerError
+
+##################################
+# CODE GENERATOR
+##################################
+
+# '+', '-' and '*' become the Python operators, the rest calls helpers
+PYTHON_OPERATORS = {
+    TT_PLUS: ast.Add,
+    TT_MINUS: ast.Sub,
+    TT_MUL: ast.Mult,
+    TT_DIV: ast.Div,
+}
+
+COMPARE_OPERATORS = {
+    TT_EE: ast.Eq,
+    TT_NE: ast.NotEq,
+    TT_LT: ast.Lt,
+    TT_GT: ast.Gt,
+    TT_LTE: ast.LtE,
+    TT_GTE: ast.GtE,
+}
+
+# Python's compiler recurses on nested expressions, deeper ones are split
+# into statements computing temporaries
+MAX_EXPRESSION_DEPTH = 100
+
+# a variable's local before it is defined
+UNDEFINED = object()
+
+
+class CodeGenerator:
+    # Translates a tree into the Python function
+    #
+    #     def program(context, load, store, power, divisionByZero, undefined, convert, charge, measure, U, consts):
+    #         v0 = load(0, context)          # every variable, up front
+    #         ...
+    #         return (v0 if v0 is not U else undefined(3, context)) * 2 + ...
+    #
+    # Variables live in locals for the whole run: read once at the start
+    # and written through on every assignment, so reading one costs a
+    # local lookup. Values, evaluation order and errors are those of
+    # Interpreter.run. With a backend, like the interpreter, reads convert
+    # what is not of its numberType (the 1 or 0 of a comparison, the float
+    # of a fractional power): `v0 if v0.__class__ is k0 else convert(...)`.
+    #
+    # '/' is Python's, but its divisor, unless a literal other than 0, is
+    # checked first like the interpreter does: `a / (b or
+    # divisionByZero(i, context))`. Python converts an int to a float
+    # before it sees the 0 of 10 ^ 400 / 0.0, and decimal infinity / 0 is
+    # infinite. Comparisons are Python's, each
+    # on its own line for the TypeError of ordering complex numbers (see
+    # CompiledProgram.run).
+    #
+    # 'and', 'or' and chained comparisons become conditional expressions,
+    # or if statements when an operand they may skip needs statements.
+    #
+    # A MeterNode charges its chunk with `charge(i, context) or ...`, or a
+    # statement ahead of those its node needs, and measures with
+    # measure(i, value, context), which hands the value back, unless it is a
+    # float.
+
+    def compile(self, node, backend=None):
+        self.backend = backend
+        self.statements = []
+        self.temporaries = 0
+        self.variables = {}
+        # nodes the helpers are called with, by index
+        self.reads = []
+        # indices of the reads first used by an assignment that always runs
+        self.assignedFirst = set()
+        # > 0 while visiting an operand 'and', 'or' or a chain may skip
+        self.skippable = 0
+        self.accesses = []
+        self.assignments = []
+        self.powers = []
+        self.meters = []
+        self.consts = []
+        if backend is not None:
+            # k0, and the backend's 0 and 1 comparisons give as k1 and k2
+            self.consts.append(backend.numberType)
+            self.consts.extend(truthValues(backend))
+        # line number -> (left, right) operand nodes of a comparison
+        self.line = 1
+        self.comparisons = {}
+        self.checkedDivisions = []
+
+        if isinstance(node, ProgramNode):
+            statements = node.statements
+        else:
+            statements = [node]
+        for index, statement in enumerate(statements):
+            expression, depth = self.visit(statement)
+            if index == len(statements) - 1:
+                self.statements.append(ast.Return(expression))
+            else:
+                self.statements.append(ast.Expr(expression))
+
+        # a variable assigned before it is first read needs no load
+        prologue = [
+            self.assign(f'v{index}', self.load('U') if index in self.assignedFirst else
+                        self.call('load', ast.Constant(index), self.load('context')))
+            for index in range(len(self.reads))
+        ] + [
+            self.assign(f'k{index}', ast.Subscript(self.load('consts'), ast.Constant(index), ast.Load()))
+            for index in range(len(self.consts))
+        ]
+        arguments = ['context', 'load', 'store', 'power', 'divisionByZero', 'undefined', 'convert', 'charge', 'measure',
+                     'U', 'consts']
+        function = ast.FunctionDef(
+            name='program',
+            args=ast.arguments(
+                posonlyargs=[], args=[ast.arg(name) for name in arguments], kwonlyargs=[],
+                kw_defaults=[], defaults=[]
+            ),
+            body=prologue + (self.statements or [ast.Return(ast.Constant(None))]),
+            decorator_list=[],
+        )
+        module = ast.Module(body=[function], type_ignores=[])
+        locate(module)
+
+        namespace = {}
+        exec(compile(module, '<codegen>', 'exec'), namespace)
+        return CompiledProgram(self, namespace['program'], node)
+
+    def visit(self, node):
+        # returns the Python expression computing node and how deeply
+        # nested it is
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        expression, depth = method(node)
+        if depth >= MAX_EXPRESSION_DEPTH:
+            return self.hoist(expression), 1
+        return expression, depth
+
+    def noVisitMethod(self, node):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def visitNumberNode(self, node):
+        value = node.token.value
+        if type(value) in (int, float):
+            return ast.Constant(value), 1
+        # fractions and decimals are no Python constants
+        self.consts.append(value)
+        return self.load(f'k{len(self.consts) - 1}'), 1
+
+    def visitVarAccessNode(self, node):
+        local = self.variable(node)
+        self.accesses.append(node)
+        if self.backend is not None:
+            expression = ast.IfExp(
+                ast.Compare(ast.Attribute(self.load(local), '__class__', ast.Load()), [ast.Is()], [self.load('k0')]),
+                self.load(local),
+                self.call('convert', ast.Constant(len(self.accesses) - 1), self.load(local), self.load('context')),
+            )
+            return expression, 2
+        expression = ast.IfExp(
+            ast.Compare(self.load(local), [ast.IsNot()], [self.load('U')]),
+            self.load(local),
+            self.call('undefined', ast.Constant(len(self.accesses) - 1), self.load('context')),
+        )
+        return expression, 2
+
+    def visitVarAssignNode(self, node):
+        value, depth = self.visit(node.nodeValue)
+        local = self.variable(node)
+        self.assignments.append(node)
+        stored = self.call('store', ast.Constant(len(self.assignments) - 1), value, self.load('context'))
+        return ast.NamedExpr(ast.Name(local, ast.Store()), stored), depth + 1
+
+    def visitMeterNode(self, node):
+        self.meters.append(node)
+        index = ast.Constant(len(self.meters) - 1)
+        mark = len(self.statements)
+        expression, depth = self.visit(node.node)
+        if node.cost:
+            charge = self.call('charge', index, self.load('context'))
+            if len(self.statements) > mark:
+                self.statements.insert(mark, ast.Expr(charge))
+            else:
+                expression, depth = ast.BoolOp(ast.Or(), [charge, expression]), depth + 1
+        if node.measured:
+            # floats have a fixed size, only other values are measured
+            local = self.temporary()
+            expression = ast.IfExp(
+                ast.Compare(
+                    ast.Attribute(ast.NamedExpr(ast.Name(local, ast.Store()), expression), '__class__', ast.Load()),
+                    [ast.Is()], [self.load('float')]),
+                self.load(local),
+                self.call('measure', index, self.load(local), self.load('context')),
+            )
+            depth += 2
+        return expression, depth
+
+    def visitUnaryOperationNode(self, node):
+        operand, depth = self.visit(node.node)
+        if node.opToken.type == TT_MINUS:
+            return ast.BinOp(operand, ast.Mult(), ast.Constant(-1)), depth + 1
+        if node.opToken.type == TT_KEYWORD:
+            isFalse = ast.Compare(operand, [ast.Eq()], [ast.Constant(0)])
+            return self.oneOrZero(isFalse), depth + 2
+        return operand, depth
+
+    def visitBinaryOperationNode(self, node):
+        if node.opToken.type == TT_KEYWORD:
+            return self.logicalOperation(node)
+        left, leftDepth = self.visit(node.leftNode)
+        mark = len(self.statements)
+        right, rightDepth = self.visit(node.rightNode)
+        if len(self.statements) > mark and not isinstance(left, ast.Constant):
+            # the right operand needed statements, the left one has to be
+            # computed before them
+            self.statements.insert(mark, self.assign(self.temporary(), left))
+            left, leftDepth = self.load(f't{self.temporaries - 1}'), 1
+        depth = max(leftDepth, rightDepth) + 1
+
+        opType = node.opToken.type
+        if opType == TT_POW:
+            self.powers.append(node)
+            return self.call('power', left, right, ast.Constant(len(self.powers) - 1), self.load('context')), depth
+        if opType == TT_DIV and not self.nonzeroLiteral(node.rightNode):
+            # left / (right or divisionByZero(i, context))
+            self.checkedDivisions.append(node)
+            index = ast.Constant(len(self.checkedDivisions) - 1)
+            right = ast.BoolOp(ast.Or(), [right, self.call('divisionByZero', index, self.load('context'))])
+            depth += 1
+        if opType in COMPARISON_TYPES:
+            return self.oneOrZero(self.comparison(left, opType, right, node.leftNode, node.rightNode)), depth + 2
+        return ast.BinOp(left, PYTHON_OPERATORS[opType](), right), depth
+
+    def nonzeroLiteral(self, node):
+        return type(node) is NumberNode and node.token.value != 0
+
+    def logicalOperation(self, node):
+        left, leftDepth = self.visit(node.leftNode)
+        mark = len(self.statements)
+        self.skippable += 1
+        right, rightDepth = self.visit(node.rightNode)
+        self.skippable -= 1
+        isAnd = node.opToken.value == 'and'
+        decided = self.truthValue(0 if isAnd else 1)
+        rightValue = self.oneOrZero(self.isTrue(right))
+
+        if len(self.statements) == mark:
+            if isAnd:
+                expression = ast.IfExp(self.isTrue(left), rightValue, decided)
+            else:
+                expression = ast.IfExp(self.isTrue(left), decided, rightValue)
+            return expression, max(leftDepth, rightDepth) + 3
+
+        # the statements of the right operand only run when the left one
+        # does not decide
+        statements = self.statements[mark:] + [self.assign(self.temporary(), rightValue)]
+        result = self.temporaries - 1
+        del self.statements[mark:]
+        otherwise = [self.assign(f't{result}', decided)]
+        if isAnd:
+            self.statements.append(ast.If(self.isTrue(left), statements, otherwise))
+        else:
+            self.statements.append(ast.If(self.isTrue(left), otherwise, statements))
+        return self.load(f't{result}'), 1
+
+    def visitChainedComparisonNode(self, node):
+        operands = node.operands
+        opTypes = [opToken.type for opToken in node.opTokens]
+        first, depth = self.visit(operands[0])
+        # (statements, expression) of the operands after the first
+        rest = []
+        for index, operand in enumerate(operands[1:]):
+            mark = len(self.statements)
+            # the first comparison always runs
+            if index: self.skippable += 1
+            expression, operandDepth = self.visit(operand)
+            if index: self.skippable -= 1
+            rest.append((self.statements[mark:], expression))
+            del self.statements[mark:]
+            depth = max(depth, operandDepth)
+
+        if not any(statements for statements, expression in rest):
+            # a < (t0 := b) and t0 < c, every comparison on its own line
+            tests = []
+            left = first
+            for index, (statements, right) in enumerate(rest):
+                following = None
+                if index < len(rest) - 1:
+                    local = self.temporary()
+                    right, following = ast.NamedExpr(ast.Name(local, ast.Store()), right), self.load(local)
+                tests.append(self.comparison(left, opTypes[index], right, operands[index], operands[index + 1]))
+                left = following
+            test = tests[0] if len(tests) == 1 else ast.BoolOp(ast.And(), tests)
+            return self.oneOrZero(test), depth + 4
+
+        # one step per comparison, each but the first guarded by the result
+        # so far: nothing after a false one runs
+        result = self.temporary()
+        left = self.temporary()
+        self.statements.append(self.assign(left, first))
+        for index, (statements, right) in enumerate(rest):
+            local = self.temporary()
+            test = self.comparison(self.load(left), opTypes[index], self.load(local), operands[index], operands[index + 1])
+            step = statements + [
+                self.assign(local, right),
+                self.assign(result, self.oneOrZero(test)),
+            ]
+            if index:
+                self.statements.append(ast.If(self.load(result), step, []))
+            else:
+                self.statements.extend(step)
+            left = local
+        return self.load(result), 1
+
+    def comparison(self, left, opType, right, leftNode, rightNode):
+        test = ast.Compare(left, [COMPARE_OPERATORS[opType]()], [right])
+        self.comparisons[self.ownLine(test)] = (leftNode, rightNode)
+        return test
+
+    # Python AST helpers
+
+    def ownLine(self, expression):
+        # puts expression on a line of its own, returns the line
+        self.line += 1
+        expression.lineno = expression.end_lineno = self.line
+        return self.line
+
+    def isTrue(self, expression):
+        return ast.Compare(expression, [ast.NotEq()], [ast.Constant(0)])
+
+    def oneOrZero(self, test):
+        return ast.IfExp(test, self.truthValue(1), self.truthValue(0))
+
+    def truthValue(self, value):
+        if self.backend is None: return ast.Constant(value)
+        return self.load(f'k{value + 1}')
+
+    def variable(self, node):
+        name = node.varNameToken.value
+        index = self.variables.get(name)
+        if index is None:
+            index = self.variables[name] = len(self.reads)
+            self.reads.append(node)
+            if isinstance(node, VarAssignNode) and not self.skippable:
+                self.assignedFirst.add(index)
+        return f'v{index}'
+
+    def temporary(self):
+        self.temporaries += 1
+        return f't{self.temporaries - 1}'
+
+    def hoist(self, expression):
+        local = self.temporary()
+        self.statements.append(self.assign(local, expression))
+        return self.load(local)
+
+    def assign(self, name, value):
+        return ast.Assign([ast.Name(name, ast.Store())], value)
+
+    def load(self, name):
+        return ast.Name(name, ast.Load())
+
+    def call(self, function, *arguments):
+        return ast.Call(self.load(function), list(arguments), [])
+
+
+def locate(module):
+    # everything not put on a line of its own is on line 1
+    for node in ast.walk(module):
+        if 'lineno' in node._attributes and not hasattr(node, 'lineno'):
+            node.lineno = node.end_lineno = 1
+        if 'col_offset' in node._attributes:
+            node.col_offset = node.end_col_offset = 0
+
+
+##################################
+# COMPILED PROGRAM
+##################################
+
+
+class CompiledProgram:
+    def __init__(self, generator, function, node):
+        self.function = function
+        self.code = function.__code__
+        self.reads = generator.reads
+        self.accesses = generator.accesses
+        self.assignments = generator.assignments
+        self.powers = generator.powers
+        self.meters = generator.meters
+        self.consts = generator.consts
+        self.comparisons = generator.comparisons
+        self.checkedDivisions = generator.checkedDivisions
+        self.node = node
+        # stores box values like the interpreter does
+        self.interpreter = Interpreter()
+
+    def run(self, context):
+        res = RTResult()
+        try:
+            value = self.function(
+                context, self.load, self.store, self.power, self.divisionByZero, self.undefined, self.convert, self.charge,
+                self.measure, UNDEFINED, self.consts
+            )
+        except EvaluationAbort as abort:
+            return res.failure(abort.error)
+        except TypeError as error:
+            operands = self.comparisons.get(self.failedLine(error))
+            if operands is None: raise
+            left, right = operands
+            return res.failure(RTError(
+                positionNode(left).startPos, positionNode(right).endPos,
+                "Illegal operation", context
+            ))
+        if value is None: return res.success(None)
+        return res.success(
+            Number(value).setSpan(positionNode(self.node)).setContext(context)
+        )
+
+    def failedLine(self, error):
+        # the line of the generated code error was raised at
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code is self.code:
+                return traceback.tb_lineno
+            traceback = traceback.tb_next
+        return None
+
+    # helpers the generated code calls
+
+    def load(self, index, context):
+        node = self.reads[index]
+        frame = context.frame
+        if frame is not None and node.slot is not None:
+            for _ in range(node.depth): frame = frame.parent
+            value = frame.slots[node.slot]
+        else:
+            value = context.symbolTable.get(node.varNameToken.value)
+        if not value:
+            return UNDEFINED
+        if context.backend is not None:
+            return context.backend.convert(value.value)
+        return value.value
+
+    def undefined(self, index, context):
+        node = self.accesses[index]
+        raise EvaluationAbort(RTError(
+            node.startPos, node.endPos,
+            f"'{node.varNameToken.value}' is not defined", context
+        ))
+
+    def convert(self, index, value, context):
+        if value is UNDEFINED: self.undefined(index, context)
+        return context.backend.convert(value)
+
+    def store(self, index, value, context):
+        return self.interpreter.store(self.assignments[index], value, context)
+
+    def divisionByZero(self, index, context):
+        span = positionNode(self.checkedDivisions[index].rightNode)
+        raise EvaluationAbort(RTError(
+            span.startPos, span.endPos,
+            "Division by Zero", context
+        ))
+
+    def power(self, left, right, index, context):
+        value = power(left, right)
+        if type(value) is str: raise EvaluationAbort(powerError(self.powers[index], value, context))
+        return value
+
+    def charge(self, index, context):
+        error = context.meter.charge(self.meters[index], context)
+        if error: raise EvaluationAbort(error)
+
+    def measure(self, index, value, context):
+        error = context.meter.measure(self.meters[index], value, context)
+        if error: raise EvaluationAbort(error)
+        return value
@@ -0,0 +1,192 @@
+import math
+from decimal import Decimal
+from .tokens import *
+from .nodes import *
+
+##################################
+# OPCODES
+##################################
+
+OP_CONST = 0
+OP_LOAD = 1
+OP_STORE = 2
+OP_ADD = 3
+OP_SUB = 4
+OP_MUL = 5
+OP_DIV = 6
+OP_POW = 7
+OP_NEG = 8
+OP_POP = 9
+# comparisons take the index of their operator in COMPARISON_TYPES
+OP_COMPARE = 10
+# a comparison of a chain but the last: 0 and a jump to the end of the
+# chain when false, else the right operand stays for the next one
+OP_CHAIN = 11
+# leave 0 ('and') or 1 ('or') and jump when the value on top decides,
+# else pop it
+OP_AND = 12
+OP_OR = 13
+# 1 or 0 for the value on top being true
+OP_TRUTH = 14
+OP_NOT = 15
+# the cost of a MeterNode's chunk is charged, or the value on top of the
+# stack measured, see limits.py
+OP_METER = 16
+OP_MEASURE = 17
+
+BINARY_OPCODES = {
+    TT_PLUS: OP_ADD,
+    TT_MINUS: OP_SUB,
+    TT_MUL: OP_MUL,
+    TT_DIV: OP_DIV,
+    TT_POW: OP_POW,
+}
+
+##################################
+# CODE OBJECT
+##################################
+
+
+class CodeObject:
+    def __init__(self, instructions, consts, names, spans, node):
+        # instructions is a flat list of ints, opcodes taking arguments are
+        # followed by them (an index into consts, names or COMPARISON_TYPES,
+        # or the index of the instruction a jump goes to)
+        self.instructions = instructions
+        self.consts = consts
+        self.names = names
+        # maps the index of an instruction that can fail to the node
+        # whose positions the resulting error should point at, a
+        # comparison's to its (left, right) operand nodes, a power's and a
+        # meter's to their node
+        self.spans = spans
+        self.node = node
+
+    def __repr__(self):
+        return f'<CodeObject {len(self.instructions)} ints, {len(self.consts)} consts>'
+
+
+##################################
+# COMPILER
+##################################
+
+
+class Compiler:
+    def compile(self, node):
+        self.instructions = []
+        self.consts = []
+        self.constIndex = {}
+        self.names = []
+        self.nameIndex = {}
+        self.spans = {}
+        self.visit(node)
+        return CodeObject(self.instructions, self.consts, self.names, self.spans, node)
+
+    def visit(self, node):
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        return method(node)
+
+    def noVisitMethod(self, node):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def emit(self, op, *args, span=None):
+        if span is not None:
+            self.spans[len(self.instructions)] = span
+        self.instructions.append(op)
+        self.instructions.extend(args)
+
+    def jump(self, op, *args, span=None):
+        # emits a jump whose target is patched in later, returns where
+        self.emit(op, *args, -1, span=span)
+        return len(self.instructions) - 1
+
+    def patch(self, index):
+        # makes the jump at index go to the next instruction emitted
+        self.instructions[index] = len(self.instructions)
+
+    def const(self, value):
+        # keyed on the type and value, so that 1 and 1.0 stay distinct, and
+        # on what equal values differ in where it shows: the sign of a zero,
+        # a decimal's exponent. Not on the repr, which an int of over 4300
+        # digits has none of.
+        valueType = type(value)
+        if valueType is float:
+            key = (valueType, value, math.copysign(1, value))
+        elif valueType is complex:
+            key = (valueType, value, math.copysign(1, value.real), math.copysign(1, value.imag))
+        elif valueType is Decimal:
+            key = (valueType, value.as_tuple())
+        else:
+            key = (valueType, value)
+        if key not in self.constIndex:
+            self.constIndex[key] = len(self.consts)
+            self.consts.append(value)
+        return self.constIndex[key]
+
+    def name(self, varName):
+        if varName not in self.nameIndex:
+            self.nameIndex[varName] = len(self.names)
+            self.names.append(varName)
+        return self.nameIndex[varName]
+
+    def visitProgramNode(self, node):
+        # every statement leaves its value on the stack, only the last one
+        # is kept
+        for index, statement in enumerate(node.statements):
+            if index: self.emit(OP_POP)
+            self.visit(statement)
+
+    def visitNumberNode(self, node):
+        self.emit(OP_CONST, self.const(node.token.value))
+
+    def visitVarAccessNode(self, node):
+        self.emit(OP_LOAD, self.name(node.varNameToken.value), span=node)
+
+    def visitVarAssignNode(self, node):
+        self.visit(node.nodeValue)
+        self.emit(OP_STORE, self.name(node.varNameToken.value))
+
+    def visitBinaryOperationNode(self, node):
+        opToken = node.opToken
+        self.visit(node.leftNode)
+        if opToken.type == TT_KEYWORD:
+            end = self.jump(OP_AND if opToken.value == 'and' else OP_OR)
+            self.visit(node.rightNode)
+            self.emit(OP_TRUTH)
+            self.patch(end)
+            return
+        self.visit(node.rightNode)
+        if opToken.type in COMPARISON_TYPES:
+            self.emit(OP_COMPARE, COMPARISON_TYPES.index(opToken.type), span=(node.leftNode, node.rightNode))
+        elif opToken.type == TT_POW:
+            self.emit(OP_POW, span=node)
+        else:
+            self.emit(BINARY_OPCODES[opToken.type], span=positionNode(node.rightNode))
+
+    def visitChainedComparisonNode(self, node):
+        operands = node.operands
+        self.visit(operands[0])
+        jumps = []
+        for index, opToken in enumerate(node.opTokens):
+            self.visit(operands[index + 1])
+            kind = COMPARISON_TYPES.index(opToken.type)
+            span = (operands[index], operands[index + 1])
+            if index == len(node.opTokens) - 1:
+                self.emit(OP_COMPARE, kind, span=span)
+            else:
+                jumps.append(self.jump(OP_CHAIN, kind, span=span))
+        for index in jumps:
+            self.patch(index)
+
+    def visitMeterNode(self, node):
+        if node.cost: self.emit(OP_METER, span=node)
+        self.visit(node.node)
+        if node.measured: self.emit(OP_MEASURE, span=node)
+
+    def visitUnaryOperationNode(self, node):
+        self.visit(node.node)
+        if node.opToken.type == TT_MINUS:
+            self.emit(OP_NEG)
+        elif node.opToken.type == TT_KEYWORD:
+            self.emit(OP_NOT)
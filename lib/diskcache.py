@@ -0,0 +1,292 @@
+import os, sys, mmap, marshal, struct, hashlib, tempfile
+from array import array
+from .tokens import *
+from .nodes import *
+from .source import Source
+
+##################################
+# TREE SERIALIZATION
+##################################
+
+# A tree is stored as its nodes in post-order, in four columns: the kind
+# of every node (one byte each), its value (a number, a variable name, an
+# operator's token type or keyword, a program's statement count or a
+# chain's comparison count), and the start and end offsets of its token
+# (its own for a ProgramNode or ChainedComparisonNode), as little-endian
+# 32 bit ints. The operands of a chain come interleaved with its operator
+# tokens, stored as OPERATOR entries. Decoding pushes every node and pops
+# its children off the same stack. The columns are written with marshal,
+# whose loads runs in C.
+NUMBER, ACCESS, ASSIGN, UNARY, BINARY, PROGRAM, OPERATOR, CHAIN = range(8)
+
+
+def encode(node):
+    kinds, values, starts, ends = bytearray(), [], array('I'), array('I')
+    stack = [(node, False)]
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, NumberNode):
+            kind, token = NUMBER, node.token
+        elif isinstance(node, VarAccessNode):
+            kind, token = ACCESS, node.varNameToken
+        elif isinstance(node, Token):
+            kind, token = OPERATOR, node
+        elif visited:
+            if isinstance(node, VarAssignNode):
+                kind, token = ASSIGN, node.varNameToken
+            elif isinstance(node, UnaryOperationNode):
+                kind, token = UNARY, node.opToken
+            elif isinstance(node, BinaryOperationNode):
+                kind, token = BINARY, node.opToken
+            elif isinstance(node, ChainedComparisonNode):
+                kind, token = CHAIN, node
+            else:
+                kind, token = PROGRAM, node
+        else:
+            stack.append((node, True))
+            if isinstance(node, VarAssignNode):
+                stack.append((node.nodeValue, False))
+            elif isinstance(node, UnaryOperationNode):
+                stack.append((node.node, False))
+            elif isinstance(node, BinaryOperationNode):
+                stack.append((node.rightNode, False))
+                stack.append((node.leftNode, False))
+            elif isinstance(node, ChainedComparisonNode):
+                children = [node.operands[0]]
+                for opToken, operand in zip(node.opTokens, node.operands[1:]):
+                    children += [opToken, operand]
+                stack.extend((child, False) for child in reversed(children))
+            elif isinstance(node, ProgramNode):
+                stack.extend((statement, False) for statement in reversed(node.statements))
+            else:
+                raise TypeError(f'Cannot encode {type(node).__name__}')
+            continue
+
+        kinds.append(kind)
+        if kind == PROGRAM:
+            values.append(len(node.statements))
+        elif kind == CHAIN:
+            values.append(len(node.opTokens))
+        elif kind in (UNARY, BINARY):
+            # 'and', 'or' and 'not' by their keyword, which no token type is
+            values.append(token.value if token.type == TT_KEYWORD else token.type)
+        elif kind == OPERATOR:
+            values.append(token.type)
+        else:
+            values.append(token.value)
+        starts.append(token.start)
+        ends.append(token.end)
+
+    if sys.byteorder == 'big':
+        starts.byteswap()
+        ends.byteswap()
+    return marshal.dumps((bytes(kinds), tuple(values), starts.tobytes(), ends.tobytes()))
+
+
+def decode(payload, source):
+    kinds, values, startBytes, endBytes = marshal.loads(payload)
+    starts, ends = array('I'), array('I')
+    starts.frombytes(startBytes)
+    ends.frombytes(endBytes)
+    if sys.byteorder == 'big':
+        starts.byteswap()
+        ends.byteswap()
+    if not len(kinds) == len(values) == len(starts) == len(ends):
+        raise ValueError('malformed tree')
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    for kind, value, start, end in zip(kinds, values, starts, ends):
+        if kind == NUMBER:
+            push(NumberNode(Token(TT_INT if type(value) is int else TT_FLOAT, value, start, end, source)))
+        elif kind == ACCESS:
+            push(VarAccessNode(Token(TT_IDENTIFIER, value, start, end, source)))
+        elif kind == BINARY:
+            right = pop()
+            push(BinaryOperationNode(pop(), operatorToken(value, start, end, source), right))
+        elif kind == UNARY:
+            push(UnaryOperationNode(operatorToken(value, start, end, source), pop()))
+        elif kind == OPERATOR:
+            push(Token(value, None, start, end, source))
+        elif kind == CHAIN:
+            children = stack[len(stack) - 2 * value - 1:]
+            del stack[len(stack) - 2 * value - 1:]
+            push(ChainedComparisonNode(children[0::2], children[1::2]))
+        elif kind == ASSIGN:
+            push(VarAssignNode(Token(TT_IDENTIFIER, value, start, end, source), pop()))
+        else:
+            statements = stack[len(stack) - value:] if value else []
+            del stack[len(stack) - value:]
+            push(ProgramNode(statements, start, end, source))
+    if len(stack) != 1:
+        raise ValueError('malformed tree')
+    return stack[0]
+
+
+def operatorToken(value, start, end, source):
+    if value in KEYWORDS:
+        return Token(TT_KEYWORD, value, start, end, source)
+    return Token(value, None, start, end, source)
+
+
+##################################
+# DISK CACHE
+##################################
+
+# Bump when the encoding changes, files of other versions are ignored
+FORMAT_VERSION = 2
+# magic, format version, marshal version, source hash, payload size
+FILE_HEADER = struct.Struct('<4sHH16sI')
+FILE_MAGIC = b'BAST'
+# magic, format version, marshal version, entry count, then an index of
+# (source hash, payload offset, payload size) entries
+BUNDLE_HEADER = struct.Struct('<4sHHI')
+BUNDLE_ENTRY = struct.Struct('<16sII')
+BUNDLE_MAGIC = b'BASB'
+
+
+def sourceHash(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class DiskCache:
+    # Parsed trees kept in a directory across processes, like Python's
+    # .pyc files. A tree only depends on its source text: files are named
+    # after the text's hash, which their header repeats, and are only used
+    # for a text of that hash written by the same format and marshal
+    # versions. Unreadable or stale files count as misses.
+    #
+    # Loading many small files costs a file open each. A bundle holds the
+    # trees of a whole set of sources in one file, whose index is read
+    # once by loadBundle, each tree is decoded when it is first asked for.
+    #
+    # Like .pyc files, the directory has to be trusted: entries are read
+    # with marshal.
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # source hash -> (view of the mapping, offset, size) of the loaded
+        # bundles
+        self.bundled = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalid = 0
+        self.writes = 0
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest.hex() + '.ast')
+
+    def get(self, fileName, text):
+        # the tree of text, positioned in a fresh source of fileName, or
+        # None if it is not cached
+        digest = sourceHash(text)
+        node = self.read(digest, text, fileName)
+        if node is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return node
+
+    def read(self, digest, text, fileName):
+        found = self.bundled.get(digest)
+        if found is not None:
+            buffer, offset, size = found
+            payload = buffer[offset:offset + size]
+        else:
+            buffer = mapFile(self.path(digest))
+            if buffer is None: return None
+            magic, version, marshalVersion, stored, size = FILE_HEADER.unpack_from(buffer) \
+                if len(buffer) >= FILE_HEADER.size else (None,) * 5
+            if (magic != FILE_MAGIC or version != FORMAT_VERSION or marshalVersion != marshal.version
+                    or stored != digest or len(buffer) != FILE_HEADER.size + size):
+                self.invalid += 1
+                return None
+            payload = buffer[FILE_HEADER.size:]
+        try:
+            return decode(payload, Source(fileName, text))
+        except (ValueError, EOFError, TypeError, IndexError):
+            self.invalid += 1
+            return None
+
+    def put(self, text, node):
+        digest = sourceHash(text)
+        payload = encode(node)
+        header = FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, marshal.version, digest, len(payload))
+        writeFile(self.path(digest), header + payload)
+        self.writes += 1
+
+    def writeBundle(self, name, entries):
+        # entries: (text, tree) pairs. Returns the bundle's path.
+        index, payloads, offset = [], [], 0
+        seen = set()
+        for text, node in entries:
+            digest = sourceHash(text)
+            if digest in seen: continue
+            seen.add(digest)
+            payload = encode(node)
+            index.append((digest, offset, len(payload)))
+            payloads.append(payload)
+            offset += len(payload)
+
+        start = BUNDLE_HEADER.size + BUNDLE_ENTRY.size * len(index)
+        parts = [BUNDLE_HEADER.pack(BUNDLE_MAGIC, FORMAT_VERSION, marshal.version, len(index))]
+        parts.extend(BUNDLE_ENTRY.pack(digest, start + offset, size) for digest, offset, size in index)
+        parts.extend(payloads)
+        path = os.path.join(self.directory, name + '.bundle')
+        writeFile(path, b''.join(parts))
+        self.writes += 1
+        return path
+
+    def loadBundle(self, name):
+        # makes the trees of a bundle available to get(), returns how many
+        # it holds, 0 if it is missing or unreadable
+        buffer = mapFile(os.path.join(self.directory, name + '.bundle'))
+        if buffer is None or len(buffer) < BUNDLE_HEADER.size:
+            return 0
+        magic, version, marshalVersion, count = BUNDLE_HEADER.unpack_from(buffer)
+        end = BUNDLE_HEADER.size + BUNDLE_ENTRY.size * count
+        if magic != BUNDLE_MAGIC or version != FORMAT_VERSION or marshalVersion != marshal.version \
+                or len(buffer) < end:
+            self.invalid += 1
+            return 0
+        # payloads are read through a view, slicing it copies nothing
+        view = memoryview(buffer)
+        bundled = self.bundled
+        size = len(buffer)
+        for digest, offset, length in BUNDLE_ENTRY.iter_unpack(view[BUNDLE_HEADER.size:end]):
+            if offset + length <= size:
+                bundled[digest] = (view, offset, length)
+        return count
+
+    def stats(self):
+        return {
+            'bundled': len(self.bundled),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalid': self.invalid,
+            'writes': self.writes,
+        }
+
+
+def mapFile(path):
+    # the file's contents, memory-mapped, or None if it cannot be read
+    try:
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0: return b''
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+
+
+def writeFile(path, data):
+    # written to a temporary file first, so that readers never see half a
+    # file, even with several processes writing the same entry
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary): os.unlink(temporary)
+        raise
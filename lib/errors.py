@@ -2,7 +2,14 @@
 # ERROR
 ##################################
 
+# Errors only hold their positions, which are source offsets: nothing is
+# looked up or formatted until an error is rendered, by as_string() or
+# as_dict(). Programs that fail by the thousand pay for the messages they
+# actually show.
+
 class Error:
+    __slots__ = ('errorName', 'details', 'startPos', 'endPos')
+
     def __init__(self, startPos, endPos, errorName, details):
         self.errorName = errorName
         self.details = details
@@ -15,18 +22,38 @@ class Error:
         err += f' \n\n{stringWithArrows(self.startPos.ftxt, self.startPos, self.endPos)}'
         return err
 
+    def as_dict(self):
+        # the error as plain data, lines and columns counted from 1
+        ln, col = self.startPos.source.lineCol(self.startPos.idx)
+        endLn, endCol = self.endPos.source.lineCol(self.endPos.idx)
+        return {
+            'type': self.errorName,
+            'details': self.details,
+            'file': self.startPos.fn,
+            'line': ln + 1,
+            'column': col + 1,
+            'endLine': endLn + 1,
+            'endColumn': endCol + 1,
+        }
+
 
 class IllegalCharacterError(Error):
+    __slots__ = ()
+
     def __init__(self, startPos, endPos, details):
         super().__init__(startPos, endPos, 'Illegal Character', details)
 
 
 class InvalidSyntaxError(Error):
+    __slots__ = ()
+
     def __init__(self, startPos, endPos, details=''):
         super().__init__(startPos, endPos, 'Invalid Syntax', details)
 
 
 class RTError(Error):
+    __slots__ = ('context',)
+
     def __init__(self, startPos, endPos, details='', context=''):
         super().__init__(startPos, endPos, 'Runtime Error', details)
         self.context = context
@@ -37,19 +64,36 @@ class RTError(Error):
         err += f' \n\n{stringWithArrows(self.startPos.ftxt, self.startPos, self.endPos)}'
         return err
 
-    def generateTraceback(self):
-        result = ''
+    def as_dict(self):
+        result = super().as_dict()
+        result['traceback'] = [
+            {'file': pos.fn, 'line': pos.ln + 1, 'context': ctx.displayName}
+            for pos, ctx in reversed(self.frames())
+        ]
+        return result
+
+    def frames(self):
+        # (position, context) of every context the error went through,
+        # innermost first
+        frames = []
         pos = self.startPos
         ctx = self.context
-
         while ctx:
-            result = f'  File {pos.fn}, line {str(pos.ln + 1)}, in {ctx.displayName}\n' + result
+            frames.append((pos, ctx))
             pos = ctx.parentEntry
             ctx = ctx.parent
+        return frames
 
-        return 'Traceback (most recent call last):\n' + result
+    def generateTraceback(self):
+        lines = [
+            f'  File {pos.fn}, line {str(pos.ln + 1)}, in {ctx.displayName}\n'
+            for pos, ctx in reversed(self.frames())
+        ]
+        return 'Traceback (most recent call last):\n' + ''.join(lines)
 
 class ExpectedCharError(Error):
+    __slots__ = ()
+
     def __init__(self, startPos, endPos, details):
         super().__init__(startPos, endPos, 'Expected Character', details)
 
@@ -62,30 +106,26 @@ class ExpectedCharError(Error):
 
 
 def stringWithArrows(text, pos_start, pos_end):
-    result = ''
-
-    # Calculate indices
-    idx_start = max(text.rfind('\n', 0, pos_start.idx), 0)
-    idx_end = text.find('\n', idx_start + 1)
-    if idx_end < 0:
-        idx_end = len(text)
-
-    # Generate each line
-    line_count = pos_end.ln - pos_start.ln + 1
-    for i in range(line_count):
-        # Calculate line columns
-        line = text[idx_start:idx_end]
-        col_start = pos_start.col if i == 0 else 0
-        col_end = pos_end.col if i == line_count - 1 else len(line) - 1
-
-        # Append to result
-        result += line + '\n'
-        result += ' ' * col_start + '^' * (col_end - col_start)
-
-        # Re-calculate indices
-        idx_start = idx_end
-        idx_end = text.find('\n', idx_start + 1)
-        if idx_end < 0:
-            idx_end = len(text)
-
-    return result.replace('\t', '')
+    # The lines from pos_start to pos_end, each followed by arrows under
+    # the part of it in between. Lines are cut out of text at the offsets
+    # of the source's line index.
+    source = pos_start.source
+    ln_start = source.lineAt(pos_start.idx)
+    # pos_end is just past the span: the span ends on the line of the
+    # character before it. An end in another source (a program spanning
+    # lines of a document) ends the first line.
+    sameSource = pos_end.source is source
+    ln_end = source.lineAt(max(pos_end.idx - 1, pos_start.idx)) if sameSource else ln_start
+
+    result = []
+    for ln in range(ln_start, ln_end + 1):
+        line = source.line(ln)
+        col_start = pos_start.idx - source.lineStarts[ln] if ln == ln_start else 0
+        if ln == ln_end and sameSource:
+            col_end = pos_end.idx - source.lineStarts[ln]
+        else:
+            col_end = len(line)
+
+        result.append(line + '\n' + ' ' * col_start + '^' * (col_end - col_start))
+
+    return '\n'.join(result).replace('\t', '')
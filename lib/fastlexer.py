@@ -0,0 +1,106 @@
+import re
+from .errors import *
+from .tokens import *
+from .source import Source, Position
+
+##################################
+# FAST LEXER
+##################################
+
+# Leading blanks are folded into every match, 'ws' only picks up trailing
+# ones. 'bad' catches anything else so finditer never skips over input.
+MASTER_PATTERN = re.compile(r'''
+    [ \t]*(?:
+    (?P<number>[0-9]+(?P<fraction>\.[0-9]*)?)
+  | (?P<identifier>[A-Za-z][A-Za-z0-9_]*)
+  | (?P<operator>==|!=|<=|>=|[-+*/^()=<>])
+  | (?P<newline>[;\n])
+  | (?P<bang>!)
+  | (?P<bad>.)
+  | (?P<ws>\Z)
+)''', re.VERBOSE | re.DOTALL)
+
+# Same scan over bytes, for buffers such as an mmap'ed file. Anything not
+# ASCII is a bad character, so byte offsets up to the first error are also
+# character offsets.
+BYTES_PATTERN = re.compile(MASTER_PATTERN.pattern.encode(), re.VERBOSE | re.DOTALL)
+
+OPERATORS = {
+    '+': TT_PLUS,
+    '-': TT_MINUS,
+    '*': TT_MUL,
+    '/': TT_DIV,
+    '^': TT_POW,
+    '(': TT_LPAREN,
+    ')': TT_RPAREN,
+    ';': TT_NEWLINE,
+    '\n': TT_NEWLINE,
+    '=': TT_EQ,
+    '==': TT_EE,
+    '!=': TT_NE,
+    '<': TT_LT,
+    '>': TT_GT,
+    '<=': TT_LTE,
+    '>=': TT_GTE,
+}
+
+BYTES_OPERATORS = {operator.encode(): tokType for operator, tokType in OPERATORS.items()}
+
+
+class FastLexer:
+    # Drop-in replacement for Lexer: same tokens, same errors, but a single
+    # regex scan instead of a per-character loop. text can also be a
+    # bytes-like buffer, which is lexed without being decoded.
+    def __init__(self, text, fileName, source=None):
+        self.fn = fileName
+        self.text = text
+        self.source = source or Source(fileName, text)
+        self.error = None
+        self.isText = isinstance(text, str)
+
+    def make_token(self):
+        tokens = list(self.scan())
+        if self.error: return [], self.error
+        tokens.append(Token(TT_EOF, None, len(self.text), source=self.source))
+        return tokens, None
+
+    def scan(self):
+        # Yields the tokens one at a time, without the EOF. Stops at the
+        # first bad character and leaves the error in self.error.
+        source = self.source
+        keywords = KEYWORDS
+        isText = self.isText
+        pattern, operators = (MASTER_PATTERN, OPERATORS) if isText else (BYTES_PATTERN, BYTES_OPERATORS)
+
+        for match in pattern.finditer(self.text):
+            kind = match.lastgroup
+            if kind == 'ws':
+                continue
+
+            start, end = match.span(kind)
+            if kind == 'number':
+                value = match.group(kind)
+                if match.group('fraction') is None:
+                    yield Token(TT_INT, int(value), start, end, source)
+                else:
+                    yield Token(TT_FLOAT, float(value), start, end, source)
+            elif kind == 'identifier':
+                value = match.group(kind)
+                if not isText: value = value.decode('ascii')
+                tokType = TT_KEYWORD if value in keywords else TT_IDENTIFIER
+                yield Token(tokType, value, start, end, source)
+            elif kind == 'operator' or kind == 'newline':
+                yield Token(operators[match.group(kind)], None, start, end, source)
+            elif kind == 'bang':
+                # Lexer.makeNotEquals steps over the offending character too
+                self.error = ExpectedCharError(
+                    Position(start, source), Position(start + 2, source),
+                    "'=' (after '!')"
+                )
+                return
+            else:
+                self.error = IllegalCharacterError(
+                    Position(start, source), Position(end, source),
+                    "'" + source.text[start] + "'"
+                )
+                return
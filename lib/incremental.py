@@ -0,0 +1,222 @@
+from itertools import chain
+from .tokens import *
+from .nodes import ProgramNode
+from .source import Source, Position
+from .errors import InvalidSyntaxError
+from .fastlexer import FastLexer
+from .parser_ import Parser, ParseResult, EXPECTED_EXPRESSION
+
+##################################
+# LINES
+##################################
+
+# Lines are kept in blocks of about this many, so that finding the line
+# at an offset and inserting or removing lines never touches every line
+BLOCK_SIZE = 128
+
+
+class LineSource(Source):
+    # Source of a single line of a document. Its line number is looked up
+    # in the document when a position is rendered, so inserting lines above
+    # it does not have to renumber it.
+    __slots__ = ('line',)
+
+    def __init__(self, fileName, text, line):
+        super().__init__(fileName, text)
+        self.line = line
+
+    def lineCol(self, index):
+        ln, col = super().lineCol(index)
+        return ln + self.line.number(), col
+
+
+class Line:
+    # One line of a document, '\n' included, lexed and parsed on its own:
+    # statements never span lines, so this gives the same tokens and trees
+    # as lexing and parsing the whole text. error is the line's lex error,
+    # or if it lexed fine its syntax error.
+    __slots__ = ('text', 'block', 'statements', 'error', 'lexError')
+
+    def __init__(self, text, fileName):
+        self.text = text
+        self.block = None
+        self.statements = []
+        source = LineSource(fileName, text, self)
+        tokens, self.error = FastLexer(text, fileName, source).make_token()
+        self.lexError = self.error is not None
+        if not self.lexError:
+            res = Parser(tokens).program()
+            if res.error:
+                self.error = res.error
+            else:
+                self.statements = res.node.statements
+
+    def number(self):
+        block = self.block
+        document = block.document
+        ln = 0
+        for other in document.blocks:
+            if other is block: break
+            ln += len(other.lines)
+        return ln + block.lines.index(self)
+
+
+class Block:
+    __slots__ = ('document', 'lines', 'size', 'statements', 'lexError', 'error')
+
+    def __init__(self, document, lines):
+        self.document = document
+        self.lines = lines
+        self.update()
+
+    def update(self):
+        # summary of the block's lines, redone whenever they change
+        self.size = 0
+        self.statements = []
+        self.lexError = self.error = None
+        for line in self.lines:
+            line.block = self
+            self.size += len(line.text)
+            self.statements.extend(line.statements)
+            if line.error:
+                if line.lexError and not self.lexError: self.lexError = line.error
+                if not self.error: self.error = line.error
+
+
+##################################
+# INCREMENTAL DOCUMENT
+##################################
+
+
+class IncrementalDocument:
+    # A program kept parsed across edits. edit() re-lexes and re-parses only
+    # the lines the edit touches, parse() gives the same result as lexing
+    # and parsing the whole current text:
+    #
+    #     Parser(FastLexer(document.text, fileName).make_token()[0]).parse()
+    #
+    # except that positions point into per-line sources (same line and
+    # column) and a lex error is returned in the ParseResult.
+
+    def __init__(self, text='', fileName='<document>'):
+        self.fn = fileName
+        self.blocks = []
+        self.result = None
+        self.replaceLines(0, 0, 0, 0, self.makeLines(text))
+
+    @property
+    def text(self):
+        return ''.join(line.text for block in self.blocks for line in block.lines)
+
+    def __len__(self):
+        return sum(block.size for block in self.blocks)
+
+    def makeLines(self, text):
+        lines = []
+        start = 0
+        end = text.find('\n') + 1
+        while end:
+            lines.append(Line(text[start:end], self.fn))
+            start = end
+            end = text.find('\n', start) + 1
+        if start < len(text):
+            lines.append(Line(text[start:], self.fn))
+        return lines
+
+    def locate(self, offset):
+        # (block index, line index, offset the line starts at) of the line
+        # holding offset, or of the end of the document
+        start = 0
+        for b, block in enumerate(self.blocks):
+            if offset < start + block.size:
+                for i, line in enumerate(block.lines):
+                    if offset < start + len(line.text):
+                        return b, i, start
+                    start += len(line.text)
+            start += block.size
+        return len(self.blocks), 0, start
+
+    def nextLine(self, b, i):
+        i += 1
+        if i == len(self.blocks[b].lines):
+            b, i = b + 1, 0
+        return b, i
+
+    def edit(self, offset, deleteLen, text):
+        # replaces text[offset:offset + deleteLen] by text
+        size = len(self)
+        if not 0 <= offset <= offset + deleteLen <= size:
+            raise IndexError(f'edit {offset}:{offset + deleteLen} outside of a {size} character document')
+
+        # the lines from the one holding offset to the one holding the last
+        # deleted character are rebuilt
+        b0, i0, start = self.locate(offset)
+        if b0 == len(self.blocks) and self.blocks:
+            # appending, the last line takes it unless it is complete
+            b, i = len(self.blocks) - 1, len(self.blocks[-1].lines) - 1
+            last = self.blocks[b].lines[i]
+            if not last.text.endswith('\n'):
+                b0, i0, start = b, i, start - len(last.text)
+        b1, i1 = b0, i0
+        if deleteLen:
+            b1, i1, _ = self.locate(offset + deleteLen - 1)
+
+        old = []
+        b, i = b0, i0
+        while (b, i) <= (b1, i1) and b < len(self.blocks):
+            old.append(self.blocks[b].lines[i].text)
+            b, i = self.nextLine(b, i)
+        oldText = ''.join(old)
+        newText = oldText[:offset - start] + text + oldText[offset - start + deleteLen:]
+        # a line that lost its '\n' runs into the next one
+        while newText and not newText.endswith('\n') and b < len(self.blocks):
+            newText += self.blocks[b].lines[i].text
+            b1, i1 = b, i
+            b, i = self.nextLine(b, i)
+
+        if old or newText:
+            self.replaceLines(b0, i0, b1, i1 + 1 if old else i1, self.makeLines(newText))
+        self.result = None
+
+    def replaceLines(self, b0, i0, b1, i1, lines):
+        # replaces the lines from (b0, i0) up to, not including, (b1, i1)
+        blocks = self.blocks
+        if b0 == len(blocks):
+            blocks.append(Block(self, []))
+        if b1 == len(blocks):
+            b1, i1 = b1 - 1, len(blocks[-1].lines)
+        first, last = blocks[b0], blocks[b1]
+        merged = first.lines[:i0] + lines + last.lines[i1:]
+
+        # split evenly, so edits do not leave a trail of tiny blocks
+        count = -(-len(merged) // BLOCK_SIZE)
+        pieces = [
+            Block(self, merged[index * len(merged) // count:(index + 1) * len(merged) // count])
+            for index in range(count)
+        ]
+        blocks[b0:b1 + 1] = pieces
+
+    def parse(self):
+        if self.result is None:
+            self.result = self.build()
+        return self.result
+
+    def build(self):
+        res = ParseResult()
+        for block in self.blocks:
+            if block.lexError:
+                return res.failure(block.lexError)
+        for block in self.blocks:
+            if block.error:
+                return res.failure(block.error)
+
+        statements = list(chain.from_iterable(block.statements for block in self.blocks))
+        if len(statements) == 1:
+            return res.success(statements[0])
+        if statements:
+            return res.success(ProgramNode(statements, statements[0].start, statements[-1].end, statements[0].source))
+        # like Parser.parse, nothing to run is an error at the end
+        lines = [line for block in self.blocks for line in block.lines]
+        source = LineSource(self.fn, lines[-1].text, lines[-1]) if lines else Source(self.fn, '')
+        end = len(source.text)
+        return res.failure(InvalidSyntaxError(Position(end, source), Position(end + 1, source), EXPECTED_EXPRESSION))
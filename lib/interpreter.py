@@ -1,15 +1,41 @@
 from .tokens import *
+from .nodes import *
 from .errors import RTError
+from .numeric import power, ILLEGAL_OPERATION, compare, shortCircuit, TRUTH
 from .symbols import SymbolTable
 
 class Context:
+    __slots__ = ('displayName', 'parent', 'parentEntry', 'symbolTable', 'frame', 'backend', 'truth', 'meter')
+
     def  __init__(self, displayName, parent=None, parentEntry=None):
         self.displayName = displayName
         self.parent = parent
         self.parentEntry = parentEntry
         self.symbolTable = None
+        # set when running a resolved tree, see resolver.py
+        self.frame = None
+        # numeric backend variables are converted with, and its (false,
+        # true), see numeric.py
+        self.backend = None
+        self.truth = TRUTH
+        # set when running a metered tree, see limits.py
+        self.meter = None
+
+def truthOf(context):
+    return TRUTH if context is None else context.truth
+
+def powerError(node, details, context):
+    # the error power() gave the details of: like Number.illegalOperation
+    # from the left operand to the end of the right one, else at the right
+    # one
+    if details == ILLEGAL_OPERATION:
+        return RTError(positionNode(node.leftNode).startPos, positionNode(node.rightNode).endPos, details, context)
+    span = positionNode(node.rightNode)
+    return RTError(span.startPos, span.endPos, details, context)
 
 class RTResult:
+    __slots__ = ('value', 'error')
+
     def __init__(self):
         self.value = None
         self.error = None
@@ -29,35 +55,57 @@ class RTResult:
         return res
 
 class Number:
+    __slots__ = ('value', 'span', 'context')
+
     def __init__(self, value):
         self.value = value
-        self.setPos()
+        self.setSpan()
         self.setContext()
 
     def setContext(self, context=None):
         self.context = context
         return self
 
-    def setPos(self, startPos=None, endPos=None):
-        self.startPos = startPos
-        self.endPos   = endPos
+    def setSpan(self, span=None):
+        # the token or node this number was produced by, errors about the
+        # number point at its positions
+        self.span = span
         return self
+
+    @property
+    def startPos(self):
+        return self.span.startPos if self.span else None
+
+    @property
+    def endPos(self):
+        return self.span.endPos if self.span else None
     
     def addedTo(self, other):
         if isinstance(other, Number):
             return Number(self.value + other.value).setContext(self.context), None
+        return self.illegalOperation(other)
         
     def subbtractedBy(self, other):
         if isinstance(other, Number):
             return Number(self.value - other.value).setContext(self.context), None
+        return self.illegalOperation(other)
 
     def multipliedBy(self, other):
         if isinstance(other, Number):
             return Number(self.value * other.value).setContext(self.context), None
+        return self.illegalOperation(other)
 
     def poweredBy(self, other):
         if isinstance(other, Number):
-            return Number(self.value ** other.value).setContext(self.context), None
+            value = power(self.value, other.value)
+            if type(value) is str:
+                if value == ILLEGAL_OPERATION: return self.illegalOperation(other)
+                return None, RTError(
+                    other.startPos, other.endPos,
+                    value, self.context
+                )
+            return Number(value).setContext(self.context), None
+        return self.illegalOperation(other)
 
     def copy(self):
         return Number(self.value).setContext(self.context)
@@ -70,59 +118,276 @@ class Number:
                     "Division by Zero", self.context
                 )
             return Number(self.value / other.value).setContext(self.context), None
+        return self.illegalOperation(other)
+
+    def comparedTo(self, other, opType):
+        if isinstance(other, Number):
+            value = compare(opType, self.value, other.value, truthOf(self.context))
+            if value is None: return self.illegalOperation(other)
+            return Number(value).setContext(self.context), None
+        return self.illegalOperation(other)
+
+    def illegalOperation(self, other):
+        end = other if isinstance(other, Number) and other.span else self
+        return None, RTError(
+            self.startPos, end.endPos,
+            "Illegal operation", self.context
+        )
 
     def __repr__(self):
         return f'{self.value}'
 
 
+# Shared by every negation, only ever read from
+NEG_ONE = Number(-1)
+
+
+class EvaluationAbort(Exception):
+    # Unwinds the unboxed evaluation on the first runtime error, which
+    # Interpreter.run hands back in an RTResult
+    def __init__(self, error):
+        self.error = error
+
+
 ##################################
 # Interpreter
 ##################################
 
 class Interpreter:
+    # Two ways to walk a tree. run() works on raw ints/floats and only
+    # boxes the final value into a Number, visit() (and the visit* methods)
+    # returns an RTResult and a Number for every node, which is what the
+    # profiler times. Both give the same values, positions and errors.
+
+    def run(self, node, context):
+        try:
+            value = self.compute(node, context)
+        except EvaluationAbort as abort:
+            return RTResult().failure(abort.error)
+        # an empty program has no value
+        if value is None: return RTResult().success(None)
+        return RTResult().success(
+            Number(value).setSpan(positionNode(node)).setContext(context)
+        )
+
+    def compute(self, node, context):
+        nodeType = type(node)
+        if nodeType is BinaryOperationNode:
+            left = self.compute(node.leftNode, context)
+            if node.opToken.type == TT_KEYWORD:
+                # 'and'/'or' only evaluate their right operand when needed
+                value = shortCircuit(node.opToken, left, context.truth)
+                if value is not None: return value
+                return context.truth[self.compute(node.rightNode, context) != 0]
+            return self.arithmetic(node, left, self.compute(node.rightNode, context), context)
+        if nodeType is NumberNode:
+            return node.token.value
+        if nodeType is VarAccessNode:
+            return self.load(node, context)
+        if nodeType is UnaryOperationNode:
+            value = self.compute(node.node, context)
+            opType = node.opToken.type
+            if opType == TT_MINUS: return value * -1
+            if opType == TT_KEYWORD: return context.truth[value == 0]
+            return value
+        if nodeType is VarAssignNode:
+            return self.store(node, self.compute(node.nodeValue, context), context)
+        if nodeType is ChainedComparisonNode:
+            operands = node.operands
+            left = self.compute(operands[0], context)
+            for index, opToken in enumerate(node.opTokens):
+                right = self.compute(operands[index + 1], context)
+                if not self.comparison(opToken.type, left, right, operands[index], operands[index + 1], context):
+                    return context.truth[0]
+                left = right
+            return context.truth[1]
+        if nodeType is ProgramNode:
+            value = None
+            for statement in node.statements:
+                value = self.compute(statement, context)
+            return value
+        if nodeType is MeterNode:
+            if node.cost: self.charge(node, context)
+            value = self.compute(node.node, context)
+            if node.measured and type(value) is not float: self.measure(node, value, context)
+            return value
+        self.noVisitMethod(node, context)
+
+    # Raw counterparts of the visit* methods, shared with the engines that
+    # walk the tree differently (see iterative.py)
+
+    def arithmetic(self, node, left, right, context):
+        opType = node.opToken.type
+        if opType == TT_PLUS: return left + right
+        if opType == TT_MINUS: return left - right
+        if opType == TT_MUL: return left * right
+        if opType == TT_DIV:
+            if right == 0:
+                # where Number.dividedBy points: at the right operand
+                span = positionNode(node.rightNode)
+                raise EvaluationAbort(RTError(
+                    span.startPos, span.endPos,
+                    "Division by Zero", context
+                ))
+            return left / right
+        if opType == TT_POW:
+            value = power(left, right)
+            if type(value) is str: raise EvaluationAbort(powerError(node, value, context))
+            return value
+        return self.comparison(opType, left, right, node.leftNode, node.rightNode, context)
+
+    def comparison(self, opType, left, right, leftNode, rightNode, context):
+        value = compare(opType, left, right, context.truth)
+        if value is None:
+            # where Number.illegalOperation points: from the left operand
+            # to the end of the right one
+            raise EvaluationAbort(RTError(
+                positionNode(leftNode).startPos, positionNode(rightNode).endPos,
+                "Illegal operation", context
+            ))
+        return value
+
+    def load(self, node, context):
+        frame = context.frame
+        if frame is not None and node.slot is not None:
+            for _ in range(node.depth): frame = frame.parent
+            value = frame.slots[node.slot]
+        else:
+            value = context.symbolTable.get(node.varNameToken.value)
+        if not value:
+            raise EvaluationAbort(RTError(
+                node.startPos, node.endPos,
+                f"'{node.varNameToken.value}' is not defined", context
+            ))
+        if context.backend is not None:
+            return context.backend.convert(value.value)
+        return value.value
+
+    def store(self, node, value, context):
+        self.assign(node, Number(value).setSpan(positionNode(node)).setContext(context), context)
+        return value
+
+    def charge(self, node, context):
+        error = context.meter.charge(node, context)
+        if error: raise EvaluationAbort(error)
+
+    def measure(self, node, value, context):
+        error = context.meter.measure(node, value, context)
+        if error: raise EvaluationAbort(error)
+
     def visit(self, node, context):
         methodType = f'visit{type(node).__name__}'
         method = getattr(self, methodType, self.noVisitMethod)
         return method(node, context)
     
-    def noVisitMethod(self, node):
+    def noVisitMethod(self, node, context):
         raise Exception(f'No visit{type(node).__name__} method defined')
 
+    def visitProgramNode(self, node, context):
+        res = RTResult()
+        value = None
+        for statement in node.statements:
+            value = res.register(self.visit(statement, context))
+            if res.error: return res
+        return res.success(value)
+
     def visitNumberNode(self, node, context):
         return RTResult().success(
-            Number(node.token.value).setPos(node.startPos, node.endPos).setContext(context)
+            Number(node.token.value).setSpan(node).setContext(context)
         )
 
     def visitVarAssignNode(self, node, context):
         res = RTResult()
-        varName = node.varNameToken.value
         value = res.register(self.visit(node.nodeValue, context))
         if res.error: return res
-
-        context.symbolTable.set(varName, value)
-        return res.success(value)
+        return res.success(self.assign(node, value, context))
 
     def visitVarAccessNode(self, node, context):
         res = RTResult()
-        varName = node.varNameToken.value
-        value = context.symbolTable.get(varName)
-        
+        frame = context.frame
+        if frame is not None and node.slot is not None:
+            for _ in range(node.depth): frame = frame.parent
+            value = frame.slots[node.slot]
+            if value and not node.needsCopy and context.backend is None:
+                return res.success(value)
+        else:
+            value = context.symbolTable.get(node.varNameToken.value)
+
         if not value:
             return res.failure(RTError(
                 node.startPos, node.endPos,
-                f"'{varName}' is not defined", context
+                f"'{node.varNameToken.value}' is not defined", context
             ))
-        value = value.copy().setPos(node.startPos, node.endPos)
+        value = value.copy().setSpan(node).setContext(context)
+        if context.backend is not None:
+            value.value = context.backend.convert(value.value)
         return res.success(value)
 
     def visitBinaryOperationNode(self, node, context):
         res = RTResult()
         left = res.register(self.visit(node.leftNode, context))
         if res.error: return res
+        if node.opToken.type == TT_KEYWORD:
+            value = shortCircuit(node.opToken, left.value, context.truth)
+            if value is None:
+                right = res.register(self.visit(node.rightNode, context))
+                if res.error: return res
+                value = context.truth[right.value != 0]
+            return res.success(Number(value).setSpan(node).setContext(context))
         right = res.register(self.visit(node.rightNode, context))
         if res.error: return res
-        
 
+        result, error = self.binaryOperation(node, left, right)
+        if error: return res.failure(error)
+        return res.success(result)
+
+    def visitUnaryOperationNode(self, node, context):
+        res = RTResult()
+        number = res.register(self.visit(node.node, context))
+        if res.error: return res
+
+        number, error = self.unaryOperation(node, number)
+        if error: return res.failure(error)
+        return res.success(number)
+
+    def visitChainedComparisonNode(self, node, context):
+        res = RTResult()
+        operands = node.operands
+        left = res.register(self.visit(operands[0], context))
+        if res.error: return res
+        for index, opToken in enumerate(node.opTokens):
+            right = res.register(self.visit(operands[index + 1], context))
+            if res.error: return res
+            result, error = left.comparedTo(right, opToken.type)
+            if error: return res.failure(error)
+            if result.value == 0: break
+            left = right
+        return res.success(result.setSpan(node))
+
+    def visitMeterNode(self, node, context):
+        res = RTResult()
+        if node.cost:
+            error = context.meter.charge(node, context)
+            if error: return res.failure(error)
+        number = res.register(self.visit(node.node, context))
+        if res.error: return res
+        if node.measured:
+            error = context.meter.measure(node, number.value, context)
+            if error: return res.failure(error)
+        return res.success(number)
+
+    # What a node does with the values of its children
+
+    def assign(self, node, value, context):
+        if context.frame is not None and node.slot is not None:
+            frame = context.frame
+            for _ in range(node.depth): frame = frame.parent
+            frame.slots[node.slot] = value
+        else:
+            context.symbolTable.set(node.varNameToken.value, value)
+        return value
+
+    def binaryOperation(self, node, left, right):
         if node.opToken.type == TT_PLUS:
             result, error = left.addedTo(right)
         elif node.opToken.type == TT_MINUS:
@@ -133,19 +398,18 @@ class Interpreter:
             result, error = left.dividedBy(right)
         elif node.opToken.type == TT_POW:
             result, error = left.poweredBy(right)
-        
-        if error: return res.failure(error)
-        return res.success(result.setPos(node.startPos, node.endPos))
+        else:
+            result, error = left.comparedTo(right, node.opToken.type)
 
-    def visitUnaryOperationNode(self, node, context):
-        
-        res = RTResult()
+        if error: return None, error
+        return result.setSpan(node), None
+
+    def unaryOperation(self, node, number):
         error = None
-        number = res.register(self.visit(node.node, context))
-        if res.error: return res
-        
         if node.opToken.type == TT_MINUS:
-            number, error = number.multipliedBy(Number(-1))
+            number, error = number.multipliedBy(NEG_ONE)
+        elif node.opToken.type == TT_KEYWORD:
+            number = Number(truthOf(number.context)[number.value == 0]).setContext(number.context)
 
-        if error: return res.failure(error)
-        return res.success(number.setPos(node.startPos, node.endPos))
\ No newline at end of file
+        if error: return None, error
+        return number.setSpan(node), None
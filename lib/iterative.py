@@ -0,0 +1,113 @@
+from .tokens import *
+from .nodes import *
+from .interpreter import Interpreter
+from .numeric import shortCircuit
+
+##################################
+# ITERATIVE INTERPRETER
+##################################
+
+
+class IterativeInterpreter(Interpreter):
+    # Same results and errors as Interpreter.run, but the tree is walked
+    # with an explicit stack instead of one Python call per node, so how
+    # deep it is does not matter.
+    #
+    # Nodes with children are pushed twice: once to push their children,
+    # then, flagged, to combine the children's values, which by that time
+    # are on top of `values`. Children are evaluated left to right and the
+    # walk stops at the first error, like the recursive one.
+    #
+    # 'and'/'or' push their right operand only once the left one's value
+    # is known, and come back a third time (flagged 2) to turn it into 1
+    # or 0. A chained comparison is flagged with the index of the operand
+    # whose value was just computed. A MeterNode charges its chunk on the
+    # way down and measures the value on the way back up.
+
+    def compute(self, node, context):
+        values = []
+        stack = [(node, False)]
+        push = stack.append
+        pop = stack.pop
+
+        while stack:
+            node, ready = pop()
+            nodeType = type(node)
+
+            if nodeType is NumberNode:
+                values.append(node.token.value)
+            elif nodeType is VarAccessNode:
+                values.append(self.load(node, context))
+
+            elif nodeType is ChainedComparisonNode:
+                if not ready:
+                    push((node, 1))
+                    push((node.operands[1], False))
+                    push((node.operands[0], False))
+                    continue
+                operands = node.operands
+                right = values.pop()
+                if not self.comparison(node.opTokens[ready - 1].type, values[-1], right,
+                                       operands[ready - 1], operands[ready], context):
+                    values[-1] = context.truth[0]
+                elif ready == len(operands) - 1:
+                    values[-1] = context.truth[1]
+                else:
+                    values[-1] = right
+                    push((node, ready + 1))
+                    push((operands[ready + 1], False))
+
+            elif not ready:
+                push((node, True))
+                if nodeType is BinaryOperationNode:
+                    if node.opToken.type != TT_KEYWORD:
+                        push((node.rightNode, False))
+                    push((node.leftNode, False))
+                elif nodeType is UnaryOperationNode:
+                    push((node.node, False))
+                elif nodeType is VarAssignNode:
+                    push((node.nodeValue, False))
+                elif nodeType is ProgramNode:
+                    for statement in reversed(node.statements):
+                        push((statement, False))
+                elif nodeType is MeterNode:
+                    if node.cost: self.charge(node, context)
+                    push((node.node, False))
+                else:
+                    self.noVisitMethod(node, context)
+
+            elif nodeType is BinaryOperationNode:
+                if node.opToken.type != TT_KEYWORD:
+                    right = values.pop()
+                    values[-1] = self.arithmetic(node, values[-1], right, context)
+                elif ready == 2:
+                    values[-1] = context.truth[values[-1] != 0]
+                else:
+                    value = shortCircuit(node.opToken, values[-1], context.truth)
+                    if value is not None:
+                        values[-1] = value
+                    else:
+                        values.pop()
+                        push((node, 2))
+                        push((node.rightNode, False))
+            elif nodeType is UnaryOperationNode:
+                if node.opToken.type == TT_MINUS:
+                    values[-1] = values[-1] * -1
+                elif node.opToken.type == TT_KEYWORD:
+                    values[-1] = context.truth[values[-1] == 0]
+            elif nodeType is VarAssignNode:
+                self.store(node, values[-1], context)
+            elif nodeType is MeterNode:
+                if node.measured and type(values[-1]) is not float: self.measure(node, values[-1], context)
+            else:
+                # a program is worth its last statement
+                count = len(node.statements)
+                value = values[-1] if count else None
+                del values[len(values) - count:]
+                values.append(value)
+
+        return values[-1]
+
+    def visit(self, node, context):
+        # never recurse, even when called as a plain Interpreter
+        return self.run(node, context)
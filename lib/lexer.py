@@ -1,5 +1,6 @@
 from .errors import *
 from .tokens import *
+from .source import Source, Position
 import string
 
 ##################################
@@ -10,31 +11,6 @@ DIGITS = '0123456789'
 LETTERS = string.ascii_letters
 LETTERS_DIGITS = LETTERS + DIGITS + "_"
 
-##################################
-# POSITION
-##################################
-
-
-class Position:
-    def __init__(self, index, line, column, fileName, fileText):
-        self.idx = index
-        self.ln = line
-        self.col = column
-        self.fn = fileName
-        self.ftxt = fileText
-
-    def advance(self, currentChar=None):
-        self.idx += 1
-        self.col += 1
-        if currentChar == '\n':
-            self.ln += 1
-            self.col = 0
-        return self
-
-    def copy(self):
-        return Position(self.idx, self.ln, self.col, self.fn, self.ftxt)
-
-
 ##################################
 # LEXER
 ##################################
@@ -44,13 +20,14 @@ class Lexer:
     def __init__(self, text, fileName):
         self.fn = fileName
         self.text = text
-        self.pos = Position(-1, 0, -1, fileName, text)
+        self.source = Source(fileName, text)
+        self.idx = -1
         self.currentChar = None
         self.advance()
 
     def advance(self):
-        self.pos.advance(self.currentChar)
-        self.currentChar = self.text[self.pos.idx] if self.pos.idx < len(
+        self.idx += 1
+        self.currentChar = self.text[self.idx] if self.idx < len(
             self.text) else None
 
     def make_token(self):
@@ -59,24 +36,28 @@ class Lexer:
         while self.currentChar != None:
             if self.currentChar in '\t ':
                 self.advance()
+            elif self.currentChar in ';\n':
+                # statement separator
+                tokens.append(Token(TT_NEWLINE, None, self.idx, source=self.source))
+                self.advance()
             elif self.currentChar in DIGITS:
                 tokens.append(self.makeNumber())
             elif self.currentChar in LETTERS:
                 tokens.append(self.makeIdentifier())
             elif self.currentChar == '+':
-                tokens.append(Token(TT_PLUS, startPos=self.pos))
+                tokens.append(Token(TT_PLUS, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == '-':
-                tokens.append(Token(TT_MINUS, startPos=self.pos))
+                tokens.append(Token(TT_MINUS, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == '*':
-                tokens.append(Token(TT_MUL, startPos=self.pos))
+                tokens.append(Token(TT_MUL, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == '/':
-                tokens.append(Token(TT_DIV, startPos=self.pos))
+                tokens.append(Token(TT_DIV, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == '^':
-                tokens.append(Token(TT_POW, startPos=self.pos))
+                tokens.append(Token(TT_POW, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == '=':
                 tok, error = self.makeEquals()
@@ -95,24 +76,27 @@ class Lexer:
                 if error: return [], error
                 tokens.append(tok)
             elif self.currentChar == '(':
-                tokens.append(Token(TT_LPAREN, startPos=self.pos))
+                tokens.append(Token(TT_LPAREN, None, self.idx, source=self.source))
                 self.advance()
             elif self.currentChar == ')':
-                tokens.append(Token(TT_RPAREN, startPos=self.pos))
+                tokens.append(Token(TT_RPAREN, None, self.idx, source=self.source))
                 self.advance()
             else:
-                startPos = self.pos.copy()
+                start = self.idx
                 character = self.currentChar
                 self.advance()
-                return [], IllegalCharacterError(startPos, self.pos, "'"+character+"'")
+                return [], IllegalCharacterError(
+                    Position(start, self.source), Position(self.idx, self.source),
+                    "'"+character+"'"
+                )
 
-        tokens.append(Token(TT_EOF, startPos=self.pos))
+        tokens.append(Token(TT_EOF, None, self.idx, source=self.source))
         return tokens, None
 
     def makeNumber(self):
         num = ''
         dotCount = 0
-        startPos = self.pos.copy()
+        start = self.idx
 
         while self.currentChar != None and self.currentChar in DIGITS + ".":
             if self.currentChar == '.':
@@ -125,62 +109,64 @@ class Lexer:
             self.advance()
 
         if dotCount == 0:
-            return Token(TT_INT, int(num), startPos, self.pos)
+            return Token(TT_INT, int(num), start, self.idx, self.source)
         else:
-            return Token(TT_FLOAT, float(num), startPos, self.pos)
+            return Token(TT_FLOAT, float(num), start, self.idx, self.source)
 
     def makeIdentifier(self):
         id = ''
-        startPos = self.pos.copy()
+        start = self.idx
 
         while self.currentChar != None and self.currentChar in LETTERS_DIGITS:
             id += self.currentChar
             self.advance()
         
         tokType = TT_KEYWORD if id in KEYWORDS else TT_IDENTIFIER
-        return Token(tokType, id, startPos, self.pos)
+        return Token(tokType, id, start, self.idx, self.source)
 
     def makeEquals(self):
         tokType = TT_EQ
-        startPos = self.pos.copy()
+        start = self.idx
         self.advance()
 
         if self.currentChar == '=':
             self.advance()
             tokType = TT_EE
 
-        print("debug again:", tokType)
-        return  Token(tokType, startPos=startPos, endPos=self.pos), None
+        return Token(tokType, None, start, self.idx, self.source), None
     
     def makeNotEquals(self):
-        startPos = self.pos.copy()
+        start = self.idx
         self.advance()
 
         if self.currentChar == '=':
             self.advance()
-            return Token(TT_NE, startPos=startPos, endPos=self.pos), None
+            return Token(TT_NE, None, start, self.idx, self.source), None
         
         self.advance()
-        return None, ExpectedCharError(startPos, self.pos, "'=' (after '!')")
+        return None, ExpectedCharError(
+            Position(start, self.source), Position(self.idx, self.source),
+            "'=' (after '!')"
+        )
 
     def makeGreaterThan(self):
         tokType = TT_GT
-        startPos = self.pos.copy()
+        start = self.idx
         self.advance()
 
         if self.currentChar == '=':
             self.advance()
             tokType = TT_GTE
         
-        return Token(tokType, startPos=startPos, endPos=self.pos)
+        return Token(tokType, None, start, self.idx, self.source), None
 
     def makeLessThan(self):
         tokType = TT_LT
-        posStart = self.pos.copy()
+        start = self.idx
         self.advance()
 
         if self.currentChar == '=':
             self.advance()
             tokType = TT_LTE
         
-        return Token(tokType, startPos=posStart, endPos=self.pos)
\ No newline at end of file
+        return Token(tokType, None, start, self.idx, self.source), None
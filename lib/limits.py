@@ -0,0 +1,296 @@
+import math, time
+from fractions import Fraction
+from .tokens import *
+from .nodes import *
+from .errors import RTError
+from .numeric import FractionBackend
+
+##################################
+# LIMITS
+##################################
+
+
+class Limits:
+    # Bounds on one run of a program from an untrusted source, None for
+    # no bound:
+    #   maxSteps  nodes evaluated
+    #   timeout   seconds the run may take
+    #   maxBits   bits a number the program computes or writes down may
+    #             take: an int its bit length, a fraction its numerator's
+    #             or denominator's. Floats and decimals have a fixed size.
+    #             Sums of ints are not measured, each '+' or '-' adds a bit
+    #             at most, and a product of variables is once it is
+    #             multiplied again, assigned or a statement's value.
+    # A run breaking one fails with a runtime error pointing at the part
+    # of the program it was at. Lexing, parsing and compiling count
+    # against the timeout but are not interrupted, the length of the
+    # source bounds them. Neither is a single operation: the clock is read
+    # after each one that may have computed a large number, but without
+    # maxBits one multiplying two huge numbers runs to its end.
+    __slots__ = ('maxSteps', 'timeout', 'maxBits')
+
+    def __init__(self, maxSteps=None, timeout=None, maxBits=None):
+        self.maxSteps = maxSteps
+        self.timeout = timeout
+        self.maxBits = maxBits
+
+
+##################################
+# METERING
+##################################
+
+# Counting every node as it is evaluated would cost about as much as
+# evaluating it. Steps are charged a chunk at a time instead, like gas per
+# basic block: the Planner wraps subtrees in MeterNodes, each charging on
+# entry for the nodes evaluated between it and the MeterNodes below it. A
+# program has no loops, every node is evaluated at most once and all those
+# of a chunk are (unless an error ends the run first), so what a chunk
+# costs is known before it runs.
+#
+# The operands 'and', 'or' and a chain may skip start chunks of their own,
+# or, below SKIPPED_SIZE nodes, are charged whether they run or not. Other
+# chunks hold about CHUNK_SIZE nodes, a run of statements being charged at
+# the first one. The clock is read every CLOCK_INTERVAL steps, and after
+# computing a number of more than CLOCK_BITS bits, which took longer than
+# reading it.
+#
+# With maxBits, the operators that can make a number larger than their
+# operands by more than a bit are measured, by a MeterNode checking their
+# value, but not each of them: measuring every '*' would cost a fifth of
+# the run and more. How large a value of literals and floats gets is
+# worked out before the run, only those that may go past maxBits, like
+# literals over it, are measured. Of the others, one with a value not
+# measured yet for an operand is, and what is assigned to a variable and
+# a statement's value: a number grows past maxBits by one such operator at
+# most before a run stops. With a timeout, every one of those operators
+# is measured for the clock, unless its value is known to stay within
+# CLOCK_BITS. Limits apply to the tree that runs: with optimize, what the
+# Optimizer folded is neither charged nor measured.
+
+CHUNK_SIZE = 256
+SKIPPED_SIZE = 16
+CLOCK_INTERVAL = 4096
+CLOCK_BITS = 1 << 14
+
+ARITHMETIC = (TT_PLUS, TT_MINUS, TT_MUL, TT_DIV, TT_POW)
+# the size of a float's, or of a decimal's, as the Planner works them out
+FIXED = -1
+
+def measuredOperators(backend):
+    # '*' and '^' on ints, every one on fractions
+    if backend is None: return (TT_MUL, TT_POW)
+    if isinstance(backend, FractionBackend): return ARITHMETIC
+    return ()
+
+
+def sizeBits(value):
+    # how many bits a number takes, 0 for the fixed size ones
+    valueType = type(value)
+    if valueType is int: return value.bit_length()
+    if valueType is Fraction: return max(value.numerator.bit_length(), value.denominator.bit_length())
+    return 0
+
+
+class Meter:
+    # The limits of one run and the steps it took so far, set on its
+    # Context. charge() and measure() return the error of a limit broken,
+    # or None.
+    __slots__ = ('limits', 'maxSteps', 'maxBits', 'steps', 'deadline', 'clock')
+
+    def __init__(self, limits):
+        self.limits = limits
+        self.maxSteps = limits.maxSteps
+        self.maxBits = limits.maxBits
+        self.steps = 0
+        self.deadline = None if limits.timeout is None else time.monotonic() + limits.timeout
+        # steps at which the clock is read next
+        self.clock = CLOCK_INTERVAL
+
+    def charge(self, node, context):
+        self.steps += node.cost
+        if self.maxSteps is not None and self.steps > self.maxSteps:
+            return self.error(node, f'Step limit of {self.maxSteps} exceeded', context)
+        if self.deadline is not None and self.steps >= self.clock:
+            self.clock = self.steps + CLOCK_INTERVAL
+            return self.checkClock(node, context)
+        return None
+
+    def measure(self, node, value, context):
+        bits = sizeBits(value)
+        if self.maxBits is not None and bits > self.maxBits:
+            return self.error(node, f'Result larger than {self.maxBits} bits', context)
+        if bits > CLOCK_BITS and self.deadline is not None:
+            return self.checkClock(node, context)
+        return None
+
+    def checkClock(self, node, context):
+        if time.monotonic() > self.deadline:
+            return self.error(node, f'Time limit of {self.limits.timeout:g} seconds exceeded', context)
+        return None
+
+    def error(self, node, details, context):
+        node = node.node
+        return RTError(node.startPos, node.endPos, details, context)
+
+
+class Planner:
+    # The metered copy of a tree for runs with limits: MeterNodes put in,
+    # the nodes above them copied, the rest shared with the original.
+    # backend: what the numbers of the run are.
+    #
+    # The tree is walked with an explicit stack, like by the
+    # IterativeInterpreter: a node is visited once its children were, with
+    # the (node, cost, bits, grown) they came out as: cost counting the
+    # nodes they evaluate outside of chunks of their own, bits at most how
+    # large their value is (FIXED, or None when only the run knows), and
+    # grown whether a measured operator's value, not measured yet, is in
+    # it.
+    def __init__(self, limits, backend=None):
+        self.maxBits = limits.maxBits
+        measuring = limits.maxBits is not None or limits.timeout is not None
+        self.measuredOperators = measuredOperators(backend) if measuring else ()
+        # under a deadline, every value that may take longer to compute
+        # than reading the clock is measured
+        self.clocked = limits.timeout is not None
+        self.largest = limits.maxBits if limits.maxBits is not None else math.inf
+        if self.clocked: self.largest = min(self.largest, CLOCK_BITS)
+        self.fractions = isinstance(backend, FractionBackend)
+
+    def plan(self, node):
+        visited = []
+        stack = [(node, False)]
+        while stack:
+            node, ready = stack.pop()
+            children = self.children(node)
+            if children and not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            count = len(children)
+            methodType = f'visit{type(node).__name__}'
+            method = getattr(self, methodType, self.noVisitMethod)
+            node, cost, bits, grown = method(node, visited[len(visited) - count:])
+            del visited[len(visited) - count:]
+            if cost >= CHUNK_SIZE:
+                node, cost = self.chunk(node, cost), 0
+            visited.append((node, cost, bits, grown))
+
+        node, cost, bits, grown = visited[0]
+        node = self.measured(node, grown)
+        return self.chunk(node, cost) if cost else node
+
+    def children(self, node):
+        nodeType = type(node)
+        if nodeType is BinaryOperationNode: return (node.leftNode, node.rightNode)
+        if nodeType is UnaryOperationNode: return (node.node,)
+        if nodeType is VarAssignNode: return (node.nodeValue,)
+        if nodeType is ChainedComparisonNode: return node.operands
+        if nodeType is ProgramNode: return node.statements
+        return ()
+
+    def noVisitMethod(self, node, visited):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def chunk(self, node, cost):
+        # node, charging cost when evaluated
+        if type(node) is MeterNode:
+            # a measured one, only seen by this planner so far
+            node.cost += cost
+            return node
+        return MeterNode(node, cost, False)
+
+    def measured(self, node, grown):
+        # node, its value measured when it may have grown past maxBits
+        return MeterNode(node, 0, True) if grown else node
+
+    def skippable(self, node, cost):
+        if cost >= SKIPPED_SIZE:
+            return self.chunk(node, cost), 0
+        return node, cost
+
+    def visitNumberNode(self, node, visited):
+        value = node.token.value
+        bits = sizeBits(value) if type(value) in (int, Fraction) else FIXED
+        if self.maxBits is not None and bits != FIXED and bits > self.maxBits:
+            return MeterNode(node, 0, True), 1, None, False
+        return node, 1, bits, False
+
+    def visitVarAccessNode(self, node, visited):
+        return node, 1, None, False
+
+    def visitVarAssignNode(self, node, visited):
+        [(nodeValue, cost, bits, grown)] = visited
+        if grown:
+            # what a variable holds is measured
+            nodeValue, bits = MeterNode(nodeValue, 0, True), None
+        if nodeValue is not node.nodeValue:
+            node = VarAssignNode(node.varNameToken, nodeValue)
+        return node, cost + 1, bits, False
+
+    def visitUnaryOperationNode(self, node, visited):
+        [(child, cost, bits, grown)] = visited
+        if child is not node.node:
+            node = UnaryOperationNode(node.opToken, child)
+        if node.opToken.type == TT_KEYWORD:
+            return node, cost + 1, 1, False
+        return node, cost + 1, bits, grown
+
+    def visitBinaryOperationNode(self, node, visited):
+        opType = node.opToken.type
+        (left, leftCost, leftBits, leftGrown), (right, rightCost, rightBits, rightGrown) = visited
+        if opType == TT_KEYWORD:
+            right, rightCost = self.skippable(right, rightCost)
+        if left is not node.leftNode or right is not node.rightNode:
+            node = BinaryOperationNode(left, node.opToken, right)
+        cost = leftCost + rightCost + 1
+        if opType not in ARITHMETIC:
+            return node, cost, 1, False
+
+        bits = self.resultBits(opType, leftBits, rightBits)
+        grown = leftGrown or rightGrown
+        if bits == FIXED: return node, cost, bits, False
+        if bits is not None:
+            if opType in self.measuredOperators and bits > self.largest:
+                node, bits = MeterNode(node, 0, True), None
+            return node, cost, bits, False
+        if opType in self.measuredOperators:
+            if grown or self.clocked: return MeterNode(node, 0, True), cost, None, False
+            grown = True
+        return node, cost, None, grown
+
+    def resultBits(self, opType, left, right):
+        # at most how many bits an operation on numbers of left and right
+        # bits gives, None when not known before the run
+        if left == FIXED or right == FIXED: return FIXED
+        if self.fractions:
+            if left is None or right is None: return None
+            return left << min(right, 64) if opType == TT_POW else left + right + 1
+        # ints divide to floats
+        if opType == TT_DIV: return FIXED
+        if left is None or right is None: return None
+        if opType == TT_POW:
+            # the exponent is at most 2 ** right
+            return left << min(right, 64)
+        if opType == TT_MUL: return left + right
+        return max(left, right) + 1
+
+    def visitChainedComparisonNode(self, node, visited):
+        # the first comparison always runs
+        visited = [(operand, cost) for operand, cost, bits, grown in visited]
+        visited = visited[:2] + [self.skippable(operand, cost) for operand, cost in visited[2:]]
+        operands = [operand for operand, cost in visited]
+        if any(new is not old for new, old in zip(operands, node.operands)):
+            node = ChainedComparisonNode(operands, node.opTokens)
+        return node, sum(cost for operand, cost in visited) + 1, 1, False
+
+    def visitProgramNode(self, node, visited):
+        # a run of statements is charged at its first one, the program
+        # itself with the first run
+        statements = [self.measured(statement, grown) for statement, cost, bits, grown in visited]
+        start, total = 0, 1
+        for index, (statement, cost, bits, grown) in enumerate(visited):
+            total += cost
+            if total >= CHUNK_SIZE or index == len(visited) - 1:
+                if total: statements[start] = self.chunk(statements[start], total)
+                start, total = index + 1, 0
+        return ProgramNode(statements, node.start, node.end, node.source), 0, None, False
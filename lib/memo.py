@@ -0,0 +1,211 @@
+from collections import OrderedDict
+from .tokens import *
+from .nodes import *
+from .interpreter import Interpreter
+
+##################################
+# MEMO CACHE
+##################################
+
+# distinct shapes remembered per value before they are all dropped
+SHAPES_PER_ENTRY = 64
+
+
+class MemoCache:
+    # Values of sub-expressions, kept across runs. An expression is known
+    # by its shape: the same operators applied to the same literals and
+    # variable names, wherever and in whatever program it appears. A value
+    # is reused while the variables it was computed from still hold the
+    # bindings they held then (SymbolTable.version).
+    #
+    # maxSize bounds the values (least recently used go first) and the
+    # trees kept analyzed. Only subtrees of at least minSize nodes are
+    # memoized, smaller ones are cheaper to compute than to look up.
+    def __init__(self, maxSize=4096, minSize=4):
+        self.maxSize = maxSize
+        self.minSize = minSize
+        # (shape, backend) -> (names, versions, value)
+        self.entries = OrderedDict()
+        # tree -> {memoized node: (shape, names)}
+        self.plans = OrderedDict()
+        # (node type, operator(s) or literal, child shapes) -> shape number
+        self.shapes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def plan(self, node):
+        plan = self.plans.get(node)
+        if plan is None:
+            # shape numbers are only ever forgotten all at once
+            if len(self.shapes) > SHAPES_PER_ENTRY * max(self.maxSize, 1):
+                self.invalidate()
+            plan = self.plans[node] = Planner(self).plan(node)
+            if len(self.plans) > self.maxSize:
+                self.plans.popitem(last=False)
+        else:
+            self.plans.move_to_end(node)
+        return plan
+
+    def shape(self, key):
+        shape = self.shapes.get(key)
+        if shape is None:
+            shape = self.shapes[key] = len(self.shapes)
+        return shape
+
+    def get(self, key, versions):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] != versions:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, names, versions, value):
+        if self.maxSize <= 0: return
+        self.entries[key] = (names, versions, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxSize):
+        self.maxSize = maxSize
+        while len(self.entries) > max(maxSize, 0):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+        while len(self.plans) > max(maxSize, 0):
+            self.plans.popitem(last=False)
+
+    def invalidate(self):
+        # forgets every value, e.g. after writing to SymbolTable.symbols
+        # directly, which does not bump versions. Returns how many.
+        count = len(self.entries)
+        self.entries.clear()
+        self.plans.clear()
+        self.shapes.clear()
+        return count
+
+    def stats(self):
+        return {
+            'size': len(self.entries),
+            'maxSize': self.maxSize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'trees': len(self.plans),
+            'shapes': len(self.shapes),
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class Planner:
+    # Finds the subtrees of a tree worth memoizing: at least minSize nodes
+    # and no assignment, whose effect a cached value would skip. Each gets
+    # its shape and the sorted names of the variables it reads.
+    def __init__(self, cache):
+        self.cache = cache
+        self.memoized = {}
+
+    def plan(self, node):
+        self.visit(node)
+        return self.memoized
+
+    # every visit returns (shape, names, size), shape None when impure
+
+    def visit(self, node):
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        shape, names, size = method(node)
+        # a MeterNode's value is memoized at its node
+        if shape is not None and size >= self.cache.minSize and type(node) is not MeterNode:
+            self.memoized[node] = (shape, tuple(sorted(names)))
+        return shape, names, size
+
+    def noVisitMethod(self, node):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def visitProgramNode(self, node):
+        for statement in node.statements:
+            self.visit(statement)
+        return None, (), 0
+
+    def visitNumberNode(self, node):
+        # 1 and 1.0 are different literals
+        token = node.token
+        return self.cache.shape((NumberNode, token.type, token.value)), frozenset(), 1
+
+    def visitVarAccessNode(self, node):
+        name = node.varNameToken.value
+        return self.cache.shape((VarAccessNode, name)), frozenset((name,)), 1
+
+    def visitVarAssignNode(self, node):
+        self.visit(node.nodeValue)
+        return None, (), 0
+
+    def visitUnaryOperationNode(self, node):
+        shape, names, size = self.visit(node.node)
+        if shape is None: return None, (), 0
+        opToken = node.opToken
+        return self.cache.shape((UnaryOperationNode, opToken.type, opToken.value, shape)), names, size + 1
+
+    def visitBinaryOperationNode(self, node):
+        left, leftNames, leftSize = self.visit(node.leftNode)
+        right, rightNames, rightSize = self.visit(node.rightNode)
+        if left is None or right is None: return None, (), 0
+        # keywords ('and', 'or', 'not') differ by their value
+        opToken = node.opToken
+        shape = self.cache.shape((BinaryOperationNode, opToken.type, opToken.value, left, right))
+        return shape, leftNames | rightNames, leftSize + rightSize + 1
+
+    def visitMeterNode(self, node):
+        # a hit skips the steps of the chunks below, and what is measured
+        # was when the value was computed
+        return self.visit(node.node)
+
+    def visitChainedComparisonNode(self, node):
+        operands = [self.visit(operand) for operand in node.operands]
+        if any(shape is None for shape, names, size in operands): return None, (), 0
+        opTypes = tuple(opToken.type for opToken in node.opTokens)
+        shape = self.cache.shape((ChainedComparisonNode, opTypes) + tuple(shape for shape, names, size in operands))
+        names = frozenset().union(*(names for shape, names, size in operands))
+        return shape, names, sum(size for shape, names, size in operands) + 1
+
+
+##################################
+# MEMO INTERPRETER
+##################################
+
+
+class MemoInterpreter(Interpreter):
+    # Interpreter.run that looks the memoized subtrees up in a MemoCache
+    # before computing them. Values only: errors are never cached, and
+    # results get the positions of the node they are used for.
+    def __init__(self, cache):
+        self.cache = cache
+        self.memoized = {}
+
+    def run(self, node, context):
+        if context.frame is not None:
+            raise ValueError('Memoized runs read variables from the symbol table, not resolved frames')
+        self.memoized = self.cache.plan(node)
+        return super().run(node, context)
+
+    def compute(self, node, context):
+        plan = self.memoized.get(node)
+        if plan is None:
+            return super().compute(node, context)
+
+        shape, names = plan
+        symbolTable = context.symbolTable
+        versions = tuple([symbolTable.version(name) for name in names])
+        key = (shape, context.backend)
+        entry = self.cache.get(key, versions)
+        if entry is not None:
+            return entry[2]
+        value = super().compute(node, context)
+        self.cache.put(key, names, versions, value)
+        return value
@@ -1,49 +1,141 @@
+from .source import Span
+
 ##################################
 # NODES
 ##################################
 
-class NumberNode:
+class NumberNode(Span):
+    __slots__ = ('token', 'start', 'end', 'source')
+
     def __init__(self, token):
         self.token = token
-        self.startPos = token.startPos
-        self.endPos = token.endPos
+        self.start = token.start
+        self.end = token.end
+        self.source = token.source
 
     def __repr__(self):
         return f'{self.token}'
 
 
-class BinaryOperationNode:
+class BinaryOperationNode(Span):
+    __slots__ = ('leftNode', 'opToken', 'rightNode', 'start', 'end', 'source')
+
     def __init__(self, leftNode, opToken, rightNode):
         self.leftNode = leftNode
         self.opToken = opToken
         self.rightNode = rightNode
 
-        self.startPos = self.leftNode.startPos
-        self.endPos = self.rightNode.endPos
+        self.start = self.leftNode.start
+        self.end = self.rightNode.end
+        self.source = self.leftNode.source
 
     def __repr__(self):
         return f'({self.leftNode}, {self.opToken}, {self.rightNode})'
 
-class UnaryOperationNode:
+class UnaryOperationNode(Span):
+    __slots__ = ('opToken', 'node', 'start', 'end', 'source')
+
     def __init__(self, opToken, node):
         self.opToken = opToken
         self.node = node
-        self.startPos = self.opToken.startPos
-        self.endPos = self.node.endPos
+        self.start = self.opToken.start
+        self.end = self.node.end
+        self.source = self.opToken.source
 
     def __repr__(self):
         return f'({self.opToken}, {self.node})'
 
-class VarAssignNode:
+class ChainedComparisonNode(Span):
+    __slots__ = ('operands', 'opTokens', 'start', 'end', 'source')
+
+    def __init__(self, operands, opTokens):
+        # a < b <= c: opTokens[i] compares operands[i] with operands[i + 1].
+        # Every operand is evaluated at most once, left to right, and none
+        # after the first comparison that is false.
+        self.operands = operands
+        self.opTokens = opTokens
+        self.start = operands[0].start
+        self.end = operands[-1].end
+        self.source = operands[0].source
+
+    def __repr__(self):
+        parts = [repr(self.operands[0])]
+        for opToken, operand in zip(self.opTokens, self.operands[1:]):
+            parts += [repr(opToken), repr(operand)]
+        return f'({", ".join(parts)})'
+
+class MeterNode(Span):
+    __slots__ = ('node', 'cost', 'measured', 'start', 'end', 'source')
+
+    def __init__(self, node, cost, measured):
+        # put in by lib.limits.Planner: charges `cost` steps before node is
+        # evaluated, and checks the size of its value when measured
+        self.node = node
+        self.cost = cost
+        self.measured = measured
+        self.start = node.start
+        self.end = node.end
+        self.source = node.source
+
+    def __repr__(self):
+        return f'<{self.cost}{"!" if self.measured else ""} {self.node}>'
+
+class VarAssignNode(Span):
+    __slots__ = ('varNameToken', 'nodeValue', 'start', 'end', 'source', 'depth', 'slot')
+
     def __init__(self, varNameToken, nodeValue):
         self.varNameToken = varNameToken
         self.nodeValue = nodeValue
 
-        self.startPos = self.varNameToken.startPos
-        self.endPos = self.varNameToken.endPos
+        self.start = self.varNameToken.start
+        self.end = self.varNameToken.end
+        self.source = self.varNameToken.source
+        # filled in by the Resolver
+        self.depth = self.slot = None
+
+class VarAccessNode(Span):
+    __slots__ = ('varNameToken', 'start', 'end', 'source', 'depth', 'slot', 'needsCopy')
 
-class VarAccessNode:
     def __init__(self, varNameToken):
         self.varNameToken = varNameToken
-        self.startPos = varNameToken.startPos
-        self.endPos = varNameToken.endPos
\ No newline at end of file
+        self.start = varNameToken.start
+        self.end = varNameToken.end
+        self.source = varNameToken.source
+        # filled in by the Resolver
+        self.depth = self.slot = self.needsCopy = None
+
+class ProgramNode(Span):
+    __slots__ = ('statements', 'start', 'end', 'source')
+
+    def __init__(self, statements, start, end, source):
+        # statements run in order, the program evaluates to the last one
+        self.statements = statements
+        self.start = start
+        self.end = end
+        self.source = source
+
+    # the first and last statements can come from different sources, see
+    # incremental.py
+    @property
+    def startPos(self):
+        return self.statements[0].startPos if self.statements else super().startPos
+
+    @property
+    def endPos(self):
+        return self.statements[-1].endPos if self.statements else super().endPos
+
+    def __repr__(self):
+        return f'[{", ".join(map(repr, self.statements))}]'
+
+
+def positionNode(node):
+    # the node whose positions end up on the Number a node evaluates to
+    while True:
+        if isinstance(node, VarAssignNode):
+            node = node.nodeValue
+        elif isinstance(node, ProgramNode) and node.statements:
+            node = node.statements[-1]
+        elif isinstance(node, MeterNode):
+            node = node.node
+        else:
+            return node
@@ -0,0 +1,282 @@
+import decimal, operator
+from contextlib import nullcontext
+from fractions import Fraction
+from math import log2, inf
+from .tokens import *
+from .nodes import *
+
+##################################
+# POWER GUARD
+##################################
+
+# '^' results that would take more bits than this are a runtime error
+# instead of seconds of CPU (2 ^ 1048576 is about 315,000 digits)
+MAX_POWER_BITS = 1 << 20
+
+
+def powerBits(base, exponent):
+    # About how many bits base ** exponent takes when computed exactly. 0
+    # when the cost does not depend on the operands: float results,
+    # decimals (rounded to their context) and bases of 0, 1 and -1.
+    if type(exponent) is Fraction:
+        if exponent.denominator != 1: return 0
+        exponent = exponent.numerator
+    if type(exponent) is not int: return 0
+
+    if type(base) is int:
+        # int ** negative int is a float
+        if exponent < 0 or -1 <= base <= 1: return 0
+        size = abs(base)
+    elif type(base) is Fraction:
+        size = max(abs(base.numerator), base.denominator)
+        if size <= 1: return 0
+    else:
+        return 0
+    # each unit of the exponent adds a bit or more, no need to convert
+    # one too large for a float, like that of 2 ^ 9999999 ^ 99
+    if abs(exponent) > MAX_POWER_BITS: return inf
+    return log2(size) * abs(exponent)
+
+
+def powerTooLarge(base, exponent):
+    return powerBits(base, exponent) > MAX_POWER_BITS
+
+
+def power(base, exponent):
+    # base ** exponent, or the details (a str) of the runtime error it
+    # is instead
+    if powerTooLarge(base, exponent): return POWER_TOO_LARGE
+    try:
+        return base ** exponent
+    except OverflowError:
+        return hugeExponentPower(base, exponent)
+    except ZeroDivisionError:
+        # 0 ^ -1, decimal's DivisionByZero too
+        return DIVISION_BY_ZERO
+    except ArithmeticError:
+        # decimal's InvalidOperation: 0 ^ 0, (0 - 8) ^ 0.5
+        return ILLEGAL_OPERATION
+
+
+def hugeExponentPower(base, exponent):
+    # base ** exponent after an OverflowError, which a float result too
+    # large raises, or an exponent too large to convert to a float, like
+    # that of 0.5 ^ (2 ^ 1100): the result is then 0, 1 or too large
+    try:
+        float(exponent)
+        return POWER_TOO_LARGE
+    except OverflowError:
+        pass
+    size = abs(base)
+    if size == 0 and exponent < 0: return DIVISION_BY_ZERO
+    if (size < 1 and exponent < 0) or (size > 1 and exponent > 0): return POWER_TOO_LARGE
+    if type(base) is complex:
+        # the angle of one on the unit circle would need the exponent
+        return 0j if size != 1 else ILLEGAL_OPERATION
+    odd = base < 0 and exponent % 2 == 1
+    if size == 1: return -1.0 if odd else 1.0
+    return -0.0 if odd else 0.0
+
+
+POWER_TOO_LARGE = "Result of '^' too large"
+DIVISION_BY_ZERO = "Division by Zero"
+ILLEGAL_OPERATION = "Illegal operation"
+
+##################################
+# COMPARISONS
+##################################
+
+# Comparisons and 'and'/'or'/'not' evaluate to 1 or 0, any number but 0
+# counts as true. With a backend they are its 1 and 0, so that (a < b) / 2
+# is a fraction or a decimal like any other division: the (false, true)
+# of a run is truthValues(backend).
+
+COMPARISONS = {
+    TT_EE: operator.eq,
+    TT_NE: operator.ne,
+    TT_LT: operator.lt,
+    TT_GT: operator.gt,
+    TT_LTE: operator.le,
+    TT_GTE: operator.ge,
+}
+
+TRUTH = (0, 1)
+
+
+def truthValues(backend):
+    if backend is None: return TRUTH
+    return backend.convert(0), backend.convert(1)
+
+
+def compare(opType, left, right, truth=TRUTH):
+    # 1 or 0, None when the operands cannot be ordered ('^' can give
+    # complex numbers)
+    try:
+        return truth[1] if COMPARISONS[opType](left, right) else truth[0]
+    except TypeError:
+        return None
+
+
+def shortCircuit(opToken, left, truth=TRUTH):
+    # the value of an 'and'/'or' its left operand alone decides, None when
+    # the right one has to be evaluated
+    if opToken.value == 'and':
+        return truth[0] if left == 0 else None
+    return truth[1] if left != 0 else None
+
+##################################
+# NUMERIC BACKENDS
+##################################
+
+# What numbers are while a program runs. Without a backend (the default)
+# literals are Python ints and floats and arithmetic follows Python. A
+# backend converts the literals of a tree once (LiteralConverter, cached
+# per backend) and every variable read, and is active while the tree runs.
+# Converting a value of its numberType gives it back unchanged.
+
+
+class FloatBackend:
+    # everything is a float: fastest, inexact
+    name = 'float'
+    numberType = float
+
+    def convert(self, value):
+        return float(value)
+
+    def activate(self):
+        return nullcontext()
+
+
+class FractionBackend:
+    # exact rationals, 1 / 3 * 3 is 1. Only '^' with a fractional exponent
+    # leaves them for floats.
+    name = 'fraction'
+    numberType = Fraction
+
+    def convert(self, value):
+        if isinstance(value, float):
+            # the decimal literal as written, not its binary approximation
+            return Fraction(repr(value))
+        return Fraction(value)
+
+    def activate(self):
+        return nullcontext()
+
+
+class DecimalBackend:
+    # decimal floating point rounded to `precision` significant digits.
+    # Results past the exponent range are Infinity, like float '*'.
+    numberType = decimal.Decimal
+
+    def __init__(self, precision=28, rounding=decimal.ROUND_HALF_EVEN):
+        self.name = f'decimal:{precision}:{rounding}'
+        self.context = decimal.Context(
+            prec=precision, rounding=rounding,
+            traps=[decimal.InvalidOperation, decimal.DivisionByZero]
+        )
+
+    def convert(self, value):
+        if isinstance(value, Fraction):
+            return decimal.Decimal(value.numerator) / value.denominator
+        if isinstance(value, float):
+            return decimal.Decimal(repr(value))
+        return decimal.Decimal(value)
+
+    def activate(self):
+        return decimal.localcontext(self.context)
+
+
+BACKENDS = {
+    'default': None,
+    'float': FloatBackend(),
+    'fraction': FractionBackend(),
+    'decimal': DecimalBackend(),
+}
+
+
+def getBackend(numeric):
+    # a name from BACKENDS or a backend instance (e.g. DecimalBackend(50))
+    if numeric is None or not isinstance(numeric, str):
+        return numeric
+    if numeric not in BACKENDS:
+        raise ValueError(f'Unknown numeric mode {numeric!r}, expected one of {tuple(BACKENDS)}')
+    return BACKENDS[numeric]
+
+
+def activate(backend):
+    return nullcontext() if backend is None else backend.activate()
+
+
+##################################
+# LITERAL CONVERTER
+##################################
+
+
+class LiteralConverter:
+    # Copy of a tree with every number literal converted by a backend.
+    # Subtrees without literals are shared with the original. The tree is
+    # walked with an explicit stack, like by limits.Planner, so that deep
+    # trees the stack parser and the IterativeInterpreter take are
+    # converted too: a node is visited once its children were, with what
+    # they were converted to.
+    def __init__(self, backend):
+        self.backend = backend
+
+    def convert(self, node):
+        visited = []
+        stack = [(node, False)]
+        while stack:
+            node, ready = stack.pop()
+            children = self.children(node)
+            if children and not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+            count = len(children)
+            methodType = f'visit{type(node).__name__}'
+            method = getattr(self, methodType, self.noVisitMethod)
+            node = method(node, visited[len(visited) - count:])
+            del visited[len(visited) - count:]
+            visited.append(node)
+        return visited[0]
+
+    def children(self, node):
+        nodeType = type(node)
+        if nodeType is BinaryOperationNode: return (node.leftNode, node.rightNode)
+        if nodeType is UnaryOperationNode: return (node.node,)
+        if nodeType is VarAssignNode: return (node.nodeValue,)
+        if nodeType is ChainedComparisonNode: return node.operands
+        if nodeType is ProgramNode: return node.statements
+        return ()
+
+    def noVisitMethod(self, node, visited):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def visitNumberNode(self, node, visited):
+        token = node.token
+        return NumberNode(Token(token.type, self.backend.convert(token.value), token.start, token.end, token.source))
+
+    def visitVarAccessNode(self, node, visited):
+        return node
+
+    def visitVarAssignNode(self, node, visited):
+        [nodeValue] = visited
+        if nodeValue is node.nodeValue: return node
+        return VarAssignNode(node.varNameToken, nodeValue)
+
+    def visitUnaryOperationNode(self, node, visited):
+        [child] = visited
+        if child is node.node: return node
+        return UnaryOperationNode(node.opToken, child)
+
+    def visitBinaryOperationNode(self, node, visited):
+        left, right = visited
+        if left is node.leftNode and right is node.rightNode: return node
+        return BinaryOperationNode(left, node.opToken, right)
+
+    def visitChainedComparisonNode(self, node, visited):
+        if all(new is old for new, old in zip(visited, node.operands)): return node
+        return ChainedComparisonNode(visited, node.opTokens)
+
+    def visitProgramNode(self, node, visited):
+        return ProgramNode(visited, node.start, node.end, node.source)
@@ -0,0 +1,181 @@
+from .tokens import *
+from .nodes import *
+from .numeric import power, compare, shortCircuit, truthValues
+
+##################################
+# OPTIMIZER
+##################################
+
+FOLDABLE = {
+    TT_PLUS: lambda left, right: left + right,
+    TT_MINUS: lambda left, right: left - right,
+    TT_MUL: lambda left, right: left * right,
+    TT_DIV: lambda left, right: left / right,
+    # the details of its error when it fails, see numeric.power
+    TT_POW: power,
+}
+
+
+def mentionsVariables(node):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (VarAccessNode, VarAssignNode)):
+            return True
+        if isinstance(node, BinaryOperationNode):
+            stack.append(node.leftNode)
+            stack.append(node.rightNode)
+        elif isinstance(node, UnaryOperationNode):
+            stack.append(node.node)
+        elif isinstance(node, ChainedComparisonNode):
+            stack.extend(node.operands)
+    return False
+
+
+def isConstant(node, value):
+    # exact type check so that 1.0 does not pass for 1 (x * 1.0 is a float)
+    return isinstance(node, NumberNode) and type(node.token.value) is type(value) and node.token.value == value
+
+
+class Optimizer:
+    # Returns a new tree, the one passed in is left untouched as it may be
+    # shared through the parse cache.
+    #
+    # `observed` is set while visiting a node whose positions can end up in
+    # an error: the right operand of '/' reports "Division by Zero" at its
+    # own positions, an illegal comparison spans both operands. Such a node
+    # may be folded (the folded number keeps its span) but never replaced
+    # by one of its children.
+    #
+    # Operands that would never run ('0 and ...', what follows a false
+    # comparison in a chain) are dropped, errors in them included, as long
+    # as they mention no variable: the Resolver numbers slots over the
+    # names a tree mentions, and the optimized tree has to agree with the
+    # original one it shares nodes with.
+    #
+    # backend: the one the tree's literals were converted for, whose 1 and
+    # 0 comparisons fold to.
+
+    def __init__(self, backend=None):
+        self.truth = truthValues(backend)
+
+    def optimize(self, node):
+        return self.visit(node, False)
+
+    def visit(self, node, observed):
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        return method(node, observed)
+
+    def noVisitMethod(self, node, observed):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def rebuild(self, new, node):
+        # a rewritten child can cover less text than the original one did
+        new.start = node.start
+        new.end = node.end
+        return new
+
+    def fold(self, node, value):
+        tokType = TT_INT if isinstance(value, int) else TT_FLOAT
+        return NumberNode(Token(tokType, value, node.start, node.end, node.source))
+
+    def visitProgramNode(self, node, observed):
+        statements = [self.visit(statement, False) for statement in node.statements]
+        if all(new is old for new, old in zip(statements, node.statements)): return node
+        return ProgramNode(statements, node.start, node.end, node.source)
+
+    def visitNumberNode(self, node, observed):
+        return node
+
+    def visitVarAccessNode(self, node, observed):
+        return node
+
+    def visitVarAssignNode(self, node, observed):
+        nodeValue = self.visit(node.nodeValue, observed)
+        if nodeValue is node.nodeValue: return node
+        return self.rebuild(VarAssignNode(node.varNameToken, nodeValue), node)
+
+    def visitUnaryOperationNode(self, node, observed):
+        child = self.visit(node.node, False)
+
+        if node.opToken.type == TT_KEYWORD and isinstance(child, NumberNode):
+            return self.fold(node, self.truth[child.token.value == 0])
+        if node.opToken.type == TT_MINUS:
+            if isinstance(child, NumberNode):
+                # same operation as Interpreter.visitUnaryOperationNode
+                return self.fold(node, child.token.value * -1)
+            if not observed and isinstance(child, UnaryOperationNode) and child.opToken.type == TT_MINUS:
+                return child.node
+
+        if child is node.node: return node
+        return self.rebuild(UnaryOperationNode(node.opToken, child), node)
+
+    def visitBinaryOperationNode(self, node, observed):
+        opType = node.opToken.type
+        if opType == TT_KEYWORD:
+            return self.logicalOperation(node)
+        if opType in COMPARISON_TYPES:
+            left = self.visit(node.leftNode, True)
+            right = self.visit(node.rightNode, True)
+            if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+                value = compare(opType, left.token.value, right.token.value, self.truth)
+                if value is not None: return self.fold(node, value)
+            if left is node.leftNode and right is node.rightNode: return node
+            return self.rebuild(BinaryOperationNode(left, node.opToken, right), node)
+
+        left = self.visit(node.leftNode, False)
+        right = self.visit(node.rightNode, opType == TT_DIV)
+
+        if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+            # division by zero is left to the interpreter so the error is
+            # still reported at run time, so are powers that fail and
+            # anything else that raises
+            leftValue, rightValue = left.token.value, right.token.value
+            if not (opType == TT_DIV and rightValue == 0):
+                try:
+                    value = FOLDABLE[opType](leftValue, rightValue)
+                    if type(value) is not str: return self.fold(node, value)
+                except (ArithmeticError, ValueError):
+                    pass
+
+        if not observed:
+            # x + 0 is not rewritten: -0.0 + 0 is 0.0
+            if opType == TT_MUL and isConstant(right, 1): return left
+            if opType == TT_MUL and isConstant(left, 1): return right
+            if opType == TT_MINUS and isConstant(right, 0): return left
+            if opType == TT_POW and isConstant(right, 1): return left
+
+        if left is node.leftNode and right is node.rightNode: return node
+        return self.rebuild(BinaryOperationNode(left, node.opToken, right), node)
+
+    def logicalOperation(self, node):
+        left = self.visit(node.leftNode, False)
+        right = self.visit(node.rightNode, False)
+        if isinstance(left, NumberNode) and not mentionsVariables(right):
+            value = shortCircuit(node.opToken, left.token.value, self.truth)
+            if value is not None: return self.fold(node, value)
+        if isinstance(left, NumberNode) and isinstance(right, NumberNode):
+            return self.fold(node, self.truth[right.token.value != 0])
+
+        if left is node.leftNode and right is node.rightNode: return node
+        return self.rebuild(BinaryOperationNode(left, node.opToken, right), node)
+
+    def visitChainedComparisonNode(self, node, observed):
+        operands = [self.visit(operand, True) for operand in node.operands]
+        # folded up to the first comparison that is false, or through the
+        # whole chain when every operand is a number
+        for index, opToken in enumerate(node.opTokens):
+            left, right = operands[index], operands[index + 1]
+            if not (isinstance(left, NumberNode) and isinstance(right, NumberNode)):
+                break
+            value = compare(opToken.type, left.token.value, right.token.value, self.truth)
+            if value is None: break
+            if value == 0:
+                if any(map(mentionsVariables, operands[index + 2:])): break
+                return self.fold(node, value)
+        else:
+            return self.fold(node, self.truth[1])
+
+        if all(new is old for new, old in zip(operands, node.operands)): return node
+        return self.rebuild(ChainedComparisonNode(operands, node.opTokens), node)
@@ -7,8 +7,49 @@ from .tokens import *
 # PARSER
 ##################################
 
+# expr            : KEYWORD:var IDENTIFIER EQ expr
+#                 | andExpr (KEYWORD:or andExpr)*
+# andExpr         : comparitionExpr (KEYWORD:and comparitionExpr)*
+# comparitionExpr : KEYWORD:not comparitionExpr
+#                 | arithmeticExpr ((EE|NE|LT|GT|LTE|GTE) arithmeticExpr)*
+# arithmeticExpr  : term ((PLUS|MINUS) term)*
+# term            : factor ((MUL|DIV) factor)*
+# factor          : (PLUS|MINUS) factor | power
+# power           : atom (POW factor)*
+# atom            : INT | FLOAT | IDENTIFIER | LPAREN expr RPAREN
+#
+# andExpr to term are parsed by one loop, operation(), which only recurses
+# for an operand binding more strongly than the operator before it. Each
+# '(' then takes a few frames, not one or two per grammar level.
+
+# Binding strength of the binary operators, keywords by their value. 'not'
+# applies to a comparison and can only start one: after 'and', 'or', 'not',
+# '(' or 'var x ='.
+BINARY_PRECEDENCE = {
+    'or': 1,
+    'and': 2,
+    TT_EE: 4,
+    TT_NE: 4,
+    TT_LT: 4,
+    TT_GT: 4,
+    TT_LTE: 4,
+    TT_GTE: 4,
+    TT_PLUS: 5,
+    TT_MINUS: 5,
+    TT_MUL: 6,
+    TT_DIV: 6,
+    TT_POW: 8,
+}
+NOT_PRECEDENCE = 3
+COMPARISON_PRECEDENCE = 4
+
+EXPECTED_EXPRESSION = "Expected 'var', int, float, identifier, '+', '-', '(' or 'not'"
+EXPECTED_OPERATOR = "Expected '+', '-', '*', '/', '^', '==', '!=', '<', '>', '<=', '>=', 'and' or 'or'"
+
 
 class ParseResult:
+    __slots__ = ('error', 'node', 'advanceCount')
+
     def __init__(self):
         self.error = None
         self.node = None
@@ -85,7 +126,7 @@ class Parser:
         ))
 
     def power(self):
-        return self.binaryOperation(self.atom, (TT_POW), self.factor)
+        return self.binaryOperation(self.atom, (TT_POW,), self.factor)
 
     def factor(self):
         res = ParseResult()
@@ -111,7 +152,7 @@ class Parser:
         if res.error:
             return res
 
-        while self.currentToken.type in operators:# or (self.currentToken.type, self.currentToken.value) in operators:
+        while self.currentToken.type in operators:
             opToken = self.currentToken
             res.registerAdvancement()
             self.advance()
@@ -122,26 +163,45 @@ class Parser:
 
         return res.success(left)
     
-    def arithmeticExpr(self):
-        return self.binaryOperation(self.term, (TT_Minus, TT_Plus))
-
-    def term(self):
-        return self.binaryOperation(self.factor, (TT_DIV, TT_MUL))
-
-    def comparitionExpr(self):
+    def operation(self, minimum=1):
+        # andExpr down to term by precedence climbing, the operators binding
+        # at least as strongly as minimum
         res = ParseResult()
+        tok = self.currentToken
 
-        if self.currentToken.matches(TT_KEYWORD, 'not'): 
-            opToken = self.currentToken
+        if minimum <= NOT_PRECEDENCE and tok.matches(TT_KEYWORD, 'not'):
             res.registerAdvancement(); self.advance()
+            node = res.register(self.operation(NOT_PRECEDENCE))
+            if res.error: return res
+            left = UnaryOperationNode(tok, node)
+        else:
+            left = res.register(self.factor())
+            if res.error: return res
+
+        while True:
+            opToken = self.currentToken
+            precedence = BINARY_PRECEDENCE.get(opToken.value if opToken.type == TT_KEYWORD else opToken.type)
+            if precedence is None or precedence < minimum:
+                return res.success(left)
+
+            if precedence == COMPARISON_PRECEDENCE:
+                # a < b < c is a chain, not (a < b) < c
+                operands, opTokens = [left], []
+                while self.currentToken.type in COMPARISON_TYPES:
+                    opTokens.append(self.currentToken)
+                    res.registerAdvancement(); self.advance()
+                    operands.append(res.register(self.operation(precedence + 1)))
+                    if res.error: return res
+                if len(opTokens) == 1:
+                    left = BinaryOperationNode(operands[0], opTokens[0], operands[1])
+                else:
+                    left = ChainedComparisonNode(operands, opTokens)
+                continue
 
-            node = res.register(self.comparitionExpr())
+            res.registerAdvancement(); self.advance()
+            right = res.register(self.operation(precedence + 1))
             if res.error: return res
-            return res.success(UnaryOperationNode(opToken, Node))
-        
-        node = res.register(self.binaryOperation(
-            self.arithmeticExpr, (TT_EE, TT_LT, TT_GT, TT_NE, )
-        ))
+            left = BinaryOperationNode(left, opToken, right)
 
     def expr(self):
         res = ParseResult()
@@ -172,22 +232,56 @@ class Parser:
                 return res
             return res.success(VarAssignNode(varName, expr))
 
-        node = res.register(self.binaryOperation(
-            self.term, (TT_PLUS, TT_MINUS)))
+        node = res.register(self.operation())
         if res.error:
             return res.failure(InvalidSyntaxError(
                 self.currentToken.startPos, self.currentToken.endPos,
-                "Expected 'var', int, float, identifier, '+', '-', or '("
+                EXPECTED_EXPRESSION
                 )
             )
         return res.success(node)
 
-    def parse(self):
+    def statement(self):
+        # one statement of a program, ended by a separator or the end
         res = self.expr()
-        if not res.error and self.currentToken.type != TT_EOF:
+        if not res.error and self.currentToken.type not in (TT_NEWLINE, TT_EOF):
             return res.failure(InvalidSyntaxError(
                 self.currentToken.startPos, self.currentToken.endPos,
-                "Expected '+', '-', '*', or '/'"
+                EXPECTED_OPERATOR
                 )
             )
         return res
+
+    def program(self):
+        # statements separated by newlines or ';', blank ones are skipped
+        res = ParseResult()
+        first = self.currentToken
+        statements = []
+        while True:
+            while self.currentToken.type == TT_NEWLINE:
+                res.registerAdvancement()
+                self.advance()
+            if self.currentToken.type == TT_EOF:
+                break
+            statement = res.register(self.statement())
+            if res.error:
+                return res
+            statements.append(statement)
+
+        if not statements:
+            return res.success(ProgramNode(statements, 0, 0, first.source))
+        return res.success(ProgramNode(statements, statements[0].start, statements[-1].end, statements[0].source))
+
+    def parse(self):
+        # program() takes an empty one, for files, streams and sheets; as a
+        # single program it is a syntax error at its end
+        res = self.program()
+        if not res.error and not res.node.statements:
+            return res.failure(InvalidSyntaxError(
+                self.currentToken.startPos, self.currentToken.endPos,
+                EXPECTED_EXPRESSION
+            ))
+        # a one statement program is just that statement
+        if not res.error and len(res.node.statements) == 1:
+            res.node = res.node.statements[0]
+        return res
@@ -0,0 +1,140 @@
+from time import perf_counter
+from .nodes import *
+from .interpreter import Interpreter, Number
+
+##################################
+# PROFILE
+##################################
+
+
+class Profile:
+    # Collects timings across one or more basic.run(..., profile=...) calls.
+    # Nothing here is touched unless a Profile is passed in, runs without
+    # one go through the plain Interpreter and Number.
+    def __init__(self):
+        self.runs = 0
+        self.cacheHits = 0
+        self.stages = {}
+        self.tokens = 0
+        self.nodes = 0
+        self.numberAllocations = 0
+        # node type -> [visits, cumulative seconds, self seconds]
+        self.visits = {}
+        # 'run;evaluate;BinaryOperationNode;NumberNode' -> self seconds
+        self.folded = {}
+
+    def addStage(self, name, seconds, own=None):
+        # own: the part of seconds not already accounted for by deeper stacks
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        key = f'run;{name}'
+        self.folded[key] = self.folded.get(key, 0) + (seconds if own is None else own)
+
+    def countNodes(self, node):
+        count = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            count += 1
+            if isinstance(node, BinaryOperationNode):
+                stack.append(node.leftNode)
+                stack.append(node.rightNode)
+            elif isinstance(node, UnaryOperationNode):
+                stack.append(node.node)
+            elif isinstance(node, ChainedComparisonNode):
+                stack.extend(node.operands)
+            elif isinstance(node, VarAssignNode):
+                stack.append(node.nodeValue)
+            elif isinstance(node, ProgramNode):
+                stack.extend(node.statements)
+        self.nodes += count
+
+    def interpreter(self):
+        return ProfilingInterpreter(self)
+
+    def countAllocations(self):
+        return AllocationCounter(self)
+
+    def asDict(self):
+        return {
+            'runs': self.runs,
+            'cacheHits': self.cacheHits,
+            'stages': dict(self.stages),
+            'tokens': self.tokens,
+            'nodes': self.nodes,
+            'numberAllocations': self.numberAllocations,
+            'visits': {
+                name: {'count': count, 'cumulative': cumulative, 'self': own}
+                for name, (count, cumulative, own) in self.visits.items()
+            },
+        }
+
+    def writeFolded(self, path):
+        # one 'frame;frame;frame microseconds' line per stack, the input
+        # flamegraph.pl and speedscope expect
+        with open(path, 'w') as file:
+            for stack, seconds in sorted(self.folded.items()):
+                file.write(f'{stack} {round(seconds * 1e6)}\n')
+
+
+class AllocationCounter:
+    # Counts Number instances created while active by swapping in a
+    # counting __init__. Not thread safe: every thread creating Numbers in
+    # the meantime is counted too.
+    def __init__(self, profile):
+        self.profile = profile
+
+    def __enter__(self):
+        profile = self.profile
+        self.original = init = Number.__init__
+
+        def countingInit(number, value):
+            profile.numberAllocations += 1
+            init(number, value)
+
+        Number.__init__ = countingInit
+        return self
+
+    def __exit__(self, *exc):
+        Number.__init__ = self.original
+
+
+##################################
+# PROFILING INTERPRETER
+##################################
+
+
+class ProfilingInterpreter(Interpreter):
+    # Times every visit, so runs go through the boxed visit* methods
+    def __init__(self, profile):
+        self.profile = profile
+        self.stack = ['run', 'evaluate']
+        # time spent in the children of each frame on self.stack
+        self.childTime = [0, 0]
+
+    def run(self, node, context):
+        return self.visit(node, context)
+
+    def visit(self, node, context):
+        name = type(node).__name__
+        self.stack.append(name)
+        self.childTime.append(0)
+        start = perf_counter()
+        try:
+            return super().visit(node, context)
+        finally:
+            elapsed = perf_counter() - start
+            own = elapsed - self.childTime.pop()
+            self.childTime[-1] += elapsed
+
+            stats = self.profile.visits.get(name)
+            if stats is None:
+                stats = self.profile.visits[name] = [0, 0, 0]
+            stats[0] += 1
+            # a node type nested in itself is only counted once cumulatively
+            if name not in self.stack[2:-1]:
+                stats[1] += elapsed
+            stats[2] += own
+
+            key = ';'.join(self.stack)
+            self.profile.folded[key] = self.profile.folded.get(key, 0) + own
+            self.stack.pop()
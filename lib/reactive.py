@@ -0,0 +1,202 @@
+from .tokens import *
+from .nodes import *
+from .errors import RTError
+from .fastlexer import FastLexer
+from .parser_ import Parser
+from .interpreter import Interpreter, Context, Number
+from .symbols import SymbolTable
+
+##################################
+# DEPENDENCIES
+##################################
+
+
+def dependencies(node):
+    # (names read, names assigned) anywhere in a tree
+    reads, assigned = set(), set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, VarAccessNode):
+            reads.add(node.varNameToken.value)
+        elif isinstance(node, BinaryOperationNode):
+            stack.append(node.leftNode)
+            stack.append(node.rightNode)
+        elif isinstance(node, UnaryOperationNode):
+            stack.append(node.node)
+        elif isinstance(node, ChainedComparisonNode):
+            stack.extend(node.operands)
+        elif isinstance(node, VarAssignNode):
+            assigned.add(node.varNameToken.value)
+            stack.append(node.nodeValue)
+        elif isinstance(node, ProgramNode):
+            stack.extend(node.statements)
+    return reads, assigned
+
+
+class Formula:
+    __slots__ = ('name', 'node', 'reads')
+
+    def __init__(self, name, node, reads):
+        self.name = name
+        self.node = node
+        self.reads = reads
+
+
+##################################
+# SHEET
+##################################
+
+
+class Sheet:
+    # Variables kept up to date spreadsheet-style. A statement
+    #
+    #     var total = price * count
+    #
+    # makes total a formula of price and count: whenever either is assigned
+    # again, total is recomputed, and so is everything computed from total,
+    # each formula once and after all the formulas it reads. Assignments
+    # nested in a larger expression, and set(), only assign a value.
+    #
+    # A formula that would end up reading itself is refused with an error.
+    # A formula that fails leaves its variable undefined, so the formulas
+    # reading it fail too, until it computes again.
+    def __init__(self, symbolTable=None, fileName='<sheet>'):
+        self.fn = fileName
+        self.context = Context('<sheet>')
+        self.context.symbolTable = symbolTable if symbolTable is not None else SymbolTable()
+        self.interpreter = Interpreter()
+        # variable -> its formula
+        self.formulas = {}
+        # variable -> names of the formulas reading it
+        self.readers = {}
+        # variable -> error of its formula's last computation
+        self.errors = {}
+        self.recomputations = 0
+
+    def run(self, text):
+        # Runs the statements of text (separated by newlines or ';') and
+        # returns the value of the last one and the first error, if any
+        tokens, error = FastLexer(text, self.fn).make_token()
+        if error: return None, error
+        ast = Parser(tokens).program()
+        if ast.error: return None, ast.error
+
+        value = None
+        for statement in ast.node.statements:
+            value, error = self.runStatement(statement)
+            if error: return None, error
+        return value, None
+
+    def runStatement(self, node):
+        reads, assigned = dependencies(node)
+        if isinstance(node, VarAssignNode) and len(assigned) == 1:
+            return self.define(node, reads)
+
+        res = self.interpreter.run(node, self.context)
+        for name in assigned:
+            self.drop(name)
+        error = self.update(assigned)
+        return res.value, res.error or error
+
+    def define(self, node, reads):
+        name = node.varNameToken.value
+        cycle = self.findCycle(name, reads)
+        if cycle:
+            return None, RTError(
+                node.startPos, node.endPos,
+                f"Circular dependency: {' -> '.join(cycle)}", self.context
+            )
+
+        self.drop(name)
+        formula = self.formulas[name] = Formula(name, node, frozenset(reads))
+        for read in formula.reads:
+            self.readers.setdefault(read, set()).add(name)
+        error = self.compute(formula)
+        error = self.update((name,)) or error
+        return self.context.symbolTable.get(name), error
+
+    def set(self, name, value):
+        # assigns a value (a Number, int or float) to a variable, which
+        # stops being a formula, and recomputes what reads it. Returns the
+        # first error of the recomputation, if any.
+        if not isinstance(value, Number):
+            value = Number(value).setContext(self.context)
+        self.drop(name)
+        self.context.symbolTable.set(name, value)
+        return self.update((name,))
+
+    def get(self, name):
+        return self.context.symbolTable.get(name)
+
+    def drop(self, name):
+        # forgets the formula of name, not its value
+        formula = self.formulas.pop(name, None)
+        self.errors.pop(name, None)
+        if formula is None: return
+        for read in formula.reads:
+            readers = self.readers[read]
+            readers.discard(name)
+            if not readers: del self.readers[read]
+
+    def dependents(self, names):
+        # the formulas downstream of names, names' own excluded
+        found = set()
+        stack = list(names)
+        while stack:
+            for reader in self.readers.get(stack.pop(), ()):
+                if reader not in found:
+                    found.add(reader)
+                    stack.append(reader)
+        return found
+
+    def findCycle(self, name, reads):
+        # the variables name -> ... -> name would go through if it read
+        # reads (each one read by the next), None if it would not read itself
+        if name in reads: return [name, name]
+        parents = {name: None}
+        stack = [name]
+        while stack:
+            current = stack.pop()
+            for reader in self.readers.get(current, ()):
+                if reader == name or reader in parents: continue
+                parents[reader] = current
+                if reader in reads:
+                    path = [reader]
+                    while path[-1] != name:
+                        path.append(parents[path[-1]])
+                    return path[::-1] + [name]
+                stack.append(reader)
+        return None
+
+    def update(self, changed):
+        # recomputes the formulas downstream of changed, each after the
+        # ones it reads (Kahn's algorithm on the affected formulas)
+        affected = self.dependents(changed)
+        waiting = {
+            name: sum(1 for read in self.formulas[name].reads if read in affected)
+            for name in affected
+        }
+        ready = [name for name, count in waiting.items() if count == 0]
+        first = None
+        while ready:
+            name = ready.pop()
+            error = self.compute(self.formulas[name])
+            first = first or error
+            for reader in self.readers.get(name, ()):
+                if reader in waiting:
+                    waiting[reader] -= 1
+                    if waiting[reader] == 0: ready.append(reader)
+        return first
+
+    def compute(self, formula):
+        self.recomputations += 1
+        res = self.interpreter.run(formula.node, self.context)
+        if res.error:
+            self.errors[formula.name] = res.error
+            symbolTable = self.context.symbolTable
+            if symbolTable.symbols.get(formula.name) is not None:
+                symbolTable.remove(formula.name)
+            return res.error
+        self.errors.pop(formula.name, None)
+        return None
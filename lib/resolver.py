@@ -0,0 +1,126 @@
+from .tokens import *
+from .nodes import *
+
+##################################
+# FRAMES
+##################################
+
+
+class Frame:
+    # Array-backed variables of one scope, indexed by the slots the
+    # Resolver hands out. Empty slots hold None, like a missing symbol.
+    __slots__ = ('slots', 'parent')
+
+    def __init__(self, slots, parent=None):
+        self.slots = slots
+        self.parent = parent
+
+
+class Scope:
+    __slots__ = ('names', 'assigned')
+
+    def __init__(self, names, assigned):
+        # names[slot] is the variable held in that slot, assigned lists the
+        # slots the program writes to
+        self.names = names
+        self.assigned = assigned
+
+    def load(self, symbolTable, parent=None):
+        return Frame([symbolTable.get(name) for name in self.names], parent)
+
+    def store(self, frame, loaded, symbolTable):
+        # writes back the variables the run actually (re)assigned
+        for slot in self.assigned:
+            value = frame.slots[slot]
+            if value is not None and value is not loaded.slots[slot]:
+                symbolTable.set(self.names[slot], value)
+
+
+##################################
+# RESOLVER
+##################################
+
+# What may be looked at on the Number a node evaluates to, besides its
+# value. Reads that need neither can hand out the stored Number as is.
+SPAN = 1      # the right operand of '/' reports errors at its positions, comparisons at both
+CONTEXT = 2   # the left operand of '/' or a comparison (and what it is computed from) gives the error its context
+
+
+class Resolver:
+    # Annotates VarAccessNode/VarAssignNode with the (depth, slot) of their
+    # variable and VarAccessNode with whether a read has to copy the stored
+    # Number. There are no nested scopes yet, so depth is always 0.
+    #
+    # Slots are given out in name order, so the optimized and the original
+    # tree of a program (which share untouched subtrees) agree on them. A
+    # node shared by two trees needs a copy if either tree needs one.
+
+    def resolve(self, node):
+        self.accesses = []
+        self.assignments = []
+        self.visit(node, SPAN | CONTEXT)
+
+        names = sorted({n.varNameToken.value for n in self.accesses + self.assignments})
+        slots = {name: slot for slot, name in enumerate(names)}
+        for n in self.accesses + self.assignments:
+            n.depth = 0
+            n.slot = slots[n.varNameToken.value]
+        assigned = sorted({slots[n.varNameToken.value] for n in self.assignments})
+        return Scope(names, assigned)
+
+    def visit(self, node, observed):
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        return method(node, observed)
+
+    def noVisitMethod(self, node, observed):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def visitProgramNode(self, node, observed):
+        # only the value of the last statement is kept
+        last = len(node.statements) - 1
+        for index, statement in enumerate(node.statements):
+            self.visit(statement, observed if index == last else 0)
+
+    def visitNumberNode(self, node, observed):
+        pass
+
+    def visitVarAccessNode(self, node, observed):
+        self.accesses.append(node)
+        node.needsCopy = bool(observed) or bool(node.needsCopy)
+
+    def visitVarAssignNode(self, node, observed):
+        self.assignments.append(node)
+        self.visit(node.nodeValue, observed)
+
+    def visitUnaryOperationNode(self, node, observed):
+        # '+' hands its operand back with its own span set on it
+        if node.opToken.type == TT_PLUS:
+            self.visit(node.node, observed & ~SPAN)
+        else:
+            self.visit(node.node, observed & CONTEXT)
+
+    def visitBinaryOperationNode(self, node, observed):
+        # results take the left operand's context and their own span
+        opType = node.opToken.type
+        if opType == TT_DIV:
+            self.visit(node.leftNode, CONTEXT)
+            self.visit(node.rightNode, SPAN)
+        elif opType in COMPARISON_TYPES:
+            self.visit(node.leftNode, SPAN | CONTEXT)
+            self.visit(node.rightNode, SPAN)
+        elif opType == TT_KEYWORD:
+            # 'and'/'or' results are new numbers
+            self.visit(node.leftNode, 0)
+            self.visit(node.rightNode, 0)
+        else:
+            self.visit(node.leftNode, observed & CONTEXT)
+            self.visit(node.rightNode, 0)
+
+    def visitChainedComparisonNode(self, node, observed):
+        # every operand but the last is some comparison's left one
+        for operand in node.operands:
+            self.visit(operand, SPAN | CONTEXT)
+
+    def visitMeterNode(self, node, observed):
+        self.visit(node.node, observed)
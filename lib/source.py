@@ -0,0 +1,106 @@
+from bisect import bisect_right
+
+##################################
+# SOURCE
+##################################
+
+
+class Source:
+    # One per lexed file. Line starts are only indexed the first time a
+    # line/column is asked for, which normally means an error is rendered.
+    # firstLine is the line number of the text's first line in the file,
+    # for sources holding only a piece of it. The text can be a bytes-like
+    # buffer (an mmap of the file), it is then only decoded when needed.
+    __slots__ = ('fn', 'raw', 'lineStarts', 'firstLine')
+
+    def __init__(self, fileName, text, firstLine=0):
+        self.fn = fileName
+        self.raw = text
+        self.lineStarts = None
+        self.firstLine = firstLine
+
+    @property
+    def text(self):
+        if not isinstance(self.raw, str):
+            self.raw = str(self.raw, 'utf-8', 'replace')
+        return self.raw
+
+    def indexLines(self):
+        text = self.text
+        lineStarts = [0]
+        idx = text.find('\n')
+        while idx >= 0:
+            lineStarts.append(idx + 1)
+            idx = text.find('\n', idx + 1)
+        self.lineStarts = lineStarts
+
+    def lineAt(self, index):
+        # the line index is in, counted from the text's first line
+        if self.lineStarts is None:
+            self.indexLines()
+        return max(bisect_right(self.lineStarts, index) - 1, 0)
+
+    def line(self, ln):
+        # line ln of the text (as counted by lineAt), '\n' excluded
+        lineStarts = self.lineStarts
+        end = lineStarts[ln + 1] - 1 if ln + 1 < len(lineStarts) else len(self.text)
+        return self.text[lineStarts[ln]:end]
+
+    def lineCol(self, index):
+        ln = self.lineAt(index)
+        return ln + self.firstLine, index - self.lineStarts[ln]
+
+    def lineNumbers(self, indices):
+        # the line numbers (as Position.ln) of ascending indices, from the
+        # newlines between them: a buffer is neither decoded nor indexed
+        newline = '\n' if isinstance(self.raw, str) else b'\n'
+        lines = []
+        ln, previous = self.firstLine, 0
+        for index in indices:
+            ln += self.raw[previous:index].count(newline)
+            lines.append(ln)
+            previous = index
+        return lines
+
+
+class Position:
+    # Only the offset is stored, line and column are looked up in the
+    # source's line index when they are first needed
+    __slots__ = ('idx', 'source')
+
+    def __init__(self, index, source):
+        self.idx = index
+        self.source = source
+
+    @property
+    def ln(self):
+        return self.source.lineCol(self.idx)[0]
+
+    @property
+    def col(self):
+        return self.source.lineCol(self.idx)[1]
+
+    @property
+    def fn(self):
+        return self.source.fn
+
+    @property
+    def ftxt(self):
+        return self.source.text
+
+    def copy(self):
+        return Position(self.idx, self.source)
+
+
+class Span:
+    # Base for anything that covers a range of a source (tokens, nodes):
+    # subclasses set start, end and source, positions are built on demand
+    __slots__ = ()
+
+    @property
+    def startPos(self):
+        return Position(self.start, self.source)
+
+    @property
+    def endPos(self):
+        return Position(self.end, self.source)
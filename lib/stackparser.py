@@ -0,0 +1,137 @@
+from .errors import *
+from .nodes import *
+from .tokens import *
+from .parser_ import (Parser, ParseResult, EXPECTED_EXPRESSION, BINARY_PRECEDENCE, NOT_PRECEDENCE,
+                      COMPARISON_PRECEDENCE)
+
+##################################
+# STACK PARSER
+##################################
+
+# Operators bind as in BINARY_PRECEDENCE. A unary '+'/'-' applies to a
+# factor, which takes in '^' but not '*' or '/': -2 ^ 2 is -(2 ^ 2), -2 * 3
+# is (-2) * 3. '(' and 'var x =' markers sit below everything.
+UNARY_PRECEDENCE = 7
+RIGHT_ASSOCIATIVE = (TT_POW,)
+
+# kinds of entries on the operator stack. A CHAIN entry holds the tokens of
+# consecutive comparisons, which make one node.
+BINARY, UNARY, PAREN, VAR, CHAIN = range(5)
+
+
+class StackParser(Parser):
+    # Drop-in replacement for Parser: same trees, same errors, but
+    # expressions are parsed by precedence climbing on explicit operand
+    # and operator stacks instead of recursive descent, so neither long
+    # chains nor deep nesting run into the recursion limit.
+    #
+    # Parser.expr replaces the error of an expression that failed on its
+    # very first token by a generic one. Expressions start at the beginning
+    # of a statement, after '(' and after 'var x ='; frameStart is the
+    # index of the token the innermost one started at.
+
+    def expr(self):
+        res = ParseResult()
+        start = self.tokenIndex
+        operands = []
+        operators = []
+        frameStart = self.tokenIndex
+
+        while True:
+            # operand: any number of prefixes, then an atom
+            tok = self.currentToken
+            if tok.type in (TT_PLUS, TT_MINUS):
+                operators.append((UNARY_PRECEDENCE, UNARY, tok))
+                self.advance()
+                continue
+
+            if tok.matches(TT_KEYWORD, 'not') and (not operators or operators[-1][0] <= NOT_PRECEDENCE):
+                operators.append((NOT_PRECEDENCE, UNARY, tok))
+                self.advance()
+                continue
+
+            if tok.type == TT_LPAREN:
+                operators.append((0, PAREN, tok))
+                self.advance()
+                frameStart = self.tokenIndex
+                continue
+
+            if self.tokenIndex == frameStart and tok.matches(TT_KEYWORD, 'var'):
+                self.advance()
+                if self.currentToken.type != TT_IDENTIFIER:
+                    return self.fail(res, start, "Expected identifier")
+                varName = self.currentToken
+                self.advance()
+                if self.currentToken.type != TT_EQ:
+                    return self.fail(res, start, "Expected '='")
+                self.advance()
+                operators.append((0, VAR, varName))
+                frameStart = self.tokenIndex
+                continue
+
+            if tok.type in (TT_INT, TT_FLOAT):
+                operands.append(NumberNode(tok))
+            elif tok.type == TT_IDENTIFIER:
+                operands.append(VarAccessNode(tok))
+            elif self.tokenIndex == frameStart:
+                return self.fail(res, start, EXPECTED_EXPRESSION)
+            else:
+                return self.fail(res, start, "Expected Int or Float, identifier, '+', '-' or '(' ")
+            self.advance()
+
+            # then binary operators and closing parentheses
+            while True:
+                tok = self.currentToken
+                precedence = BINARY_PRECEDENCE.get(tok.value if tok.type == TT_KEYWORD else tok.type)
+                if precedence == COMPARISON_PRECEDENCE:
+                    self.reduce(operands, operators, precedence + 1)
+                    if operators and operators[-1][1] == CHAIN:
+                        operators[-1][2].append(tok)
+                    else:
+                        operators.append((precedence, CHAIN, [tok]))
+                    self.advance()
+                    break
+                if precedence is not None:
+                    self.reduce(operands, operators, precedence + (tok.type in RIGHT_ASSOCIATIVE))
+                    operators.append((precedence, BINARY, tok))
+                    self.advance()
+                    break
+
+                # anything else ends the innermost expression, and with it
+                # the assignments it is the value of
+                self.reduce(operands, operators, 1)
+                while operators and operators[-1][1] == VAR:
+                    operands[-1] = VarAssignNode(operators.pop()[2], operands[-1])
+
+                if not operators:
+                    res.advanceCount = self.tokenIndex - start
+                    return res.success(operands[0])
+                if tok.type != TT_RPAREN:
+                    return self.fail(res, start, "Expected ')'")
+                operators.pop()
+                self.advance()
+
+    def reduce(self, operands, operators, minimum):
+        # applies the stacked operators binding at least as strongly as
+        # minimum to their operands
+        while operators and operators[-1][0] >= minimum:
+            precedence, kind, opToken = operators.pop()
+            if kind == UNARY:
+                operands[-1] = UnaryOperationNode(opToken, operands[-1])
+            elif kind == CHAIN and len(opToken) > 1:
+                count = len(opToken) + 1
+                chained = ChainedComparisonNode(operands[-count:], opToken)
+                del operands[-count:]
+                operands.append(chained)
+            elif kind == CHAIN:
+                right = operands.pop()
+                operands[-1] = BinaryOperationNode(operands[-1], opToken[0], right)
+            else:
+                right = operands.pop()
+                operands[-1] = BinaryOperationNode(operands[-1], opToken, right)
+
+    def fail(self, res, start, details):
+        res.advanceCount = self.tokenIndex - start
+        return res.failure(InvalidSyntaxError(
+            self.currentToken.startPos, self.currentToken.endPos, details
+        ))
@@ -0,0 +1,126 @@
+import codecs
+from .tokens import *
+from .source import Source
+from .fastlexer import FastLexer
+from .parser_ import Parser
+
+##################################
+# STREAM LEXER
+##################################
+
+
+class StreamLexer:
+    # Lexes a program read from a file object (text or binary) or from an
+    # iterable of str chunks, without ever holding more than one line of it.
+    #
+    # Every line gets its own Source whose firstLine is its line number, so
+    # positions and error messages match those of the whole text, and a
+    # value kept around only keeps its own line alive. Tokens are handed out
+    # a statement at a time: a bad character drops the part of its statement
+    # lexed so far, the parser then sees the end of the program and the
+    # error is left in self.error.
+
+    def __init__(self, stream, fileName, chunkSize=1 << 16):
+        self.stream = stream
+        self.fn = fileName
+        self.chunkSize = chunkSize
+        self.error = None
+
+    def rawChunks(self):
+        read = getattr(self.stream, 'read', None)
+        if read is None:
+            yield from self.stream
+            return
+        chunk = read(self.chunkSize)
+        while chunk:
+            yield chunk
+            chunk = read(self.chunkSize)
+
+    def chunks(self):
+        decoder = None
+        for chunk in self.rawChunks():
+            if isinstance(chunk, bytes):
+                # a multi-byte character can be split between two chunks
+                decoder = decoder or codecs.getincrementaldecoder('utf-8')()
+                chunk = decoder.decode(chunk)
+            yield chunk
+        if decoder is not None:
+            yield decoder.decode(b'', True)
+
+    def lines(self):
+        # complete lines, '\n' included, plus whatever follows the last one
+        parts = []
+        for chunk in self.chunks():
+            start = 0
+            end = chunk.find('\n') + 1
+            while end:
+                if parts:
+                    parts.append(chunk[start:end])
+                    yield ''.join(parts)
+                    parts = []
+                else:
+                    yield chunk[start:end]
+                start = end
+                end = chunk.find('\n', start) + 1
+            if start < len(chunk):
+                parts.append(chunk[start:])
+        if parts:
+            yield ''.join(parts)
+
+    def tokens(self):
+        pending = []
+        lineNumber = 0
+        source = Source(self.fn, '')
+        for line in self.lines():
+            source = Source(self.fn, line, lineNumber)
+            lexer = FastLexer(line, self.fn, source)
+            for token in lexer.scan():
+                pending.append(token)
+                if token.type == TT_NEWLINE:
+                    yield from pending
+                    pending.clear()
+            if lexer.error:
+                self.error = lexer.error
+                pending.clear()
+                break
+            lineNumber += 1
+
+        yield from pending
+        yield Token(TT_EOF, None, len(source.text), source=source)
+
+
+##################################
+# STREAM PARSER
+##################################
+
+
+class StreamParser(Parser):
+    # Parser over a token iterator with one token of lookahead (all the
+    # grammar needs), so tokens are consumed as they are lexed
+
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.tokenIndex = -1
+        self.currentToken = None
+        self.advance()
+
+    def advance(self):
+        self.tokenIndex += 1
+        token = next(self.tokens, None)
+        # past the end the EOF token stays current, as in Parser
+        if token is not None:
+            self.currentToken = token
+        return self.currentToken
+
+    def statements(self):
+        # Yields a ParseResult per statement, the next statement is only
+        # parsed once the caller asks for it. Stops after the first error.
+        while True:
+            while self.currentToken.type == TT_NEWLINE:
+                self.advance()
+            if self.currentToken.type == TT_EOF:
+                return
+            res = self.statement()
+            yield res
+            if res.error:
+                return
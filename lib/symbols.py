@@ -1,21 +1,41 @@
+from itertools import count
+
 ##################################
 # SYMBOL TABLE
 ##################################
 
+# Every set() stamps the symbol with a number never handed out before, in
+# any table, so equal stamps mean the very same binding (see memo.py)
+versionCounter = count(1)
+
+
 class SymbolTable:
-    def __init__(self):
+    def __init__(self, parent=None):
         self.symbols = {}
-        self.parent = None
+        self.parent = parent
+        self.versions = {}
 
     
     def get(self, name):
         value = self.symbols.get(name, None)
         if value == None and self.parent:
-            return self.parent.get(name, None)
+            return self.parent.get(name)
         return value
 
     def set(self, name, value):
         self.symbols[name] = value
+        self.versions[name] = next(versionCounter)
     
     def remove(self, name):
-        del self.symbols[name]
\ No newline at end of file
+        del self.symbols[name]
+        self.versions.pop(name, None)
+
+    def version(self, name):
+        # stamp of the binding get(name) would return, None if there is none
+        # (or it was put in symbols directly)
+        table = self
+        while table is not None:
+            if table.symbols.get(name) is not None:
+                return table.versions.get(name)
+            table = table.parent
+        return None
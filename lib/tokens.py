@@ -1,3 +1,5 @@
+from .source import Span
+
 # #################################
 # TOKEN
 # #################################
@@ -20,24 +22,28 @@ TT_LT = 'LT'
 TT_GT = 'GT'
 TT_LTE = 'LTE'
 TT_GTE = 'GTE'
+TT_NEWLINE = 'NEWLINE'
 TT_EOF = 'EOF'
 
 KEYWORDS = [
-    'var'
+    'var',
+    'and',
+    'or',
+    'not',
 ]
 
+COMPARISON_TYPES = (TT_EE, TT_NE, TT_LT, TT_GT, TT_LTE, TT_GTE)
+
 
-class Token:
-    def __init__(self, type_, value = None, startPos = None, endPos = None):
+class Token(Span):
+    __slots__ = ('type', 'value', 'start', 'end', 'source')
+
+    def __init__(self, type_, value = None, start = None, end = None, source = None):
         self.type = type_
         self.value = value
-        if startPos:
-            self.startPos = startPos.copy()
-            self.endPos = startPos.copy()
-            self.endPos.advance()
-
-        if endPos:
-            self.endPos = endPos
+        self.start = start
+        self.end = start + 1 if end is None and start is not None else end
+        self.source = source
 
     def __repr__(self):
         if self.value:
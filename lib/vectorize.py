@@ -0,0 +1,380 @@
+from .tokens import *
+from .nodes import *
+from .errors import RTError
+from .numeric import power, COMPARISONS, compare
+from .interpreter import powerError
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+##################################
+# BATCH ERRORS
+##################################
+
+
+class BatchRTError(RTError):
+    # failures is a list of (RTError, rows), one per error site, rows being
+    # the rows for which the scalar interpreter would have stopped there.
+    # The batch error itself is the first of them and rows lists every
+    # row that failed.
+    def __init__(self, failures):
+        error = failures[0][0]
+        super().__init__(error.startPos, error.endPos, error.details, error.context)
+        self.failures = failures
+        self.rows = np.unique(np.concatenate([rows for error, rows in failures]))
+
+
+class BatchAbort(Exception):
+    pass
+
+
+##################################
+# BATCH EVALUATOR
+##################################
+
+INT64_LIMIT = 2 ** 63
+FLOAT_EXACT_LIMIT = 2 ** 53
+
+
+def maxAbs(array):
+    # as a Python int for int64 arrays so comparisons against the limits
+    # are exact
+    if len(array) == 0: return 0
+    return max(abs(int(array.max())), abs(int(array.min())))
+
+
+class BatchEvaluator:
+    # Evaluates one parsed expression over columns of bindings with numpy.
+    #
+    # Every intermediate is an array with one value per row: int64, float64
+    # or object. int64/float64 are only used while they give the same
+    # result as Python's int/float arithmetic (no int64 overflow, int
+    # division operands exactly representable as floats, no float power
+    # that Python would raise on or turn complex), anything else falls
+    # back to object arrays, i.e. to Python's own operators per element.
+    #
+    # Variables missing from the columns are read from the context's
+    # symbol table and broadcast. Assignments only bind a column for the
+    # rest of the expression, the symbol table is not written to.
+    #
+    # The right operand of 'and'/'or', and the operands of a chain after a
+    # comparison, are evaluated for every row, with the rows the scalar
+    # interpreter would skip counted as failed meanwhile: they get no
+    # errors, and keep their old value for anything assigned in there.
+    # `unset` marks the rows a variable only has garbage for, which are not
+    # defined for the interpreter either.
+
+    def __init__(self, columns, context):
+        if np is None:
+            raise ImportError('batch evaluation needs numpy')
+        self.context = context
+        self.columns = {}
+        self.rows = None
+        for name, values in columns.items():
+            column = self.asColumn(values)
+            if self.rows is not None and len(column) != self.rows:
+                raise ValueError(f'column {name!r} has {len(column)} rows, expected {self.rows}')
+            self.rows = len(column)
+            self.columns[name] = column
+        if self.rows is None:
+            self.rows = 1
+        # variable -> rows its column holds no value for
+        self.unset = {}
+
+    def asColumn(self, values):
+        if not isinstance(values, np.ndarray):
+            # numpy would turn a list mixing ints and floats into floats
+            values = list(values)
+            types = set(map(type, values))
+            if len(types) > 1 or not types <= {int, float}:
+                array = np.empty(len(values), dtype=object)
+                array[:] = values
+                return array
+        array = np.asarray(values)
+        if array.ndim != 1:
+            raise ValueError('columns must be one dimensional')
+        kind = array.dtype.kind
+        if kind in 'bi':
+            return array.astype(np.int64)
+        if kind == 'u':
+            return array.astype(np.int64) if maxAbs(array) < INT64_LIMIT else array.astype(object)
+        if kind == 'f':
+            return array.astype(np.float64)
+        return array.astype(object)
+
+    def full(self, value):
+        if isinstance(value, int) and -INT64_LIMIT < value < INT64_LIMIT:
+            return np.full(self.rows, value, dtype=np.int64)
+        if isinstance(value, float):
+            return np.full(self.rows, value, dtype=np.float64)
+        array = np.empty(self.rows, dtype=object)
+        array[:] = [value] * self.rows
+        return array
+
+    def evaluate(self, node):
+        self.failed = np.zeros(self.rows, dtype=bool)
+        # rows skipped by the operands being evaluated, None outside any
+        self.skipped = None
+        self.failures = []
+        try:
+            # float overflow gives inf and inf - inf nan, as in Python
+            with np.errstate(over='ignore', invalid='ignore'):
+                values = self.visit(node)
+        except BatchAbort:
+            values = None
+
+        if self.failures:
+            return values, BatchRTError(self.failures)
+        return values, None
+
+    def fail(self, error, rows):
+        self.failures.append((error, rows))
+        self.failed[rows] = True
+
+    def visit(self, node):
+        methodType = f'visit{type(node).__name__}'
+        method = getattr(self, methodType, self.noVisitMethod)
+        return method(node)
+
+    def noVisitMethod(self, node):
+        raise Exception(f'No visit{type(node).__name__} method defined')
+
+    def visitProgramNode(self, node):
+        values = None
+        for statement in node.statements:
+            values = self.visit(statement)
+        return values
+
+    def visitNumberNode(self, node):
+        return self.full(node.token.value)
+
+    def visitVarAccessNode(self, node):
+        varName = node.varNameToken.value
+        column = self.columns.get(varName)
+        if column is not None:
+            unset = self.unset.get(varName)
+            if unset is not None:
+                rows = np.flatnonzero(unset & ~self.failed)
+                if len(rows):
+                    self.fail(RTError(
+                        node.startPos, node.endPos,
+                        f"'{varName}' is not defined", self.context
+                    ), rows)
+            return column
+
+        value = self.context.symbolTable.get(varName)
+        if not value:
+            # every row that is still running stops here, nothing is left
+            # to evaluate after that
+            rows = np.flatnonzero(~self.failed)
+            if len(rows):
+                self.fail(RTError(
+                    node.startPos, node.endPos,
+                    f"'{varName}' is not defined", self.context
+                ), rows)
+            raise BatchAbort()
+        return self.full(value.value)
+
+    def visitVarAssignNode(self, node):
+        values = self.visit(node.nodeValue)
+        varName = node.varNameToken.value
+        skipped = self.skipped
+        if skipped is None or not skipped.any():
+            self.columns[varName] = values
+            self.unset.pop(varName, None)
+            return values
+
+        # rows that do not get here keep what they had
+        old = self.columns.get(varName)
+        if old is None:
+            value = self.context.symbolTable.get(varName)
+            old = self.full(value.value) if value else None
+        unset = self.unset.pop(varName, None)
+        if old is None:
+            self.columns[varName] = values
+            self.unset[varName] = skipped
+            return values
+        if unset is not None:
+            self.unset[varName] = unset & skipped
+        if old.dtype != values.dtype:
+            self.columns[varName] = np.where(skipped, old.astype(object), values.astype(object))
+        else:
+            self.columns[varName] = np.where(skipped, old, values)
+        return values
+
+    def visitUnaryOperationNode(self, node):
+        values = self.visit(node.node)
+        if node.opToken.type == TT_KEYWORD:
+            return (~self.truth(values)).astype(np.int64)
+        if node.opToken.type != TT_MINUS:
+            return values
+        kind = values.dtype.kind
+        if kind == 'i' and len(values) and int(values.min()) == -INT64_LIMIT:
+            values = values.astype(object)
+        return values * -1
+
+    def visitBinaryOperationNode(self, node):
+        if node.opToken.type == TT_KEYWORD:
+            return self.logicalOperation(node)
+        left = self.visit(node.leftNode)
+        right = self.visit(node.rightNode)
+        opType = node.opToken.type
+        if opType in COMPARISON_TYPES:
+            return self.compare(left, right, opType, node.leftNode, node.rightNode).astype(np.int64)
+
+        if opType == TT_DIV:
+            zero = np.asarray(right == 0, dtype=bool)
+            if zero.any():
+                rows = np.flatnonzero(zero & ~self.failed)
+                if len(rows):
+                    span = positionNode(node.rightNode)
+                    self.fail(RTError(
+                        span.startPos, span.endPos,
+                        "Division by Zero", self.context
+                    ), rows)
+                right = right.copy()
+                right[zero] = 1
+            return self.divide(left, right)
+        if opType == TT_POW:
+            return self.power(left, right, node)
+
+        left, right = self.promote(left, right, opType)
+        if opType == TT_PLUS:
+            return left + right
+        if opType == TT_MINUS:
+            return left - right
+        return left * right
+
+    def logicalOperation(self, node):
+        left = self.truth(self.visit(node.leftNode))
+        isAnd = node.opToken.value == 'and'
+        right = self.skipping(~left if isAnd else left, node.rightNode)
+        right = np.zeros(self.rows, dtype=bool) if right is None else self.truth(right)
+        return (left & right if isAnd else left | right).astype(np.int64)
+
+    def visitChainedComparisonNode(self, node):
+        operands = node.operands
+        left = self.visit(operands[0])
+        right = self.visit(operands[1])
+        result = self.compare(left, right, node.opTokens[0].type, operands[0], operands[1])
+        for index in range(1, len(node.opTokens)):
+            left = right
+            right = self.skipping(~result, operands[index + 1])
+            if right is None: break
+            result &= self.compare(left, right, node.opTokens[index].type, operands[index], operands[index + 1], ~result)
+        return result.astype(np.int64)
+
+    def skipping(self, decided, node):
+        # the values of node, evaluated as if the decided rows had failed.
+        # None when no row is left to evaluate it for, or none got through.
+        failed, skipped = self.failed, self.skipped
+        self.failed = failed | decided
+        if self.failed.all():
+            self.failed = failed
+            return None
+        self.skipped = decided if skipped is None else skipped | decided
+        try:
+            values = self.visit(node)
+        except BatchAbort:
+            values = None
+        # the decided rows are still running, unless they had failed before
+        self.failed = failed | (self.failed & ~decided)
+        self.skipped = skipped
+        if values is None and self.failed.all():
+            raise BatchAbort()
+        return values
+
+    def truth(self, values):
+        return np.asarray(values != 0, dtype=bool)
+
+    def compare(self, left, right, opType, leftNode, rightNode, skipped=None):
+        # a bool per row
+        lkind, rkind = left.dtype.kind, right.dtype.kind
+        if lkind != 'O' and rkind != 'O':
+            # numpy compares an int64 with a float64 as floats, which is
+            # only exact below 2 ** 53
+            if not ((lkind == 'i' and rkind == 'f' and maxAbs(left) > FLOAT_EXACT_LIMIT) or
+                    (lkind == 'f' and rkind == 'i' and maxAbs(right) > FLOAT_EXACT_LIMIT)):
+                return COMPARISONS[opType](left, right)
+
+        # Python's, per element: complex numbers cannot be ordered
+        values = np.empty(len(left), dtype=object)
+        values[:] = [compare(opType, l, r) for l, r in zip(left.tolist(), right.tolist())]
+        illegal = np.equal(values, None)
+        if illegal.any():
+            running = ~self.failed if skipped is None else ~(self.failed | skipped)
+            rows = np.flatnonzero(illegal & running)
+            if len(rows):
+                self.fail(RTError(
+                    positionNode(leftNode).startPos, positionNode(rightNode).endPos,
+                    "Illegal operation", self.context
+                ), rows)
+            values[illegal] = 0
+        return values.astype(bool)
+
+    def promote(self, left, right, opType):
+        # common representation for +, - and *
+        lkind, rkind = left.dtype.kind, right.dtype.kind
+        if lkind == 'O' or rkind == 'O':
+            return left.astype(object), right.astype(object)
+        if lkind == 'i' and rkind == 'i':
+            lmax, rmax = maxAbs(left), maxAbs(right)
+            bound = lmax * rmax if opType == TT_MUL else lmax + rmax
+            if bound >= INT64_LIMIT:
+                return left.astype(object), right.astype(object)
+            return left, right
+        return left.astype(np.float64), right.astype(np.float64)
+
+    def divide(self, left, right):
+        lkind, rkind = left.dtype.kind, right.dtype.kind
+        if lkind == 'O' or rkind == 'O':
+            return left.astype(object) / right.astype(object)
+        # Python divides ints exactly and rounds once, numpy converts them
+        # to float first, which is only the same below 2 ** 53
+        if (lkind == 'i' and maxAbs(left) > FLOAT_EXACT_LIMIT) or \
+           (rkind == 'i' and maxAbs(right) > FLOAT_EXACT_LIMIT):
+            return left.astype(object) / right.astype(object)
+        return left.astype(np.float64) / right.astype(np.float64)
+
+    def power(self, left, right, node):
+        lkind, rkind = left.dtype.kind, right.dtype.kind
+        if lkind == 'i' and rkind == 'i':
+            # int ** negative int is a float in Python, an error in numpy
+            if len(right) and right.min() < 0:
+                return self.pythonPower(left, right, node)
+            bits = maxAbs(left).bit_length() * maxAbs(right)
+            if bits >= 63:
+                return self.pythonPower(left, right, node)
+            return np.power(left, right)
+
+        # numpy's float power is not always bit-identical to the C library
+        # pow Python uses, and Python raises or goes complex where numpy
+        # returns inf/nan, so float powers are done by Python per element
+        values = self.pythonPower(left, right, node)
+        if lkind != 'O' and rkind != 'O':
+            try:
+                return values.astype(np.float64)
+            except TypeError:
+                pass
+        return values
+
+    def pythonPower(self, left, right, node):
+        left = left.astype(object)
+        right = right.astype(object)
+        # rows that already failed are not evaluated by the interpreter
+        if self.failed.any():
+            left[self.failed] = 1
+            right[self.failed] = 1
+        values = np.empty(len(left), dtype=object)
+        values[:] = list(map(power, left, right))
+        # rows whose power fails, with the details of their error, fail
+        # like the interpreter
+        failed = np.fromiter((type(value) is str for value in values), dtype=bool, count=len(values))
+        if failed.any():
+            rows = np.flatnonzero(failed)
+            for details in dict.fromkeys(values[rows]):
+                self.fail(powerError(node, details, self.context), rows[values[rows] == details])
+            values[failed] = 1
+        return values
@@ -0,0 +1,152 @@
+from .compiler import *
+from .errors import RTError
+from .interpreter import RTResult, Number, powerError
+from .numeric import power, compare
+
+##################################
+# VIRTUAL MACHINE
+##################################
+
+
+class VM:
+    # Runs a CodeObject on a value stack. Values on the stack are raw
+    # ints/floats, they are only boxed into a Number for the final result
+    # and for values stored in the symbol table.
+
+    def run(self, code, context):
+        res = RTResult()
+        instructions = code.instructions
+        consts = code.consts
+        names = code.names
+        symbolTable = context.symbolTable
+        convert = context.backend.convert if context.backend is not None else None
+        false, true = truth = context.truth
+        stack = []
+        push = stack.append
+        pop = stack.pop
+        pc = 0
+        end = len(instructions)
+
+        while pc < end:
+            op = instructions[pc]
+            if op == OP_CONST:
+                push(consts[instructions[pc + 1]])
+                pc += 2
+            elif op == OP_LOAD:
+                value = symbolTable.get(names[instructions[pc + 1]])
+                if not value:
+                    return res.failure(self.notDefined(code, pc, context))
+                push(value.value if convert is None else convert(value.value))
+                pc += 2
+            elif op == OP_ADD:
+                right = pop()
+                stack[-1] = stack[-1] + right
+                pc += 1
+            elif op == OP_SUB:
+                right = pop()
+                stack[-1] = stack[-1] - right
+                pc += 1
+            elif op == OP_MUL:
+                right = pop()
+                stack[-1] = stack[-1] * right
+                pc += 1
+            elif op == OP_DIV:
+                right = pop()
+                if right == 0:
+                    return res.failure(self.divisionByZero(code, pc, context))
+                stack[-1] = stack[-1] / right
+                pc += 1
+            elif op == OP_POW:
+                right = pop()
+                value = power(stack[-1], right)
+                if type(value) is str:
+                    return res.failure(powerError(code.spans[pc], value, context))
+                stack[-1] = value
+                pc += 1
+            elif op == OP_NEG:
+                # like the interpreter, -Decimal('0') is 0 but times -1 is -0
+                stack[-1] = stack[-1] * -1
+                pc += 1
+            elif op == OP_POP:
+                pop()
+                pc += 1
+            elif op == OP_STORE:
+                symbolTable.set(names[instructions[pc + 1]], Number(stack[-1]).setContext(context))
+                pc += 2
+            elif op == OP_COMPARE:
+                right = pop()
+                value = compare(COMPARISON_TYPES[instructions[pc + 1]], stack[-1], right, truth)
+                if value is None:
+                    return res.failure(self.illegalComparison(code, pc, context))
+                stack[-1] = value
+                pc += 2
+            elif op == OP_CHAIN:
+                right = pop()
+                value = compare(COMPARISON_TYPES[instructions[pc + 1]], stack[-1], right, truth)
+                if value is None:
+                    return res.failure(self.illegalComparison(code, pc, context))
+                if value:
+                    stack[-1] = right
+                    pc += 3
+                else:
+                    stack[-1] = false
+                    pc = instructions[pc + 2]
+            elif op == OP_AND:
+                if stack[-1] == 0:
+                    stack[-1] = false
+                    pc = instructions[pc + 1]
+                else:
+                    pop()
+                    pc += 2
+            elif op == OP_OR:
+                if stack[-1] != 0:
+                    stack[-1] = true
+                    pc = instructions[pc + 1]
+                else:
+                    pop()
+                    pc += 2
+            elif op == OP_TRUTH:
+                stack[-1] = false if stack[-1] == 0 else true
+                pc += 1
+            elif op == OP_NOT:
+                stack[-1] = true if stack[-1] == 0 else false
+                pc += 1
+            elif op == OP_METER:
+                error = context.meter.charge(code.spans[pc], context)
+                if error: return res.failure(error)
+                pc += 1
+            elif op == OP_MEASURE:
+                if type(stack[-1]) is not float:
+                    error = context.meter.measure(code.spans[pc], stack[-1], context)
+                    if error: return res.failure(error)
+                pc += 1
+            else:
+                raise Exception(f'Unknown opcode {op} at {pc}')
+
+        # an empty program has no value
+        if not stack: return res.success(None)
+        node = positionNode(code.node)
+        return res.success(
+            Number(pop()).setSpan(node).setContext(context)
+        )
+
+    def notDefined(self, code, pc, context):
+        node = code.spans[pc]
+        return RTError(
+            node.startPos, node.endPos,
+            f"'{node.varNameToken.value}' is not defined", context
+        )
+
+    def divisionByZero(self, code, pc, context):
+        node = code.spans[pc]
+        return RTError(
+            node.startPos, node.endPos,
+            "Division by Zero", context
+        )
+
+    def illegalComparison(self, code, pc, context):
+        left, right = code.spans[pc]
+        return RTError(
+            positionNode(left).startPos, positionNode(right).endPos,
+            "Illegal operation", context
+        )
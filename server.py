@@ -0,0 +1,418 @@
+import basic, asyncio, json, math, os, sys, time, zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from lib.symbols import SymbolTable
+from lib.limits import Limits
+
+##################################
+# PROTOCOL
+##################################
+
+# One JSON object per line each way. A request
+#
+#     {"id": 1, "source": "var x = 2 ^ 10", "session": "alice", "timeout": 2.5,
+#      "engine": "vm", "optimize": true, "numeric": "fraction"}
+#
+# needs only "source". Its evaluation stops with a runtime error once the
+# timeout is up, or past the server's step and size limits. Without a
+# session it runs in a fresh symbol table on top of the server's globals,
+# with one, its variables are kept for the session's next requests.
+# Responses carry the request's id, as they can come back in a different
+# order than the requests went out:
+#
+#     {"id": 1, "value": 1024, "ms": 0.41}
+#     {"id": 2, "error": {"type": "Runtime Error", "details": "Division by Zero",
+#                         "file": "<request>", "line": 1, "column": 5, "endLine": 1,
+#                         "endColumn": 6, "traceback": [...], "message": "..."}, "ms": 0.3}
+#
+# {"op": "stats"} answers with the server's metrics, {"op": "close",
+# "session": name} forgets a session.
+
+# run() options a request may set
+OPTIONS = ('engine', 'optimize', 'numeric', 'parser', 'lexer')
+
+
+def encodeValue(value):
+    # ints and floats as JSON numbers, anything JSON cannot hold exactly
+    # (inf, nan, fractions, decimals) as a string
+    if value is None: return None
+    value = value.value
+    if type(value) is int and abs(value) < 1 << 53:
+        return value
+    if type(value) is float and math.isfinite(value):
+        return value
+    try:
+        return str(value)
+    except ValueError:
+        return f'<{value.bit_length()} bit integer>'
+
+
+def encodeError(error):
+    if isinstance(error, Exception):
+        return {'type': type(error).__name__, 'details': str(error)}
+    result = error.as_dict()
+    result['message'] = error.as_string()
+    return result
+
+
+def errorResponse(id, errorType, details):
+    return {'id': id, 'error': {'type': errorType, 'details': details}}
+
+
+##################################
+# WORKER
+##################################
+
+# Runs in the worker processes. Each holds the sessions routed to it.
+MAX_SESSIONS = 1024
+sessions = OrderedDict()
+
+
+def initWorker(symbols):
+    basic.initWorker(symbols)
+
+
+def sessionTable(name):
+    symbolTable = sessions.get(name)
+    if symbolTable is None:
+        symbolTable = sessions[name] = SymbolTable(basic.sharedSymbolTable)
+        if len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+    else:
+        sessions.move_to_end(name)
+    return symbolTable
+
+
+def runBatch(sources, jobs, maxSteps=None, maxBits=None):
+    # jobs: (source index, session, options, deadline). Identical sources
+    # were sent once, and share one parse through basic's parse cache. The
+    # deadline is on the time.monotonic() clock, which the processes share.
+    results = []
+    for index, session, options, deadline in jobs:
+        if session is not None and options.get('close'):
+            sessions.pop(session, None)
+            results.append({'closed': session})
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # waited out its time in the queue, its answer is already sent
+            results.append({'error': {'type': 'Timeout', 'details': 'expired before it ran'}})
+            continue
+        symbolTable = sessionTable(session) if session is not None else SymbolTable(basic.sharedSymbolTable)
+        limits = Limits(maxSteps, remaining, maxBits)
+        start = time.perf_counter()
+        try:
+            value, error = basic.run('<request>', sources[index], symbolTable=symbolTable, limits=limits, **options)
+        except Exception as exception:
+            value, error = None, exception
+        result = {'ms': round((time.perf_counter() - start) * 1000, 3)}
+        if error is not None:
+            result['error'] = encodeError(error)
+        else:
+            result['value'] = encodeValue(value)
+        results.append(result)
+    return results
+
+
+##################################
+# METRICS
+##################################
+
+
+class Metrics:
+    def __init__(self, window=10000):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.malformed = 0
+        self.batches = 0
+        self.batchedJobs = 0
+        self.sharedParses = 0
+        self.inFlight = 0
+        # latencies (seconds) of the last `window` requests
+        self.latencies = deque(maxlen=window)
+
+    def record(self, seconds, failed):
+        self.completed += 1
+        if failed: self.errors += 1
+        self.latencies.append(seconds)
+
+    def asDict(self):
+        uptime = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies: return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+        return {
+            'uptime': round(uptime, 3),
+            'requests': self.requests,
+            'completed': self.completed,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+            'malformed': self.malformed,
+            'inFlight': self.inFlight,
+            'throughput': round(self.completed / uptime, 1) if uptime else 0,
+            'latencyMs': {'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99)},
+            'batches': self.batches,
+            'meanBatch': round(self.batchedJobs / self.batches, 2) if self.batches else 0,
+            'sharedParses': self.sharedParses,
+        }
+
+
+##################################
+# SERVER
+##################################
+
+
+# how long past the last deadline of its batch a worker may run before it
+# is killed and replaced
+OVERRUN_GRACE = 1.0
+
+
+class Worker:
+    # One worker process, fed batches one at a time. Jobs queue up while a
+    # batch runs and go out together as the next one. A batch still running
+    # OVERRUN_GRACE seconds after its jobs' deadlines, which one operation
+    # on huge numbers can do, gets its process replaced, and with it the
+    # sessions it held.
+    def __init__(self, server, symbols):
+        self.server = server
+        self.symbols = symbols
+        self.executor = self.start()
+        self.pending = []
+        self.busy = False
+        self.closed = False
+
+    def start(self):
+        return ProcessPoolExecutor(1, initializer=initWorker, initargs=(self.symbols,))
+
+    def load(self):
+        return len(self.pending) + self.busy
+
+    def submit(self, source, session, options, deadline=math.inf):
+        future = asyncio.get_running_loop().create_future()
+        if self.closed:
+            future.set_result({'error': {'type': 'Cancelled', 'details': 'server shutting down'}})
+            return future
+        self.pending.append((source, session, options, deadline, future))
+        if not self.busy:
+            self.busy = True
+            # let the requests that arrived together join the batch
+            asyncio.get_running_loop().call_soon(self.flush)
+        return future
+
+    def flush(self):
+        if not self.pending:
+            self.busy = False
+            return
+        batch = self.pending[:self.server.maxBatch]
+        del self.pending[:self.server.maxBatch]
+
+        sources, indices, jobs = [], {}, []
+        for source, session, options, deadline, future in batch:
+            index = indices.get(source)
+            if index is None:
+                index = indices[source] = len(sources)
+                sources.append(source)
+            jobs.append((index, session, options, deadline))
+        metrics = self.server.metrics
+        metrics.batches += 1
+        metrics.batchedJobs += len(jobs)
+        metrics.sharedParses += len(jobs) - len(sources)
+
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.executor, runBatch, sources, jobs, self.server.maxSteps, self.server.maxBits)
+        task.add_done_callback(lambda task: self.done(task, batch))
+        # closing a session has no deadline
+        deadline = max((job[3] for job in jobs if job[3] != math.inf), default=None)
+        if deadline is not None:
+            loop.call_later(deadline - time.monotonic() + OVERRUN_GRACE, self.overran, task, self.executor)
+
+    def overran(self, task, executor):
+        if task.done() or executor is not self.executor or self.closed: return
+        self.server.metrics.restarts += 1
+        self.executor = self.start()
+        # the executor has no way to stop a call, its process is killed;
+        # the batch then fails with BrokenProcessPool
+        for process in list(executor._processes.values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def done(self, task, batch):
+        if task.cancelled():
+            results = [{'error': {'type': 'Cancelled', 'details': 'server shutting down'}}] * len(batch)
+        elif task.exception() is not None:
+            # the worker died, or a result could not be sent back
+            error = task.exception()
+            results = [{'error': {'type': type(error).__name__, 'details': str(error)}}] * len(batch)
+        else:
+            results = task.result()
+        for (_, _, _, _, future), result in zip(batch, results):
+            if not future.done(): future.set_result(result)
+        if not self.closed: self.flush()
+
+    def close(self):
+        self.closed = True
+        for _, _, _, _, future in self.pending:
+            if not future.done():
+                future.set_result({'error': {'type': 'Cancelled', 'details': 'server shutting down'}})
+        self.pending = []
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class Server:
+    # maxPending bounds the requests accepted but not answered yet, over
+    # all connections. Once reached, connections are not read from until
+    # some are answered, which pushes back on the clients through TCP.
+    # maxSteps and maxBits bound every evaluation, see lib.limits.Limits.
+    # Numbers over about 14000 bits come back as their size only, the
+    # default maxBits stops those far larger before one operation on them
+    # takes seconds.
+    def __init__(self, workers=None, maxPending=1024, maxBatch=64, timeout=5.0, symbolTable=None,
+                 maxSteps=None, maxBits=1 << 20):
+        self.maxBatch = maxBatch
+        self.timeout = timeout
+        self.maxSteps = maxSteps
+        self.maxBits = maxBits
+        self.metrics = Metrics()
+        self.slots = asyncio.Semaphore(maxPending)
+        symbols = dict((symbolTable or basic.globalSymbolTable).symbols)
+        self.workers = [Worker(self, symbols) for _ in range(workers or os.cpu_count() or 1)]
+
+    def route(self, session):
+        # sessions stick to one worker, which holds their variables
+        if session is not None:
+            return self.workers[zlib.crc32(session.encode()) % len(self.workers)]
+        return min(self.workers, key=Worker.load)
+
+    async def handle(self, request):
+        if not isinstance(request, dict):
+            self.metrics.malformed += 1
+            return errorResponse(None, 'BadRequest', 'expected a JSON object')
+        id = request.get('id')
+        if request.get('op') == 'stats':
+            return {'id': id, 'stats': self.metrics.asDict()}
+
+        session = request.get('session')
+        if session is not None and not isinstance(session, str):
+            self.metrics.malformed += 1
+            return errorResponse(id, 'BadRequest', "'session' must be a string")
+        if request.get('op') == 'close':
+            if session is None:
+                return errorResponse(id, 'BadRequest', "'close' needs a 'session'")
+            result = await self.route(session).submit('', session, {'close': True})
+            return {'id': id, **result}
+
+        source = request.get('source')
+        if not isinstance(source, str):
+            self.metrics.malformed += 1
+            return errorResponse(id, 'BadRequest', "'source' must be a string")
+        options = {name: request[name] for name in OPTIONS if name in request}
+        timeout = request.get('timeout', self.timeout)
+        if not isinstance(timeout, (int, float)) or isinstance(timeout, bool):
+            self.metrics.malformed += 1
+            return errorResponse(id, 'BadRequest', "'timeout' must be a number of seconds")
+
+        self.metrics.requests += 1
+        start = time.perf_counter()
+        future = self.route(session).submit(source, session, options, time.monotonic() + timeout)
+        try:
+            # the worker stops evaluating at the same time, a result on its
+            # way back then is dropped
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            result = {'error': {'type': 'Timeout', 'details': f'no result after {timeout} seconds'}}
+        self.metrics.record(time.perf_counter() - start, 'error' in result)
+        return {'id': id, **result}
+
+    async def respond(self, line, writer):
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self.metrics.malformed += 1
+                response = errorResponse(None, 'BadRequest', 'invalid JSON')
+            else:
+                response = await self.handle(request)
+            writer.write(json.dumps(response).encode() + b'\n')
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.metrics.inFlight -= 1
+            self.slots.release()
+
+    async def connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError):
+                    # reset, or a line over the reader's limit
+                    line = b''
+                if not line: break
+                if not line.strip(): continue
+                await self.slots.acquire()
+                self.metrics.inFlight += 1
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks: await asyncio.wait(tasks)
+        except asyncio.CancelledError:
+            # the server is shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix=None, started=None):
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.connection, unix, limit=1 << 20)
+        else:
+            server = await asyncio.start_server(self.connection, host, port, limit=1 << 20)
+        if started is not None: started(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+def main():
+    # python server.py [--host HOST] [--port PORT | --unix PATH] [--workers N]
+    #                  [--max-pending N] [--max-batch N] [--timeout SECONDS]
+    #                  [--max-steps N] [--max-bits N]
+    args = dict(zip(sys.argv[1::2], sys.argv[2::2]))
+    server = Server(
+        workers=int(args.get('--workers', 0)) or None,
+        maxPending=int(args.get('--max-pending', 1024)),
+        maxBatch=int(args.get('--max-batch', 64)),
+        timeout=float(args.get('--timeout', 5.0)),
+        maxSteps=int(args['--max-steps']) if '--max-steps' in args else None,
+        maxBits=int(args.get('--max-bits', 1 << 20)),
+    )
+
+    def started(listener):
+        where = args.get('--unix') or ':'.join(map(str, listener.sockets[0].getsockname()[:2]))
+        print(f'listening on {where} with {len(server.workers)} workers', file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.get('--host', '127.0.0.1'), int(args.get('--port', 8765)),
+                                 args.get('--unix'), started))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,32 @@
 import basic, signal, sys
+from time import perf_counter
 
 def Exit(signal, frame):
     print("\nProgram terminated! ")
     sys.exit(0)
 
 
+def runScript(path, showTimings):
+    timings = [] if showTimings else None
+    start = perf_counter()
+    result, error = basic.run_file(path, timings=timings)
+    total = perf_counter() - start
+    print(error.as_string() if error else result)
+
+    if showTimings:
+        for line, seconds in timings:
+            print(f'line {line:6}  {seconds * 1000:10.3f} ms', file=sys.stderr)
+        print(f'{len(timings)} statements, total {total * 1000:.3f} ms', file=sys.stderr)
+    return 1 if error else 0
+
+
 def main():
     signal.signal(signal.SIGINT, Exit)
+    # python shell.py [script [--timings]] runs a script file instead
+    args = [arg for arg in sys.argv[1:] if arg != '--timings']
+    if args:
+        sys.exit(runScript(args[0], '--timings' in sys.argv[1:]))
+
     while True:
         text = input("REPL > ").strip()
         if (text==''): continue
@@ -0,0 +1,130 @@
+import os, sys, random, unittest
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import basic
+from lib.symbols import SymbolTable
+from lib.interpreter import Number
+
+##################################
+# ENGINE PARITY
+##################################
+
+# Every engine, with every option, gives the same value or the same error
+# for the same program.
+
+ENGINES = ['interpreter', 'iterative', 'vm', 'codegen']
+
+OPTIONS = [{}, {'resolve': True}, {'optimize': True}, {'numeric': 'fraction'}, {'numeric': 'decimal'}]
+
+BINDINGS = {'a': 3, 'b': 7, 'c': 0}
+
+# assignments in operands that 'and', 'or' and chains skip, or not
+SHORT_CIRCUITS = [
+    '(0 and (var b = 2)) + b',
+    '(1 or (var b = 2)) + b',
+    '(1 and (var b = 2)) + b',
+    '(0 or (var b = 2)) + b',
+    '(1 < 0 < (var b = 2)) + b',
+    '(0 < 1 < (var b = 2)) + b',
+    '(0 < (var b = 2) < 1) + b',
+    '(c and (var d = 1)) + d',
+    '(var b = 2) + b; (0 and (var b = 5)) + b',
+    'not (c or a) and (var b = 1); b',
+    '0 < a <= b < 10 and a != b or c == 0',
+    '(a > 1) + (b >= 7) * 2 - (c < 0)',
+]
+
+# powers that fail, or whose exponent is too large to be a float
+POWERS = ['0 ^ 0', '(0 - 8) ^ 0.5', '(0 - 8) ^ (1 / 3)', '0 ^ -1', '0.0 ^ -2', '0.5 ^ (2 ^ 1100)',
+          '(0 - 0.5) ^ (2 ^ 1100 + 1)', '1.5 ^ (2 ^ 1100)', '2 ^ 9999999 ^ 99']
+
+LEAVES = ['0', '1', '2', '2.5', 'a', 'b', 'c', '(var b = 4)', '(var c = a + 1)']
+BINARY = ['+', '-', '*', '/', 'and', 'or', '<', '<=', '==', '!=', '>', '>=']
+
+
+def generate(random, depth):
+    if depth == 0 or random.random() < 0.25:
+        return random.choice(LEAVES)
+    kind = random.random()
+    if kind < 0.15:
+        return f'(not {generate(random, depth - 1)})'
+    if kind < 0.3:
+        operands = [generate(random, depth - 1) for _ in range(random.randint(3, 4))]
+        operators = [random.choice(['<', '<=', '>', '>=', '==', '!=']) for _ in operands[1:]]
+        parts = [operands[0]]
+        for operator, operand in zip(operators, operands[1:]):
+            parts += [operator, operand]
+        return f'({" ".join(parts)})'
+    return f'({generate(random, depth - 1)} {random.choice(BINARY)} {generate(random, depth - 1)})'
+
+
+def outcome(text, engine, options):
+    symbolTable = SymbolTable(basic.globalSymbolTable)
+    for name, value in BINDINGS.items():
+        symbolTable.set(name, Number(value))
+    value, error = basic.run('<parity>', text, engine=engine, symbolTable=symbolTable, **options)
+    if error is not None:
+        return 'error', error.as_dict()
+    return 'value', repr(value.value if value is not None else None), repr(symbolTable.get('b').value)
+
+
+class ParityTest(unittest.TestCase):
+    def assertParity(self, text):
+        for options in OPTIONS:
+            expected = outcome(text, 'interpreter', options)
+            for engine in ENGINES[1:]:
+                with self.subTest(text=text, engine=engine, options=options):
+                    self.assertEqual(outcome(text, engine, options), expected)
+
+    def testShortCircuits(self):
+        for text in SHORT_CIRCUITS:
+            self.assertParity(text)
+
+    def testSkippedAssignmentKeepsValue(self):
+        for engine in ENGINES:
+            self.assertEqual(outcome('(0 and (var b = 2)) + b', engine, {})[1], '7')
+            self.assertEqual(outcome('(1 or (var b = 2)) + b', engine, {})[1], '8')
+
+    def testPowers(self):
+        for text in POWERS:
+            self.assertParity(text)
+        self.assertEqual(outcome('0.5 ^ (2 ^ 1100)', 'vm', {})[1], '0.0')
+        self.assertEqual(outcome('0 ^ -1', 'codegen', {'numeric': 'fraction'})[1]['details'], 'Division by Zero')
+        self.assertEqual(outcome('0 ^ 0', 'iterative', {'numeric': 'decimal'})[1]['details'], 'Illegal operation')
+
+    def testDivisions(self):
+        for text in ['10 ^ 400 / 0.0', '1 / (a - 3)', '(0 - 0.0) / c', '0 / 0.0', 'b / 2 / 0.5']:
+            self.assertParity(text)
+
+    def testHugeConstants(self):
+        # folded into a constant of over 4300 digits, which has no repr
+        self.assertParity('(10 ^ 5000 + a - a) / 10 ^ 4990')
+
+    def testEmptyProgram(self):
+        # nothing to run is a syntax error, as it always was
+        for text in ['', '  ', '\n;\n']:
+            self.assertParity(text)
+            self.assertEqual(outcome(text, 'vm', {})[1]['type'], 'Invalid Syntax')
+
+    def testDeepNesting(self):
+        # as deep as before 'and', 'or' and comparisons were added
+        text = '(' * 120 + 'a < b' + ')' * 120
+        self.assertParity(text)
+        self.assertEqual(outcome(text, 'interpreter', {})[1], '1')
+
+    def testLongChains(self):
+        # deeper than the recursion limit, so only the stack parser and the
+        # iterative engine take them, with any backend
+        for text in [' + '.join(['1'] * 5000), '-' * 5000 + '2', '(' * 5000 + '2' + ')' * 5000]:
+            for options in OPTIONS[3:]:
+                value, error = basic.run('<chain>', text, engine='iterative', parser='stack', **options)
+                self.assertIsNone(error)
+
+    def testRandomPrograms(self):
+        generator = random.Random(1)
+        for _ in range(300):
+            self.assertParity(generate(generator, 4) + ' + b')
+
+
+if __name__ == '__main__':
+    unittest.main()